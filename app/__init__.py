@@ -17,6 +17,20 @@ def create_app(config_name):
     db.init_app(app)
     login_manager.init_app(app)
     
+    # Configure market data and analysis caches, the shared quote stream,
+    # the screener, trained forecasting models, backtesting and recording
+    from app.utils import (
+        backtest, chart_spec, data_analyzer, data_fetcher, price_stream, providers, screener, training
+    )
+    data_fetcher.init_app(app)
+    data_analyzer.init_app(app)
+    price_stream.init_app(app)
+    screener.init_app(app)
+    training.init_app(app)
+    backtest.init_app(app)
+    providers.init_app(app)
+    chart_spec.init_app(app)
+    
     # Register blueprints
     from app.main import main as main_blueprint
     app.register_blueprint(main_blueprint)
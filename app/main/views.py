@@ -1,8 +1,8 @@
-from flask import render_template, redirect, url_for, flash, request, jsonify
+from flask import render_template, redirect, url_for, flash, request, jsonify, current_app
 from flask_login import login_required, current_user
 from . import main
 from app.models import Stock
-from app.utils.data_fetcher import get_stock_data, search_stocks
+from app.utils.data_fetcher import get_stock_data, get_stock_info, search_stocks
 
 @main.route('/test')
 def test():
@@ -28,13 +28,13 @@ def index():
             
             # Try to get real data, but use mock data as fallback
             try:
-                data = get_stock_data(symbol, period='1mo')
+                data = get_stock_data(symbol, period='1mo', include_info=False)
                 if data['success'] and data['data'] and len(data['data']) > 0:
                     latest_data = data['data'][-1]
                     stock_data[symbol] = {
                         'price': latest_data.get('Close', 150.0),
                         'change': latest_data.get('Close', 150.0) - latest_data.get('Open', 147.5),
-                        'name': data['info'].get('shortName', f"{symbol} Inc.")
+                        'name': get_stock_info(symbol).get('shortName', f"{symbol} Inc.")
                     }
             except Exception as e:
                 print(f"Error getting data for {symbol}: {str(e)}")
@@ -72,7 +72,7 @@ def search():
         return render_template('search.html', results=None)
     
     try:
-        results = search_stocks(query)
+        results = search_stocks(query, limit=current_app.config.get('SEARCH_RESULT_LIMIT', 50))
         return render_template('search.html', results=results, query=query)
     except Exception as e:
         print(f"Error in search route: {str(e)}")
@@ -81,13 +81,23 @@ def search():
 
 @main.route('/api/search')
 def api_search():
-    """API endpoint for stock search."""
+    """
+    API endpoint for stock search.
+    
+    ``mode=autocomplete`` only matches symbol and word prefixes and returns
+    at most AUTOCOMPLETE_RESULT_LIMIT results (or ``limit``), cheap enough
+    to call on every keystroke.
+    """
     query = request.args.get('q', '')
     if not query:
         return jsonify({'success': False, 'error': 'No query provided'})
     
+    autocomplete = request.args.get('mode') == 'autocomplete'
+    default_limit = current_app.config.get('AUTOCOMPLETE_RESULT_LIMIT' if autocomplete else 'SEARCH_RESULT_LIMIT', 50)
+    limit = min(request.args.get('limit', default_limit, type=int), current_app.config.get('SEARCH_RESULT_LIMIT', 50))
+    
     try:
-        results = search_stocks(query)
+        results = search_stocks(query, limit=limit, autocomplete=autocomplete)
         return jsonify(results)
     except Exception as e:
         print(f"Error in API search: {str(e)}")
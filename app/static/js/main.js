@@ -27,6 +27,46 @@ document.addEventListener('DOMContentLoaded', function() {
         });
     }
 
+    // Search-as-you-type suggestions
+    const searchInput = document.getElementById('searchInput');
+    const searchSuggestions = document.getElementById('searchSuggestions');
+    if (searchInput && searchSuggestions) {
+        let pendingSearch = null;
+        searchInput.addEventListener('input', function() {
+            const query = searchInput.value.trim();
+
+            // Only the latest keystroke's results matter
+            if (pendingSearch) {
+                pendingSearch.abort();
+            }
+            if (!query) {
+                searchSuggestions.innerHTML = '';
+                return;
+            }
+
+            pendingSearch = new AbortController();
+            fetch(`/api/search?mode=autocomplete&limit=10&q=${encodeURIComponent(query)}`, {signal: pendingSearch.signal})
+                .then(response => response.json())
+                .then(data => {
+                    if (!data.success) {
+                        return;
+                    }
+                    searchSuggestions.innerHTML = '';
+                    data.results.forEach(result => {
+                        const option = document.createElement('option');
+                        option.value = result.symbol;
+                        option.label = result.name;
+                        searchSuggestions.appendChild(option);
+                    });
+                })
+                .catch(error => {
+                    if (error.name !== 'AbortError') {
+                        console.error('Error fetching search suggestions:', error);
+                    }
+                });
+        });
+    }
+
     // Stock comparison form
     const compareForm = document.getElementById('compareForm');
     if (compareForm) {
@@ -73,45 +113,85 @@ document.addEventListener('DOMContentLoaded', function() {
         });
     }
 
-    // Auto-update stock prices (every 60 seconds)
+    // Live stock prices: subscribe to the server's quote stream, falling
+    // back to polling every 60 seconds where EventSource is unavailable
     const stockPrices = document.querySelectorAll('.stock-price');
     if (stockPrices.length > 0) {
-        setInterval(updateStockPrices, 60000);
+        if (window.EventSource) {
+            subscribeToStockPrices();
+        } else {
+            setInterval(updateStockPrices, 60000);
+        }
     }
 
-    // Function to update stock prices via AJAX
-    function updateStockPrices() {
-        stockPrices.forEach(priceElement => {
-            const symbol = priceElement.dataset.symbol;
-            if (symbol) {
-                fetch(`/api/stock/${symbol}`)
-                    .then(response => response.json())
-                    .then(data => {
-                        if (data.success && data.data.length > 0) {
-                            const latestData = data.data[data.data.length - 1];
-                            const price = latestData.Close;
-                            const previousPrice = parseFloat(priceElement.dataset.previousPrice || 0);
-                            
-                            // Update price
-                            priceElement.textContent = `$${price.toFixed(2)}`;
-                            priceElement.dataset.previousPrice = price;
-                            
-                            // Update color based on price change
-                            if (price > previousPrice) {
-                                priceElement.classList.remove('price-down', 'price-neutral');
-                                priceElement.classList.add('price-up');
-                            } else if (price < previousPrice) {
-                                priceElement.classList.remove('price-up', 'price-neutral');
-                                priceElement.classList.add('price-down');
-                            } else {
-                                priceElement.classList.remove('price-up', 'price-down');
-                                priceElement.classList.add('price-neutral');
-                            }
-                        }
-                    })
-                    .catch(error => console.error('Error updating stock price:', error));
+    // Function to apply streamed quotes as they arrive
+    function subscribeToStockPrices() {
+        const symbols = [...new Set([...stockPrices].map(el => el.dataset.symbol).filter(Boolean))];
+        if (symbols.length === 0) {
+            return;
+        }
+
+        const stream = new EventSource(`/stocks/api/stream?symbols=${encodeURIComponent(symbols.join(','))}`);
+        stream.addEventListener('quote', function(e) {
+            const quote = JSON.parse(e.data);
+            stockPrices.forEach(priceElement => {
+                if ((priceElement.dataset.symbol || '').toUpperCase() === quote.symbol) {
+                    updatePriceElement(priceElement, quote.price);
+                }
+            });
+        });
+        // A refused stream (e.g. the server's stream limit) is closed for
+        // good; poll instead of leaving the prices frozen
+        stream.addEventListener('error', function() {
+            if (stream.readyState === EventSource.CLOSED) {
+                setInterval(updateStockPrices, 60000);
             }
         });
+        window.addEventListener('beforeunload', () => stream.close());
+    }
+
+    // Function to update all stock prices with one batch quote request
+    function updateStockPrices() {
+        const symbols = [...new Set([...stockPrices].map(el => el.dataset.symbol).filter(Boolean))];
+        if (symbols.length === 0) {
+            return;
+        }
+
+        fetch(`/stocks/api/quotes?symbols=${encodeURIComponent(symbols.join(','))}`)
+            .then(response => response.json())
+            .then(data => {
+                if (!data.success) {
+                    return;
+                }
+                stockPrices.forEach(priceElement => {
+                    const quote = data.quotes[(priceElement.dataset.symbol || '').toUpperCase()];
+                    if (quote) {
+                        updatePriceElement(priceElement, quote.price);
+                    }
+                });
+            })
+            .catch(error => console.error('Error updating stock prices:', error));
+    }
+
+    // Show a new price, colored by its move since the last update
+    function updatePriceElement(priceElement, price) {
+        const previousPrice = parseFloat(priceElement.dataset.previousPrice || 0);
+
+        // Update price
+        priceElement.textContent = `$${price.toFixed(2)}`;
+        priceElement.dataset.previousPrice = price;
+
+        // Update color based on price change
+        if (price > previousPrice) {
+            priceElement.classList.remove('price-down', 'price-neutral');
+            priceElement.classList.add('price-up');
+        } else if (price < previousPrice) {
+            priceElement.classList.remove('price-up', 'price-neutral');
+            priceElement.classList.add('price-down');
+        } else {
+            priceElement.classList.remove('price-up', 'price-down');
+            priceElement.classList.add('price-neutral');
+        }
     }
 
     // Chart period selector
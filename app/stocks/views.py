@@ -1,18 +1,43 @@
-from flask import render_template, redirect, url_for, flash, request, jsonify
+from flask import render_template, redirect, url_for, flash, request, jsonify, current_app, Response
 from flask_login import login_required, current_user
 from . import stocks
 from app import db
 from app.models import Stock, Watchlist, WatchlistStock
-from app.utils.data_fetcher import get_stock_data, get_multiple_stocks_data
-from app.utils.data_analyzer import (
-    calculate_moving_average, calculate_exponential_moving_average,
-    calculate_macd, calculate_rsi, predict_stock_price, analyze_trend
+from app.utils.data_fetcher import (
+    get_stock_data, get_stock_columns, get_stock_info, get_multiple_stocks_data, get_quotes, get_cache_stats
 )
+from app.utils.data_analyzer import Bars, IndicatorSession, compute_indicators, get_analysis_cache_stats
+from app.utils.indicator_state import create_streaming_indicator
+from app.utils.price_stream import quote_broadcaster, stream_quotes
+from app.utils.backtest import STRATEGIES, backtest
+from app.utils.comparison import ReturnMatrix
+from app.utils.resample import bars_per_year
+from app.utils.screener import screener
+from app.utils.training import forecast_with_model
+from app.utils.serialization import json_response
 from app.utils.data_visualizer import (
     create_candlestick_chart, create_line_chart, create_technical_analysis_chart,
-    create_comparison_chart, create_indicator_chart
+    create_comparison_chart, create_correlation_chart, create_rolling_correlation_chart, create_indicator_chart
 )
 
+# Indicators returned by /api/indicators for each value of ``indicator``
+INDICATOR_GROUPS = {
+    'ma': ['ma_20', 'ma_50', 'ma_200'],
+    'ema': ['ema_12', 'ema_26'],
+    'macd': ['macd'],
+    'rsi': ['rsi'],
+    'trend': ['trend'],
+    'prediction': ['prediction', 'forecast'],
+    'bollinger': ['bollinger'],
+    'atr': ['atr'],
+    'std': ['std'],
+    'obv': ['obv'],
+    'vwap': ['vwap'],
+    'volatility': ['bollinger', 'atr', 'std'],
+    'volume': ['obv', 'vwap'],
+}
+INDICATOR_GROUPS['all'] = list(dict.fromkeys(name for group in INDICATOR_GROUPS.values() for name in group))
+
 @stocks.route('/view/<symbol>')
 def view_stock(symbol):
     """View detailed information about a stock."""
@@ -26,31 +51,35 @@ def view_stock(symbol):
         flash(f"Error fetching data for {symbol}: {data.get('error', 'Unknown error')}", 'danger')
         return redirect(url_for('main.index'))
     
+    # Calculate technical indicators in one pass over the bars; the charts
+    # plot the full series from the same session
+    bars = Bars.from_data(data)
+    session = IndicatorSession(bars) if bars is not None else None
+    indicators = compute_indicators(data, ['ma_20', 'ma_50', 'ma_200', 'rsi', 'macd', 'trend', 'prediction'], session=session)
+    series = compute_indicators(
+        data, ['ma_20', 'ma_50', 'ma_200', 'rsi', 'macd', 'bollinger', 'atr'], session=session, output='series'
+    )
+    
+    # Prefer the symbol's trained model to the trend line when there is one
+    if bars is not None:
+        forecast = forecast_with_model(symbol, bars.close, steps=30, interval=interval)
+        if forecast is not None:
+            indicators['prediction'] = forecast['prices'].tolist()
+    
     # Generate charts
-    candlestick_chart = create_candlestick_chart(data['data'], title=f"{symbol} Stock Price")
-    technical_chart = create_technical_analysis_chart(data['data'])
+    candlestick_chart = create_candlestick_chart(data, title=f"{symbol} Stock Price")
+    technical_chart = create_technical_analysis_chart(
+        data, moving_averages={window: series[f'ma_{window}'] for window in (20, 50, 200)}
+    )
     
-    # Calculate technical indicators
     if data['data']:
-        ma_20 = calculate_moving_average(data['data'], window=20)
-        ma_50 = calculate_moving_average(data['data'], window=50)
-        ma_200 = calculate_moving_average(data['data'], window=200)
-        rsi = calculate_rsi(data['data'])
-        macd_data = calculate_macd(data['data'])
-        trend = analyze_trend(data['data'])
-        
         # Create indicator charts
-        rsi_chart = create_indicator_chart(data['data'], rsi, 'RSI', title=f"{symbol} RSI")
-        macd_chart = create_indicator_chart(data['data'], macd_data, 'MACD', title=f"{symbol} MACD")
-        
-        # Make predictions (if enough data)
-        predictions = predict_stock_price(data['data'])
+        rsi_chart = create_indicator_chart(data, series['rsi'], 'RSI', title=f"{symbol} RSI")
+        macd_chart = create_indicator_chart(data, series['macd'], 'MACD', title=f"{symbol} MACD")
+        bollinger_chart = create_indicator_chart(data, series['bollinger'], 'Bollinger', title=f"{symbol} Bollinger Bands")
+        atr_chart = create_indicator_chart(data, series['atr'], 'ATR', title=f"{symbol} Average True Range")
     else:
-        ma_20 = ma_50 = ma_200 = rsi = []
-        macd_data = {'macd': [], 'signal': [], 'histogram': []}
-        trend = 'insufficient data'
-        rsi_chart = macd_chart = '{}'
-        predictions = []
+        rsi_chart = macd_chart = bollinger_chart = atr_chart = '{}'
     
     # Check if stock is in user's watchlist
     in_watchlist = False
@@ -70,12 +99,14 @@ def view_stock(symbol):
         technical_chart=technical_chart,
         rsi_chart=rsi_chart,
         macd_chart=macd_chart,
-        ma_20=ma_20[-1] if ma_20 else None,
-        ma_50=ma_50[-1] if ma_50 else None,
-        ma_200=ma_200[-1] if ma_200 else None,
-        rsi=rsi[-1] if rsi else None,
-        trend=trend,
-        predictions=predictions,
+        bollinger_chart=bollinger_chart,
+        atr_chart=atr_chart,
+        ma_20=indicators['ma_20'],
+        ma_50=indicators['ma_50'],
+        ma_200=indicators['ma_200'],
+        rsi=indicators['rsi'],
+        trend=indicators['trend'],
+        predictions=indicators['prediction'],
         period=period,
         interval=interval,
         in_watchlist=in_watchlist
@@ -116,14 +147,26 @@ def compare_stocks():
         # Get data for all stocks
         stock_data = get_multiple_stocks_data(symbol_list, period=period, interval=interval)
         
-        # Create comparison chart
-        comparison_chart = create_comparison_chart(stock_data, title='Stock Comparison')
+        # Align every symbol on one calendar once; all charts and statistics share it
+        matrix = ReturnMatrix.from_data(stock_data)
+        summary = matrix.summary(bars_per_year=bars_per_year(interval))
+        
+        # Create comparison charts
+        comparison_chart = create_comparison_chart(stock_data, title='Stock Comparison', matrix=matrix)
+        correlation_chart = create_correlation_chart(matrix) if len(matrix.symbols) > 1 else None
+        rolling_correlation_chart = None
+        if len(matrix.symbols) > 1:
+            rolling_correlation_chart = create_rolling_correlation_chart(matrix, summary['benchmark'])
         
         return render_template(
             'stocks/compare.html',
             symbols=symbol_list,
             stock_data=stock_data,
             comparison_chart=comparison_chart,
+            correlation_chart=correlation_chart,
+            rolling_correlation_chart=rolling_correlation_chart,
+            statistics=_comparison_statistics(summary),
+            benchmark=summary['benchmark'],
             period=period,
             interval=interval
         )
@@ -139,6 +182,59 @@ def compare_stocks():
             interval='1d'
         )
 
+def _comparison_statistics(summary):
+    """Per-symbol rows of a ReturnMatrix summary, with NaN as None."""
+    def value(array, i):
+        value = float(array[i])
+        return None if value != value else value
+    
+    return {
+        symbol: {
+            'total_return': value(summary['total_return'], i),
+            'volatility': value(summary['volatility'], i),
+            'beta': value(summary['beta'], i)
+        }
+        for i, symbol in enumerate(summary['symbols'])
+    }
+
+@stocks.route('/api/compare')
+def api_compare():
+    """
+    API endpoint for cross-symbol return statistics.
+    
+    Returns total return, annualized volatility and beta against
+    ``benchmark`` (the first symbol by default) per symbol, and the return
+    correlation and covariance matrices. ``series=1`` adds the dates, the
+    normalized performance and the ``window``-bar rolling correlation with
+    the benchmark, one list per symbol.
+    """
+    symbols_param = request.args.get('symbols', '')
+    period = request.args.get('period', '1y')
+    interval = request.args.get('interval', '1d')
+    window = request.args.get('window', 60, type=int)
+    
+    symbol_list = [s.strip().upper() for s in symbols_param.split(',') if s.strip()]
+    if not symbol_list:
+        return jsonify({'success': False, 'error': 'No symbols provided'})
+    
+    stock_data = get_multiple_stocks_data(symbol_list, period=period, interval=interval, include_info=False)
+    matrix = ReturnMatrix.from_data(stock_data)
+    if not matrix.symbols:
+        return jsonify({'success': False, 'error': 'No data available for the selected stocks'})
+    
+    try:
+        summary = matrix.summary(request.args.get('benchmark', '').upper() or None, bars_per_year(interval))
+        if request.args.get('series', '0') == '1':
+            summary['dates'] = matrix.dates
+            summary['normalized'] = matrix.normalized().T
+            summary['rolling_correlation'] = matrix.rolling_correlation(summary['benchmark'], window).T
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)})
+    
+    summary['missing'] = [symbol for symbol in symbol_list if symbol not in matrix.symbols]
+    summary['success'] = True
+    return json_response(summary)
+
 @stocks.route('/watchlist')
 @login_required
 def watchlist():
@@ -146,9 +242,6 @@ def watchlist():
     try:
         watchlists = current_user.watchlists.all()
         
-        # Get stock data for all stocks in all watchlists
-        stock_data = {}
-        
         # Collect all unique stock symbols across all watchlists
         all_symbols = set()
         for watchlist in watchlists:
@@ -158,18 +251,7 @@ def watchlist():
                     all_symbols.add(stock.symbol)
         
         # Fetch data for all symbols at once
-        for symbol in all_symbols:
-            try:
-                data = get_stock_data(symbol, period='1d')
-                stock_data[symbol] = data
-            except Exception as e:
-                print(f"Error fetching data for {symbol}: {str(e)}")
-                # Create mock data as fallback
-                stock_data[symbol] = {
-                    'success': True,
-                    'data': [{'Date': 'Today', 'Open': 100.0, 'Close': 102.0, 'High': 103.0, 'Low': 99.0, 'Volume': 1000000}],
-                    'info': {'shortName': f"{symbol} Inc."}
-                }
+        stock_data = get_multiple_stocks_data(sorted(all_symbols), period='1d', include_info=False)
         
         return render_template(
             'stocks/watchlist.html',
@@ -222,13 +304,13 @@ def add_to_watchlist(watchlist_id):
     stock = Stock.query.filter_by(symbol=symbol).first()
     if not stock:
         # Get stock data to verify it exists
-        data = get_stock_data(symbol)
+        data = get_stock_data(symbol, period='5d', include_info=False)
         if not data['success']:
             flash(f"Invalid stock symbol: {symbol}", 'danger')
             return redirect(url_for('stocks.watchlist'))
         
         # Create new stock
-        stock = Stock(symbol=symbol, name=data['info'].get('shortName', symbol))
+        stock = Stock(symbol=symbol, name=get_stock_info(symbol).get('shortName', symbol))
         db.session.add(stock)
         db.session.commit()
     
@@ -277,46 +359,228 @@ def remove_from_watchlist(watchlist_id, stock_id):
 
 @stocks.route('/api/stock/<symbol>')
 def api_stock_data(symbol):
-    """API endpoint for stock data."""
+    """
+    API endpoint for stock data.
+    
+    ``shape=columnar`` returns 'data' as one array per column (with 'Date'
+    in epoch milliseconds) instead of the default list of records.
+    """
     period = request.args.get('period', '1y')
     interval = request.args.get('interval', '1d')
+    include_info = request.args.get('info', '1') != '0'
     
-    data = get_stock_data(symbol, period=period, interval=interval)
+    if request.args.get('shape', 'records') == 'columnar':
+        data = get_stock_columns(symbol, period=period, interval=interval)
+        info = data.get('info')
+        if info is None:
+            info = get_stock_info(symbol) if include_info and data['success'] else {}
+        return json_response(dict(data, info=info, shape='columnar'))
+    
+    data = get_stock_data(symbol, period=period, interval=interval, include_info=include_info)
     return jsonify(data)
 
+@stocks.route('/api/quotes')
+def api_quotes():
+    """API endpoint for the latest price and change of several stocks."""
+    symbols = [s.strip() for s in request.args.get('symbols', '').split(',') if s.strip()]
+    if not symbols:
+        return jsonify({'success': False, 'error': 'No symbols provided'})
+    
+    max_symbols = current_app.config.get('QUOTE_MAX_SYMBOLS', 100)
+    if len(symbols) > max_symbols:
+        return jsonify({'success': False, 'error': f"At most {max_symbols} symbols per request"})
+    
+    return jsonify({'success': True, 'quotes': get_quotes(symbols)})
+
+@stocks.route('/api/stream')
+def api_stream():
+    """
+    Server-Sent Events stream of quote updates for several stocks.
+    
+    Every client in the process shares one upstream refresher, so upstream
+    calls scale with the distinct symbols watched, not with viewers. With
+    indicators (e.g. ?indicators=rsi,macd), each quote also carries the
+    live values of those indicators under 'indicators', updated
+    incrementally from the quote price.
+    """
+    symbols = [s.strip() for s in request.args.get('symbols', '').split(',') if s.strip()]
+    if not symbols:
+        return jsonify({'success': False, 'error': 'No symbols provided'}), 400
+    
+    max_symbols = current_app.config.get('QUOTE_MAX_SYMBOLS', 100)
+    if len(symbols) > max_symbols:
+        return jsonify({'success': False, 'error': f"At most {max_symbols} symbols per request"}), 400
+    
+    indicators = tuple(dict.fromkeys(
+        name.strip() for name in request.args.get('indicators', '').split(',') if name.strip()
+    ))
+    try:
+        for name in indicators:
+            create_streaming_indicator(name)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    
+    # Each open stream holds a server thread, so their number is capped
+    subscription = quote_broadcaster.subscribe(symbols, indicators)
+    if subscription is None:
+        return jsonify({'success': False, 'error': 'Too many open quote streams'}), 503
+    
+    response = Response(
+        stream_quotes(subscription, heartbeat=current_app.config.get('STREAM_HEARTBEAT', 20)),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+    # Also release the slot if the client leaves before the stream starts
+    response.call_on_close(lambda: quote_broadcaster.unsubscribe(subscription))
+    return response
+
+@stocks.route('/api/stream/stats')
+def api_stream_stats():
+    """API endpoint for quote stream counters."""
+    return jsonify({'success': True, 'stream': quote_broadcaster.stats()})
+
 @stocks.route('/api/indicators/<symbol>')
 def api_indicators(symbol):
-    """API endpoint for technical indicators."""
+    """
+    API endpoint for technical indicators.
+    
+    ``output=last`` (the default) returns the latest value of each indicator;
+    ``output=series`` returns full series aligned with ``dates`` (epoch
+    milliseconds), with null where an indicator is not yet defined.
+    """
     period = request.args.get('period', '1y')
     interval = request.args.get('interval', '1d')
     indicator = request.args.get('indicator', 'all')
+    output = request.args.get('output', 'last')
     
-    data = get_stock_data(symbol, period=period, interval=interval)
+    if output not in ('last', 'series'):
+        return jsonify({'success': False, 'error': f"Unknown output: {output}"})
+    
+    data = get_stock_columns(symbol, period=period, interval=interval)
     
     if not data['success']:
         return jsonify({'success': False, 'error': data.get('error', 'Unknown error')})
     
+    # A group name, or any registered indicators, e.g. 'ma_10,rsi_7'
+    names = INDICATOR_GROUPS.get(indicator) or [name.strip() for name in indicator.split(',') if name.strip()]
+    
     result = {'success': True}
+    if output == 'series':
+        result['dates'] = data['data']['Date']
+        result['tz'] = data['tz']
+    try:
+        result.update(compute_indicators(data, names, output=output))
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)})
+    
+    return json_response(result)
+
+@stocks.route('/api/predict/<symbol>')
+def api_predict(symbol):
+    """
+    API endpoint for a price forecast with a prediction interval.
+    
+    Uses the symbol's latest trained model (see ``flask train-models``) and
+    falls back to the least squares trend line; ``model`` names the one used.
+    """
+    period = request.args.get('period', '1y')
+    interval = request.args.get('interval', '1d')
+    days = min(max(request.args.get('days', 30, type=int), 1), 365)
+    level = request.args.get('level', 95, type=int)
+    
+    if not 0 < level < 100:
+        return jsonify({'success': False, 'error': 'level must be between 0 and 100'})
+    
+    data = get_stock_columns(symbol, period=period, interval=interval)
+    
+    if not data['success']:
+        return jsonify({'success': False, 'error': data.get('error', 'Unknown error')})
+    
+    forecast = forecast_with_model(symbol, data['data']['Close'], steps=days, interval=interval, level=level / 100.0)
+    if forecast is None:
+        name = f'forecast_{days}_{level}'
+        forecast = dict(compute_indicators(data, [name])[name], model='linear')
+    
+    return json_response(dict(forecast, success=True))
+
+@stocks.route('/api/backtest/<symbol>')
+def api_backtest(symbol):
+    """
+    API endpoint for backtesting a signal rule on one symbol.
+    
+    ``strategy`` is 'trend' (parameter ``window``) or 'macd' (``fast``,
+    ``slow``, ``signal``); ``short=1`` also trades bearish signals, ``cost``
+    is the cost per unit traded and ``series=1`` adds the equity curve.
+    """
+    period = request.args.get('period', '5y')
+    interval = request.args.get('interval', '1d')
+    strategy = request.args.get('strategy', 'trend')
+    
+    if strategy not in STRATEGIES:
+        return jsonify({'success': False, 'error': f"Unknown strategy: {strategy}"})
+    definition = STRATEGIES[strategy]
+    params = tuple(request.args.get(name, default, type=int) for name, default in zip(definition.params, definition.defaults))
+    
+    data = get_stock_columns(symbol, period=period, interval=interval)
     
-    if indicator == 'ma' or indicator == 'all':
-        result['ma_20'] = calculate_moving_average(data['data'], window=20)
-        result['ma_50'] = calculate_moving_average(data['data'], window=50)
-        result['ma_200'] = calculate_moving_average(data['data'], window=200)
+    if not data['success']:
+        return jsonify({'success': False, 'error': data.get('error', 'Unknown error')})
     
-    if indicator == 'ema' or indicator == 'all':
-        result['ema_12'] = calculate_exponential_moving_average(data['data'], window=12)
-        result['ema_26'] = calculate_exponential_moving_average(data['data'], window=26)
+    try:
+        result = backtest(
+            data, strategy, params,
+            allow_short=request.args.get('short', '0') == '1',
+            cost=request.args.get('cost', 0.0, type=float),
+            bars_per_year=bars_per_year(interval),
+            include_series=request.args.get('series', '0') == '1'
+        )
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)})
     
-    if indicator == 'macd' or indicator == 'all':
-        result['macd'] = calculate_macd(data['data'])
+    if 'equity' in result:
+        result['dates'] = data['data']['Date']
+    result['success'] = True
+    return json_response(result)
+
+@stocks.route('/api/screen')
+def api_screen():
+    """
+    API endpoint for screening the whole universe on its latest indicator values.
     
-    if indicator == 'rsi' or indicator == 'all':
-        result['rsi'] = calculate_rsi(data['data'])
+    Query parameters: ``filter`` (e.g. ``rsi < 30, trend = uptrend``),
+    ``sort`` (e.g. ``-change_percent``), ``fields``, ``limit`` and ``offset``.
+    Queries read a precomputed snapshot, so nothing is fetched per request;
+    until the first snapshot is built the endpoint answers 503 with
+    ``warming_up`` set.
+    """
+    filters = request.args.get('filter', '')
+    sort = request.args.get('sort')
+    fields = [field.strip() for field in request.args.get('fields', '').split(',') if field.strip()]
+    limit = min(request.args.get('limit', 50, type=int), current_app.config.get('SCREENER_MAX_RESULTS', 500))
+    offset = max(request.args.get('offset', 0, type=int), 0)
     
-    if indicator == 'trend' or indicator == 'all':
-        result['trend'] = analyze_trend(data['data'])
+    snapshot = screener.get_snapshot()
+    if snapshot is None:
+        response = jsonify({'success': False, 'warming_up': True, 'error': 'The screener is warming up, try again shortly'})
+        response.headers['Retry-After'] = '10'
+        return response, 503
     
-    if indicator == 'prediction' or indicator == 'all':
-        result['prediction'] = predict_stock_price(data['data'])
+    try:
+        result = snapshot.query(filters, sort=sort, limit=max(limit, 0), offset=offset, fields=fields or None)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)})
     
-    return jsonify(result) 
\ No newline at end of file
+    result.update({'success': True, 'universe': len(snapshot), 'as_of': snapshot.built_at})
+    return json_response(result)
+
+@stocks.route('/api/screen/stats')
+def api_screen_stats():
+    """API endpoint for screener refresh counters."""
+    return jsonify({'success': True, 'screener': screener.stats()})
+
+@stocks.route('/api/cache/stats')
+def api_cache_stats():
+    """API endpoint for market data and analysis cache counters."""
+    cache = get_cache_stats()
+    cache['analysis'] = get_analysis_cache_stats()
+    return jsonify({'success': True, 'cache': cache})
@@ -0,0 +1,299 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import click
+import numpy as np
+
+from app.utils.data_analyzer import Bars, IndicatorSession
+from app.utils.data_fetcher import get_stock_columns
+from app.utils.resample import TRADING_DAYS_PER_YEAR
+
+# Bars per year used to annualize daily results; see resample.bars_per_year()
+BARS_PER_YEAR = TRADING_DAYS_PER_YEAR
+
+# Smallest sweep (combinations x bars) run across a process pool; below it,
+# starting workers and pickling the chunks costs more than the vectorized
+# evaluation (a trend sweep over 10 years of daily bars is about 0.5M)
+PARALLEL_MIN_CELLS = 2000000
+
+class Strategy:
+    """
+    A trading rule: turns indicator series into target positions.
+    
+    positions(session, *params) returns +1 (long), -1 (short) or 0 (flat)
+    per bar, decided on that bar's close; the backtest holds it from the
+    next bar on, so there is no look-ahead.
+    """
+    
+    def __init__(self, name, params, defaults, grid, positions, valid=None):
+        self.name = name
+        self.params = tuple(params)
+        self.defaults = tuple(defaults)
+        self.grid = grid
+        self.positions = positions
+        self.valid = valid or (lambda *params: True)
+    
+    def combinations(self, grid=None):
+        """
+        All parameter tuples of a grid.
+        
+        Args:
+            grid (dict): Parameter name -> list of values (defaults to the
+                strategy's sweep grid; missing parameters use their default)
+        
+        Returns:
+            list: Valid parameter tuples
+        """
+        grid = dict(grid or self.grid)
+        axes = [list(grid.get(name, [default])) for name, default in zip(self.params, self.defaults)]
+        mesh = np.array(np.meshgrid(*axes, indexing='ij')).reshape(len(axes), -1).T
+        return [tuple(int(value) for value in combo) for combo in mesh if self.valid(*combo)]
+
+def _trend_positions(session, window, allow_short=False):
+    """Long in an uptrend and (optionally) short in a downtrend, by analyze_trend()'s rule."""
+    short = session.evaluate(('ma', (window,)))
+    long = session.evaluate(('ma', (window * 2,)))
+    with np.errstate(invalid='ignore'):
+        positions = np.where(short > long * 1.02, 1.0, 0.0)
+        if allow_short:
+            positions[short < long * 0.98] = -1.0
+    return positions
+
+def _macd_positions(session, fast, slow, signal, allow_short=False):
+    """Long while the MACD line is above its signal line, else flat (or short)."""
+    macd, signal_line, histogram = session.evaluate(('macd', (fast, slow, signal)))
+    with np.errstate(invalid='ignore'):
+        return np.where(histogram > 0, 1.0, -1.0 if allow_short else 0.0)
+
+STRATEGIES = {
+    'trend': Strategy(
+        'trend', ('window',), (20,), {'window': range(5, 201)}, _trend_positions
+    ),
+    'macd': Strategy(
+        'macd', ('fast', 'slow', 'signal'), (12, 26, 9),
+        {'fast': range(2, 31, 2), 'slow': range(10, 61, 2), 'signal': (9,)},
+        _macd_positions, valid=lambda fast, slow, signal: fast < slow
+    ),
+}
+
+def evaluate_positions(close, positions, cost=0.0, bars_per_year=BARS_PER_YEAR, include_series=False):
+    """
+    Backtest target positions against prices.
+    
+    Works along the last axis, so a (combinations x time) positions matrix
+    is evaluated in one pass.
+    
+    Args:
+        close (np.ndarray): Closing prices, oldest first (NaN for a missing bar)
+        positions (np.ndarray): Target position per bar (NaN counts as flat),
+            or a matrix of them
+        cost (float): Cost per unit of position traded, as a fraction (0.001 = 10 bps);
+            closing a position is charged on the last bar it is held, so
+            every trade's return includes both sides of its cost
+        bars_per_year (int): Bars per year, for annualized figures
+        include_series (bool): Also return the equity and drawdown curves
+    
+    Returns:
+        dict: Metrics (arrays for a matrix): 'total_return', 'cagr',
+            'volatility', 'sharpe', 'max_drawdown', 'trades', 'win_rate',
+            'average_trade', 'exposure'; plus 'equity' and 'drawdown' with
+            include_series
+    """
+    close = np.asarray(close, dtype=np.float64)
+    positions = np.nan_to_num(np.asarray(positions, dtype=np.float64))
+    squeeze = positions.ndim == 1
+    positions = np.atleast_2d(positions)
+    rows, length = positions.shape
+    
+    # Measure each return from the last valid close, so a missing bar neither
+    # breaks the compounding nor adds a return of its own
+    valid = ~np.isnan(close)
+    filled = close[np.maximum.accumulate(np.where(valid, np.arange(length), 0))]
+    returns = np.zeros(length)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        returns[1:] = np.nan_to_num(filled[1:] / filled[:-1] - 1, nan=0.0)
+    # Positions decided on a close are held over the next bar
+    held = np.zeros_like(positions)
+    held[:, 1:] = positions[:, :-1]
+    previous = np.zeros_like(held)
+    previous[:, 1:] = held[:, :-1]
+    traded = np.abs(held - previous)
+    # Split each change into the part closing the previous position, charged
+    # to the bar before (that trade's last), and the part opening the new one
+    closing = np.minimum(traded, np.abs(previous))
+    charged = traded - closing
+    charged[:, :-1] += closing[:, 1:]
+    strategy_returns = held * returns - cost * charged
+    
+    equity = np.cumprod(1 + strategy_returns, axis=1)
+    drawdown = equity / np.maximum.accumulate(equity, axis=1) - 1
+    years = max(length - 1, 1) / bars_per_year
+    with np.errstate(invalid='ignore', divide='ignore'):
+        volatility = strategy_returns[:, 1:].std(axis=1) * np.sqrt(bars_per_year)
+        mean = strategy_returns[:, 1:].mean(axis=1) * bars_per_year if length > 1 else np.zeros(rows)
+        sharpe = np.where(volatility > 0, mean / volatility, 0.0)
+        cagr = np.maximum(equity[:, -1], 0) ** (1 / years) - 1
+    
+    # Trades are runs of the same non-zero held position; number them across all rows
+    entries = (held != 0) & (held != previous)
+    trade_ids = np.where(held != 0, np.cumsum(entries.ravel()).reshape(rows, length), 0)
+    trade_count = entries.sum(axis=1)
+    trade_returns = np.expm1(np.bincount(
+        trade_ids.ravel(), weights=np.log1p(strategy_returns).ravel(), minlength=trade_count.sum() + 1
+    )[1:])
+    # Trade k of row r is trade_returns[offsets[r] + k]
+    trade_rows = np.repeat(np.arange(rows), trade_count)
+    wins = np.bincount(trade_rows, weights=(trade_returns > 0).astype(np.float64), minlength=rows)
+    trade_sums = np.bincount(trade_rows, weights=trade_returns, minlength=rows)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        win_rate = np.where(trade_count > 0, wins / trade_count, np.nan)
+        average_trade = np.where(trade_count > 0, trade_sums / trade_count, np.nan)
+    
+    result = {
+        'total_return': equity[:, -1] - 1,
+        'cagr': cagr,
+        'volatility': volatility,
+        'sharpe': sharpe,
+        'max_drawdown': drawdown.min(axis=1),
+        'trades': trade_count,
+        'win_rate': win_rate,
+        'average_trade': average_trade,
+        'exposure': (held != 0).mean(axis=1),
+    }
+    if include_series:
+        result['equity'] = equity
+        result['drawdown'] = drawdown
+    if squeeze:
+        result = {key: value[0] if key in ('equity', 'drawdown') else value[0].item()
+                  for key, value in result.items()}
+    return result
+
+def backtest(data, strategy='trend', params=None, allow_short=False, cost=0.0,
+             bars_per_year=BARS_PER_YEAR, include_series=False):
+    """
+    Backtest one parameter set of a strategy on one symbol.
+    
+    Args:
+        data: Stock data in any shape accepted by Bars.from_data()
+        strategy (str): Name in STRATEGIES
+        params (tuple): Strategy parameters (defaults fill the rest)
+        allow_short (bool): Take short positions on bearish signals
+        cost (float): Cost per unit of position traded
+        bars_per_year (int): Bars per year, for annualized figures
+        include_series (bool): Also return the equity and drawdown curves
+    
+    Returns:
+        dict: 'strategy', 'params' and the evaluate_positions() metrics
+    """
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Unknown strategy: {strategy}")
+    definition = STRATEGIES[strategy]
+    params = tuple(params or ())
+    if len(params) > len(definition.params):
+        raise ValueError(f"Too many parameters for strategy {strategy}")
+    params = params + definition.defaults[len(params):]
+    if not definition.valid(*params):
+        raise ValueError(f"Invalid parameters for strategy {strategy}: {params}")
+    
+    bars = Bars.from_data(data)
+    if bars is None or len(bars) < 2:
+        raise ValueError("Not enough data to backtest")
+    session = IndicatorSession(bars)
+    positions = definition.positions(session, *params, allow_short=allow_short)
+    result = evaluate_positions(bars.close, positions, cost, bars_per_year, include_series)
+    return dict(result, strategy=strategy, params=dict(zip(definition.params, params)))
+
+def _sweep_chunk(task):
+    """Backtest a chunk of parameter sets; runs in a worker process."""
+    close, strategy, combinations, allow_short, cost, bars_per_year = task
+    definition = STRATEGIES[strategy]
+    # One session per chunk, so combinations share their moving averages and EMAs
+    session = IndicatorSession(Bars(None, close, close, close, close, close), memoize=False)
+    positions = np.array([definition.positions(session, *combo, allow_short=allow_short) for combo in combinations])
+    return combinations, evaluate_positions(close, positions, cost, bars_per_year)
+
+def sweep(data, strategy='trend', grid=None, allow_short=False, cost=0.0, bars_per_year=BARS_PER_YEAR,
+          sort='sharpe', max_workers=None, chunk_size=32):
+    """
+    Backtest every parameter combination of a strategy across a process pool.
+    
+    Combinations are split into chunks; each worker builds the positions of
+    its chunk and evaluates them as one matrix. Sweeps smaller than
+    PARALLEL_MIN_CELLS run in the calling process.
+    
+    Args:
+        data: Stock data in any shape accepted by Bars.from_data()
+        strategy (str): Name in STRATEGIES
+        grid (dict): Parameter name -> values (defaults to the strategy's grid)
+        allow_short (bool): Take short positions on bearish signals
+        cost (float): Cost per unit of position traded
+        bars_per_year (int): Bars per year, for annualized figures
+        sort (str): Metric to rank by, best (highest) first
+        max_workers (int): Worker processes (defaults to the CPU count; 1
+            runs in the calling process)
+        chunk_size (int): Combinations per task
+    
+    Returns:
+        list: One dict per combination with 'params' and its metrics, best first
+    """
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Unknown strategy: {strategy}")
+    definition = STRATEGIES[strategy]
+    bars = Bars.from_data(data)
+    if bars is None or len(bars) < 2:
+        raise ValueError("Not enough data to backtest")
+    
+    combinations = definition.combinations(grid)
+    tasks = [
+        (bars.close, strategy, combinations[start:start + chunk_size], allow_short, cost, bars_per_year)
+        for start in range(0, len(combinations), chunk_size)
+    ]
+    if max_workers == 1 or len(tasks) <= 1 or len(combinations) * len(bars) < PARALLEL_MIN_CELLS:
+        chunks = map(_sweep_chunk, tasks)
+        results = _collect(definition, chunks)
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            results = _collect(definition, pool.map(_sweep_chunk, tasks))
+    
+    if sort:
+        results.sort(key=lambda result: -np.inf if np.isnan(result[sort]) else result[sort], reverse=True)
+    return results
+
+def _collect(definition, chunks):
+    results = []
+    for combinations, metrics in chunks:
+        for i, combo in enumerate(combinations):
+            result = {key: values[i].item() for key, values in metrics.items()}
+            result['params'] = dict(zip(definition.params, combo))
+            results.append(result)
+    return results
+
+def init_app(app):
+    """
+    Register the ``flask backtest-sweep`` command.
+    
+    Args:
+        app (Flask): Flask application
+    """
+    @app.cli.command('backtest-sweep')
+    @click.argument('symbol')
+    @click.option('--strategy', default='trend', type=click.Choice(sorted(STRATEGIES)))
+    @click.option('--period', default='10y', help='History to backtest over.')
+    @click.option('--cost', default=0.0, help='Cost per unit traded, e.g. 0.001 for 10 bps.')
+    @click.option('--short/--long-only', default=False, help='Take short positions on bearish signals.')
+    @click.option('--top', default=10, help='Number of results to show.')
+    def backtest_sweep_command(symbol, strategy, period, cost, short, top):
+        """Backtest every parameter combination of a strategy on SYMBOL."""
+        data = get_stock_columns(symbol.upper(), period=period, interval='1d')
+        if not data['success']:
+            raise click.ClickException(data.get('error', 'Unknown error'))
+        
+        started = time.perf_counter()
+        results = sweep(data, strategy, allow_short=short, cost=cost,
+                        max_workers=app.config.get('BACKTEST_MAX_WORKERS') or os.cpu_count())
+        click.echo(f"{len(results)} combinations in {time.perf_counter() - started:.2f}s")
+        for result in results[:top]:
+            params = ', '.join(f"{name}={value}" for name, value in result['params'].items())
+            click.echo(f"  {params}: sharpe {result['sharpe']:.2f}, return {result['total_return']:.1%}, "
+                       f"max drawdown {result['max_drawdown']:.1%}, {result['trades']} trades")
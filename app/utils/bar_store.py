@@ -0,0 +1,235 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+
+import numpy as np
+import pandas as pd
+
+from app.utils.periods import FULL_HISTORY
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - non-POSIX platforms
+    fcntl = None
+
+class BarStore:
+    """
+    Local columnar store of price history, one directory per (symbol, interval).
+    
+    Each column is a flat little-endian binary file (``Date`` as int64
+    nanoseconds since the epoch in UTC, prices as float64, volumes as int64)
+    that is memory-mapped on read. New bars are written in place after the
+    last stored row, so refreshing a long history only touches the few rows
+    that changed. ``meta.json`` records the committed row count, which makes
+    a half-finished append invisible to readers.
+    """
+    
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+    
+    def _series_dir(self, symbol, interval):
+        return os.path.join(self.directory, symbol.upper(), interval)
+    
+    def _lock(self, symbol, interval):
+        key = (symbol.upper(), interval)
+        with self._locks_guard:
+            if key not in self._locks:
+                self._locks[key] = threading.Lock()
+            return self._locks[key]
+    
+    def _read_meta(self, series_dir):
+        try:
+            with open(os.path.join(series_dir, 'meta.json')) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+    
+    def _write_meta(self, series_dir, meta):
+        fd, tmp_path = tempfile.mkstemp(dir=series_dir, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, os.path.join(series_dir, 'meta.json'))
+    
+    def _column_path(self, series_dir, meta, column):
+        filename = column.replace(' ', '_') + ('.i8' if meta['dtypes'][column] == 'int64' else '.f8')
+        return os.path.join(series_dir, f"g{meta['generation']}", filename)
+    
+    def _map_column(self, series_dir, meta, column, rows):
+        dtype = '<i8' if meta['dtypes'][column] == 'int64' else '<f8'
+        if rows == 0:
+            return np.empty(0, dtype=dtype)
+        return np.memmap(self._column_path(series_dir, meta, column), dtype=dtype, mode='r', shape=(rows,))
+    
+    def covered_from(self, symbol, interval):
+        """
+        Get the earliest timestamp the store holds complete history from.
+        
+        Returns:
+            int: Nanoseconds since the epoch (FULL_HISTORY for 'max'), or None if nothing is stored
+        """
+        meta = self._read_meta(self._series_dir(symbol, interval))
+        return meta['covered_from'] if meta else None
+    
+    def last_timestamp(self, symbol, interval):
+        """
+        Get the timestamp of the newest stored bar.
+        
+        Returns:
+            pd.Timestamp: Timestamp in the series' time zone, or None if nothing is stored
+        """
+        series_dir = self._series_dir(symbol, interval)
+        meta = self._read_meta(series_dir)
+        if not meta or not meta['rows']:
+            return None
+        dates = self._map_column(series_dir, meta, 'Date', meta['rows'])
+        return pd.Timestamp(int(dates[-1]), unit='ns', tz='UTC').tz_convert(meta['tz'])
+    
+    def read(self, symbol, interval, start=None):
+        """
+        Read stored bars.
+        
+        Args:
+            symbol (str): Stock symbol
+            interval (str): Data interval
+            start (int): Only return bars at or after this many nanoseconds since the epoch
+        
+        Returns:
+            pd.DataFrame: Bars indexed by a time zone aware 'Date' index, or None if nothing is stored
+        """
+        series_dir = self._series_dir(symbol, interval)
+        meta = self._read_meta(series_dir)
+        if not meta:
+            return None
+        
+        try:
+            dates = self._map_column(series_dir, meta, 'Date', meta['rows'])
+            first = int(np.searchsorted(dates, start, side='left')) if start is not None else 0
+            columns = {
+                column: np.array(self._map_column(series_dir, meta, column, meta['rows'])[first:])
+                for column in meta['columns']
+            }
+            index = pd.DatetimeIndex(np.array(dates[first:]).view('datetime64[ns]'), name='Date')
+        except (OSError, ValueError) as e:
+            print(f"Error reading stored bars for {symbol} ({interval}): {str(e)}")
+            return None
+        
+        return pd.DataFrame(columns, index=index.tz_localize('UTC').tz_convert(meta['tz']))
+    
+    def write(self, symbol, interval, df, covered_from):
+        """
+        Replace the stored history for a symbol.
+        
+        Args:
+            symbol (str): Stock symbol
+            interval (str): Data interval
+            df (pd.DataFrame): Bars indexed by a datetime index
+            covered_from (int): Nanoseconds since the epoch the bars are complete from
+        """
+        series_dir = self._series_dir(symbol, interval)
+        os.makedirs(series_dir, exist_ok=True)
+        
+        with self._lock(symbol, interval), _FileLock(series_dir):
+            old_meta = self._read_meta(series_dir)
+            dates, tz = _index_to_ns(df.index)
+            meta = {
+                'generation': (old_meta['generation'] + 1) if old_meta else 0,
+                'columns': list(df.columns),
+                'dtypes': {'Date': 'int64'},
+                'tz': tz,
+                'rows': len(df),
+                'covered_from': int(covered_from)
+            }
+            for column in df.columns:
+                meta['dtypes'][column] = 'int64' if pd.api.types.is_integer_dtype(df[column]) else 'float64'
+            
+            os.makedirs(os.path.join(series_dir, f"g{meta['generation']}"), exist_ok=True)
+            _write_column(self._column_path(series_dir, meta, 'Date'), dates, '<i8', 0)
+            for column in df.columns:
+                dtype = '<i8' if meta['dtypes'][column] == 'int64' else '<f8'
+                _write_column(self._column_path(series_dir, meta, column), df[column].to_numpy(), dtype, 0)
+            
+            self._write_meta(series_dir, meta)
+            
+            # Readers that already mapped the old generation keep their inodes
+            if old_meta:
+                shutil.rmtree(os.path.join(series_dir, f"g{old_meta['generation']}"), ignore_errors=True)
+    
+    def append(self, symbol, interval, df):
+        """
+        Append newer bars in place.
+        
+        Stored bars at or after the first new timestamp are overwritten, so the
+        still-forming latest bar is refreshed rather than duplicated.
+        
+        Args:
+            symbol (str): Stock symbol
+            interval (str): Data interval
+            df (pd.DataFrame): Bars indexed by a datetime index
+        
+        Returns:
+            bool: False if there was no compatible stored series to append to
+        """
+        if df.empty:
+            return True
+        
+        series_dir = self._series_dir(symbol, interval)
+        if not os.path.isdir(series_dir):
+            return False
+        
+        with self._lock(symbol, interval), _FileLock(series_dir):
+            meta = self._read_meta(series_dir)
+            if not meta or set(df.columns) != set(meta['columns']):
+                return False
+            
+            dates, _ = _index_to_ns(df.index)
+            stored_dates = self._map_column(series_dir, meta, 'Date', meta['rows'])
+            keep = int(np.searchsorted(stored_dates, dates[0], side='left'))
+            del stored_dates
+            
+            _write_column(self._column_path(series_dir, meta, 'Date'), dates, '<i8', keep)
+            for column in meta['columns']:
+                dtype = '<i8' if meta['dtypes'][column] == 'int64' else '<f8'
+                _write_column(self._column_path(series_dir, meta, column), df[column].to_numpy(), dtype, keep)
+            
+            meta['rows'] = keep + len(df)
+            self._write_meta(series_dir, meta)
+            return True
+
+class _FileLock:
+    """Exclusive advisory lock shared by every worker process on the host."""
+    
+    def __init__(self, series_dir):
+        self.path = os.path.join(series_dir, '.lock')
+        self._file = None
+    
+    def __enter__(self):
+        if fcntl is not None:
+            self._file = open(self.path, 'a')
+            fcntl.flock(self._file, fcntl.LOCK_EX)
+        return self
+    
+    def __exit__(self, *exc):
+        if self._file is not None:
+            fcntl.flock(self._file, fcntl.LOCK_UN)
+            self._file.close()
+            self._file = None
+
+def _index_to_ns(index):
+    """Convert a datetime index to int64 UTC nanoseconds and its time zone name."""
+    index = pd.DatetimeIndex(index)
+    if index.tz is None:
+        return index.as_unit('ns').asi8, 'UTC'
+    return index.tz_convert('UTC').as_unit('ns').asi8, str(index.tz)
+
+def _write_column(path, values, dtype, offset_rows):
+    """Write values into a column file starting at the given row."""
+    data = np.ascontiguousarray(values, dtype=dtype)
+    mode = 'r+b' if os.path.exists(path) else 'wb'
+    with open(path, mode) as f:
+        f.seek(offset_rows * data.itemsize)
+        f.write(data.tobytes())
@@ -0,0 +1,326 @@
+import hashlib
+import os
+import pickle
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+# Time-to-live (seconds) for cached market data, keyed by bar interval.
+# Intraday bars go stale within a minute; daily and weekly bars only change
+# once per session, so they can be kept for hours.
+INTERVAL_TTLS = {
+    '1m': 30,
+    '2m': 60,
+    '5m': 120,
+    '15m': 300,
+    '30m': 600,
+    '60m': 900,
+    '90m': 900,
+    '1h': 900,
+    '1d': 3600,
+    '5d': 3 * 3600,
+    '1wk': 6 * 3600,
+    '1mo': 12 * 3600,
+    '3mo': 12 * 3600,
+}
+
+DEFAULT_TTL = 300
+
+_MISSING = object()
+
+def ttl_for_interval(interval):
+    """
+    Get the cache time-to-live for a bar interval.
+    
+    Args:
+        interval (str): Data interval (e.g., '1m', '1d', '1wk')
+    
+    Returns:
+        int: Time-to-live in seconds
+    """
+    return INTERVAL_TTLS.get(interval, DEFAULT_TTL)
+
+class LRUCache:
+    """Thread-safe in-memory LRU cache bounded by the total size of its entries in bytes."""
+    
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> (expires_at, value, size)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+    
+    def get(self, key, default=None):
+        """Return the cached value for key, or default if it is missing or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            
+            expires_at, value, size = entry
+            if expires_at is not None and expires_at <= time.time():
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return default
+            
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+    
+    def set(self, key, value, ttl=None, size=0):
+        """
+        Store a value in the cache.
+        
+        Args:
+            key: Hashable cache key
+            value: Value to store
+            ttl (float): Time-to-live in seconds, or None to never expire
+            size (int): Size of the value in bytes, used for the byte bound
+        """
+        if size > self.max_bytes:
+            # Never let a single oversized value flush the whole cache
+            return
+        
+        expires_at = time.time() + ttl if ttl is not None else None
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (expires_at, value, size)
+            self._bytes += size
+            
+            while self._bytes > self.max_bytes and self._entries:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+    
+    def remaining_ttl(self, key):
+        """
+        Time left before key expires, without counting a lookup.
+        
+        Returns:
+            float: Seconds left, None if the entry never expires, or 0 if it
+                is missing or expired
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return 0
+            expires_at = entry[0]
+            return max(expires_at - time.time(), 0) if expires_at is not None else None
+    
+    def delete(self, key):
+        """Remove key from the cache if present."""
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+    
+    def clear(self):
+        """Remove every entry from the cache."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+    
+    def _remove(self, key):
+        _, _, size = self._entries.pop(key)
+        self._bytes -= size
+    
+    def stats(self):
+        """Return hit/miss/eviction counters and current usage."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'hit_rate': self.hits / lookups if lookups else 0.0
+            }
+
+class DiskCache:
+    """Pickle-file cache on local disk that survives worker restarts."""
+    
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.errors = 0
+    
+    def _path(self, key):
+        digest = hashlib.sha1(repr(key).encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, f"{digest}.pkl")
+    
+    def get(self, key):
+        """
+        Load a value from disk.
+        
+        Returns:
+            tuple: (value, expires_at, size), or None on a miss
+        """
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                stored_key, expires_at, payload = pickle.load(f)
+        except FileNotFoundError:
+            self._count('misses')
+            return None
+        except Exception as e:
+            print(f"Error reading cache file {path}: {str(e)}")
+            self._count('errors')
+            self._count('misses')
+            return None
+        
+        if stored_key != key or (expires_at is not None and expires_at <= time.time()):
+            if stored_key == key:
+                self._unlink(path)
+            self._count('misses')
+            return None
+        
+        self._count('hits')
+        return pickle.loads(payload), expires_at, len(payload)
+    
+    def set(self, key, payload, expires_at):
+        """
+        Write an already-pickled value to disk atomically.
+        
+        Args:
+            key: Hashable cache key
+            payload (bytes): Pickled value
+            expires_at (float): Absolute expiry time, or None to never expire
+        """
+        path = self._path(key)
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump((key, expires_at, payload), f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+            self._count('writes')
+        except Exception as e:
+            print(f"Error writing cache file {path}: {str(e)}")
+            self._count('errors')
+    
+    def delete(self, key):
+        """Remove key from disk if present."""
+        self._unlink(self._path(key))
+    
+    def prune(self):
+        """Delete expired entries and return how many files were removed."""
+        removed = 0
+        now = time.time()
+        for name in os.listdir(self.directory):
+            if not name.endswith('.pkl'):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                with open(path, 'rb') as f:
+                    _, expires_at, _ = pickle.load(f)
+            except Exception:
+                expires_at = 0
+            if expires_at is not None and expires_at <= now:
+                self._unlink(path)
+                removed += 1
+        return removed
+    
+    def _unlink(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+    
+    def _count(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+    
+    def stats(self):
+        """Return hit/miss/write counters for the disk tier."""
+        return {
+            'directory': self.directory,
+            'hits': self.hits,
+            'misses': self.misses,
+            'writes': self.writes,
+            'errors': self.errors
+        }
+
+class TieredCache:
+    """
+    Two-tier cache: an in-process LRU bounded by bytes in front of an
+    optional on-disk tier shared by all workers on the host.
+    """
+    
+    def __init__(self, max_bytes=64 * 1024 * 1024, directory=None):
+        self.memory = LRUCache(max_bytes=max_bytes)
+        self.disk = DiskCache(directory) if directory else None
+    
+    def get(self, key, default=None):
+        """Return the cached value for key from memory, then disk, or default."""
+        value = self.memory.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        
+        if self.disk is None:
+            return default
+        
+        entry = self.disk.get(key)
+        if entry is None:
+            return default
+        
+        # Promote to memory for the rest of its lifetime
+        value, expires_at, size = entry
+        ttl = expires_at - time.time() if expires_at is not None else None
+        self.memory.set(key, value, ttl=ttl, size=size)
+        return value
+    
+    def set(self, key, value, ttl=None):
+        """
+        Store a value in both tiers.
+        
+        Args:
+            key: Hashable cache key
+            value: Picklable value to store
+            ttl (float): Time-to-live in seconds, or None to never expire
+        """
+        payload = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        self.memory.set(key, value, ttl=ttl, size=len(payload))
+        if self.disk is not None:
+            expires_at = time.time() + ttl if ttl is not None else None
+            self.disk.set(key, payload, expires_at)
+    
+    def remaining_ttl(self, key):
+        """Time left before key expires in memory, then on disk; see LRUCache.remaining_ttl()."""
+        ttl = self.memory.remaining_ttl(key)
+        if ttl != 0 or self.disk is None:
+            return ttl
+        entry = self.disk.get(key)
+        if entry is None:
+            return 0
+        expires_at = entry[1]
+        return max(expires_at - time.time(), 0) if expires_at is not None else None
+    
+    def delete(self, key):
+        """Remove key from both tiers."""
+        self.memory.delete(key)
+        if self.disk is not None:
+            self.disk.delete(key)
+    
+    def clear(self):
+        """Clear the in-memory tier."""
+        self.memory.clear()
+    
+    def stats(self):
+        """Return counters for both tiers."""
+        return {
+            'memory': self.memory.stats(),
+            'disk': self.disk.stats() if self.disk is not None else None
+        }
+
@@ -0,0 +1,221 @@
+import numpy as np
+
+from app.utils.data_analyzer import align_closes
+from app.utils.resample import TRADING_DAYS_PER_YEAR
+
+# Bars per year used to annualize daily volatility; see resample.bars_per_year()
+BARS_PER_YEAR = TRADING_DAYS_PER_YEAR
+
+class ReturnMatrix:
+    """
+    Date-aligned (time x symbols) closes and returns for a set of symbols.
+    
+    Built once from the symbols' bars on their combined trading calendar;
+    every cross-symbol statistic below is a few matrix products over it
+    rather than one DataFrame pipeline per symbol. A symbol with no bar on
+    a date has NaN there, and statistics over a pair of symbols use the
+    dates where both have a return (pairwise-complete observations).
+    
+    Attributes:
+        symbols (list): Column order
+        dates (np.ndarray): Combined calendar, oldest first
+        closes (np.ndarray): (time x symbols) closing prices
+        returns (np.ndarray): (time x symbols) simple returns; a return
+            after a missing bar spans the gap
+    """
+    
+    def __init__(self, symbols, dates, closes):
+        self.symbols = list(symbols)
+        self.dates = dates
+        self.closes = closes
+        self.returns = _returns(closes)
+        self._valid = ~np.isnan(self.returns)
+        self._sums = None
+    
+    def __len__(self):
+        return len(self.dates)
+    
+    @classmethod
+    def from_data(cls, data_by_symbol):
+        """
+        Build the matrix from several symbols' stock data.
+        
+        Args:
+            data_by_symbol (dict): Symbol -> stock data in any shape accepted
+                by Bars.from_data(), e.g. get_multiple_stocks_data() results
+        
+        Returns:
+            ReturnMatrix: The aligned matrix; symbols without usable data are left out
+        """
+        symbols, dates, closes = align_closes(data_by_symbol)
+        return cls(symbols, dates, closes.T)
+    
+    def index(self, symbol):
+        """Column of a symbol; raises ValueError if it is not in the matrix."""
+        try:
+            return self.symbols.index(symbol)
+        except ValueError:
+            raise ValueError(f"Unknown symbol: {symbol}")
+    
+    def normalized(self):
+        """
+        Performance relative to each symbol's first close, in percent.
+        
+        Returns:
+            np.ndarray: (time x symbols), NaN where a symbol has no bar
+        """
+        valid = ~np.isnan(self.closes)
+        if not len(self):
+            return np.empty(self.closes.shape)
+        first = self.closes[valid.argmax(axis=0), np.arange(len(self.symbols))]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return (self.closes / first - 1) * 100
+    
+    def _pairwise_sums(self):
+        # For every pair (i, j), sums over the dates where both have a return:
+        # count, sum of i's returns, sum of i's squared returns, sum of products
+        if self._sums is None:
+            weights = self._valid.astype(np.float64)
+            values = np.where(self._valid, self.returns, 0.0)
+            self._sums = (
+                weights.T @ weights,
+                values.T @ weights,
+                (values * values).T @ weights,
+                values.T @ values,
+            )
+        return self._sums
+    
+    def covariance(self):
+        """
+        Sample covariance of every pair of symbols' returns.
+        
+        Returns:
+            np.ndarray: (symbols x symbols), NaN for pairs with fewer than 2
+                common returns
+        """
+        count, total, _, products = self._pairwise_sums()
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(count > 1, (products - total * total.T / count) / (count - 1), np.nan)
+    
+    def _pairwise_variance(self):
+        # [i, j]: variance of i's returns over the dates where j also has one
+        count, total, squares, _ = self._pairwise_sums()
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(count > 1, (squares - total * total / count) / (count - 1), np.nan)
+    
+    def correlation(self):
+        """
+        Pearson correlation of every pair of symbols' returns.
+        
+        Returns:
+            np.ndarray: (symbols x symbols), NaN where undefined
+        """
+        variance = self._pairwise_variance()
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.clip(self.covariance() / np.sqrt(variance * variance.T), -1.0, 1.0)
+    
+    def beta(self, benchmark):
+        """
+        Beta of every symbol against a benchmark symbol.
+        
+        Args:
+            benchmark (str): Symbol to measure against
+        
+        Returns:
+            np.ndarray: One beta per symbol (1 for the benchmark itself)
+        """
+        column = self.index(benchmark)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return self.covariance()[:, column] / self._pairwise_variance()[column, :]
+    
+    def volatility(self, bars_per_year=BARS_PER_YEAR):
+        """Annualized standard deviation of each symbol's returns."""
+        return np.sqrt(np.diag(self._pairwise_variance()) * bars_per_year)
+    
+    def total_return(self):
+        """Percent change from each symbol's first to its last close."""
+        normalized = self.normalized()
+        if not len(self):
+            return np.full(len(self.symbols), np.nan)
+        valid = ~np.isnan(normalized)
+        last = len(self) - 1 - valid[::-1].argmax(axis=0)
+        return normalized[last, np.arange(len(self.symbols))]
+    
+    def rolling_correlation(self, benchmark, window=60, min_periods=None):
+        """
+        Rolling correlation of every symbol's returns with a benchmark's.
+        
+        Computed from windowed differences of cumulative sums, so the cost
+        is O(time x symbols) whatever the window.
+        
+        Args:
+            benchmark (str): Symbol to correlate with
+            window (int): Window length in bars
+            min_periods (int): Common returns a window needs (defaults to window)
+        
+        Returns:
+            np.ndarray: (time x symbols), NaN until a window has enough data
+        """
+        if window < 2:
+            raise ValueError("window must be at least 2")
+        min_periods = max(min_periods or window, 2)
+        column = self.index(benchmark)
+        both = self._valid & self._valid[:, [column]]
+        x = np.where(both, self.returns, 0.0)
+        y = np.where(both, self.returns[:, [column]], 0.0)
+        
+        def windowed(values):
+            sums = np.cumsum(values, axis=0)
+            sums[window:] -= sums[:-window].copy()
+            return sums
+        
+        count = windowed(both.astype(np.float64))
+        sum_x, sum_y = windowed(x), windowed(y)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            covariance = windowed(x * y) - sum_x * sum_y / count
+            variance_x = windowed(x * x) - sum_x * sum_x / count
+            variance_y = windowed(y * y) - sum_y * sum_y / count
+            correlation = covariance / np.sqrt(variance_x * variance_y)
+        # Cumulative sums leave rounding noise where a variance should be 0
+        correlation[(count < min_periods) | (variance_x <= 1e-14 * count) | (variance_y <= 1e-14 * count)] = np.nan
+        return np.clip(correlation, -1.0, 1.0)
+    
+    def summary(self, benchmark=None, bars_per_year=BARS_PER_YEAR):
+        """
+        Cross-symbol statistics in one pass.
+        
+        Args:
+            benchmark (str): Symbol for beta (defaults to the first symbol)
+            bars_per_year (int): Bars per year, for annualized volatility
+        
+        Returns:
+            dict: 'symbols', 'benchmark', 'observations' and per-symbol
+                'total_return', 'volatility' and 'beta' arrays, plus the
+                'correlation' and 'covariance' matrices
+        """
+        benchmark = benchmark or (self.symbols[0] if self.symbols else None)
+        return {
+            'symbols': self.symbols,
+            'benchmark': benchmark,
+            'observations': self._valid.sum(axis=0),
+            'total_return': self.total_return(),
+            'volatility': self.volatility(bars_per_year),
+            'beta': self.beta(benchmark) if benchmark is not None else np.array([]),
+            'correlation': self.correlation(),
+            'covariance': self.covariance(),
+        }
+
+def _returns(closes):
+    """Simple returns down the columns, carrying the last close across missing bars."""
+    returns = np.full(closes.shape, np.nan)
+    if len(closes) < 2:
+        return returns
+    valid = ~np.isnan(closes)
+    # Index of the latest close at or before each date, per column
+    latest = np.maximum.accumulate(np.where(valid, np.arange(len(closes))[:, None], -1), axis=0)
+    columns = np.arange(closes.shape[1])
+    previous = latest[:-1]
+    has_previous = valid[1:] & (previous >= 0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        returns[1:] = np.where(has_previous, closes[1:] / closes[np.maximum(previous, 0), columns] - 1, np.nan)
+    return returns
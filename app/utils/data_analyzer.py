@@ -1,38 +1,880 @@
+import copy
+import hashlib
+import sys
+from collections.abc import Mapping
+from types import MappingProxyType
 import pandas as pd
 import numpy as np
-from sklearn.linear_model import LinearRegression
-from sklearn.preprocessing import StandardScaler
-import random
+from app.utils.cache import LRUCache
+from app.utils.prediction import fit_trend
 
-def calculate_moving_average(data, window=20):
+# Indicators computed by compute_indicators() when none are requested
+DEFAULT_INDICATORS = ['ma_20', 'ma_50', 'ma_200', 'ema_12', 'ema_26', 'macd', 'rsi', 'trend', 'prediction']
+
+# Indicator values keyed by (bars fingerprint, node), shared across requests;
+# None disables memoization. Configured by init_app()
+_result_cache = LRUCache(max_bytes=32 * 1024 * 1024)
+
+def init_app(app):
     """
-    Calculate the moving average for a given window.
+    Configure the analysis result cache from the Flask app config.
     
     Args:
-        data (dict): Dictionary containing stock data
-        window (int): Window size for moving average
+        app (Flask): Flask application
+    """
+    global _result_cache
+    
+    max_bytes = app.config.get('ANALYSIS_CACHE_MAX_BYTES', 32 * 1024 * 1024)
+    if not app.config.get('CACHE_ENABLED', True) or not max_bytes:
+        _result_cache = None
+    else:
+        _result_cache = LRUCache(max_bytes=max_bytes)
+
+def get_analysis_cache_stats():
+    """
+    Get hit/miss/eviction counters for memoized indicator values.
     
     Returns:
-        float: The latest moving average value
+        dict: LRUCache counters, or None if memoization is disabled
     """
-    try:
-        if not data['success'] or not data['data']:
-            return None
+    return _result_cache.stats() if _result_cache is not None else None
+
+class Bars:
+    """
+    Price bars as contiguous float64 NumPy arrays, built once per request
+    and shared by every indicator computed from them.
+    """
+    
+    def __init__(self, dates, open_, high, low, close, volume):
+        self.dates = dates
+        self.open = open_
+        self.high = high
+        self.low = low
+        self.close = close
+        self.volume = volume
+        self._fingerprint = None
+    
+    def __len__(self):
+        return len(self.close)
+    
+    @property
+    def fingerprint(self):
+        """
+        Cheap content address of the bars: (length, last date, digest of the
+        price and volume arrays). Equal bars fetched separately get equal
+        fingerprints, so analysis results can be shared between them.
+        """
+        if self._fingerprint is None:
+            digest = hashlib.blake2b(digest_size=16)
+            for values in (self.open, self.high, self.low, self.close, self.volume):
+                digest.update(np.ascontiguousarray(values).tobytes())
+            last = str(self.dates[-1]) if self.dates is not None and len(self.dates) else None
+            self._fingerprint = (len(self.close), last, digest.hexdigest())
+        return self._fingerprint
+    
+    @classmethod
+    def from_data(cls, data):
+        """
+        Build Bars from stock data in any of the shapes used by the app.
+        
+        Args:
+            data: A get_stock_data() or get_stock_columns() result, a list of
+                bar records, a dict of columns, a DataFrame, or Bars
+        
+        Returns:
+            Bars: The bars, or None if there is no usable data
+        """
+        if isinstance(data, Bars):
+            return data
+        if isinstance(data, dict) and 'success' in data:
+            if not data['success'] or data.get('data') is None or len(data['data']) == 0:
+                return None
+            data = data['data']
         
-        # Convert to DataFrame if it's a list of dictionaries
-        if isinstance(data['data'], list):
-            df = pd.DataFrame(data['data'])
+        if isinstance(data, list):
+            if not data:
+                return None
+            columns = {column: [row.get(column) for row in data] for column in data[0]}
+        elif isinstance(data, pd.DataFrame):
+            columns = {column: data[column].to_numpy() for column in data.columns}
+            if 'Date' not in columns:
+                columns['Date'] = data.index.to_numpy()
         else:
-            df = data['data']
+            columns = data
         
-        # Calculate moving average
-        df['MA'] = df['Close'].rolling(window=window).mean()
+        if 'Close' not in columns or len(columns['Close']) == 0:
+            return None
+        
+        def column(name):
+            if name not in columns:
+                return np.full(len(columns['Close']), np.nan)
+            return np.ascontiguousarray(columns[name], dtype=np.float64)
         
-        # Return the latest value
-        return df['MA'].iloc[-1] if not df['MA'].empty else None
-    except Exception as e:
-        print(f"Error calculating moving average: {str(e)}")
+        return cls(
+            np.asarray(columns.get('Date', np.arange(len(columns['Close'])))),
+            column('Open'), column('High'), column('Low'), column('Close'), column('Volume')
+        )
+
+# The kernels below work along the last axis, so the same code computes one
+# symbol's 1-D series or a whole (symbols x time) matrix at once. Missing
+# bars (NaN) are skipped the way pandas rolling() and ewm() skip them, so a
+# gap in the provider's data does not spread to every later value.
+
+def _ffill(values):
+    """Carry the last valid value forward along the last axis; leading NaNs stay NaN."""
+    valid = ~np.isnan(values)
+    if valid.all():
+        return values
+    index = np.where(valid, np.arange(values.shape[-1]), 0)
+    np.maximum.accumulate(index, axis=-1, out=index)
+    return np.take_along_axis(values, index, axis=-1)
+
+def _changes(values):
+    """
+    Bar-to-bar changes along the last axis. The first bar after missing
+    values changes from the last valid value; a missing bar's change is NaN.
+    """
+    changes = np.diff(_ffill(values), axis=-1)
+    changes[np.isnan(values[..., 1:])] = np.nan
+    return changes
+
+def _first_mean(values, window):
+    """Mean of the valid values among the first window along the last axis."""
+    head = values[..., :window]
+    valid = ~np.isnan(head)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(valid, head, 0.0).sum(axis=-1) / valid.sum(axis=-1)
+
+def _sma(values, window):
+    """
+    Simple moving average along the last axis; NaN until the window is
+    full and for windows with a missing value (pandas rolling().mean()).
+    """
+    n = values.shape[-1]
+    out = np.full(values.shape, np.nan)
+    if window <= 0 or n < window:
+        return out
+    valid = ~np.isnan(values)
+    if valid.all():
+        out[..., window - 1:] = _windowed_sums(values, window) / window
+        return out
+    sums = _windowed_sums(np.where(valid, values, 0.0), window)
+    full = _windowed_sums(valid.astype(np.float64), window) == window
+    out[..., window - 1:] = np.where(full, sums / window, np.nan)
+    return out
+
+def ema(values, span):
+    """
+    Exponential moving average (pandas ewm(span, adjust=False)) along the last axis.
+    
+    Public, like wilder_averages(), because the streaming indicators in
+    indicator_state seed their state with it.
+    """
+    return _ewma(values, 2.0 / (span + 1))
+
+def _ewma(values, alpha, initial=None):
+    """
+    Exponentially weighted moving average y[t] = (1 - alpha) * y[t - 1] + alpha * x[t].
+    
+    The recursion is evaluated in closed form one block at a time, with
+    blocks short enough that the (1 - alpha)**-k weights stay far from
+    overflow, so the cost is O(n) NumPy work.
+    
+    Args:
+        values (np.ndarray): Input series along the last axis
+        alpha (float): Smoothing factor in (0, 1]
+        initial (float or np.ndarray): Value before values[..., 0], per
+            series; by default y[0] = values[0]
+    
+    Returns:
+        np.ndarray: Smoothed series, aligned with values
+    """
+    n = values.shape[-1]
+    out = np.empty(values.shape)
+    if n == 0:
+        return out
+    if np.isnan(values).any():
+        return _ewma_with_gaps(values, alpha, initial)
+    
+    decay = 1.0 - alpha
+    block = max(1, int(50 * np.log(10) / -np.log(decay))) if decay > 0 else 1
+    
+    if initial is None:
+        out[..., 0] = previous = values[..., 0]
+        first = 1
+    else:
+        previous = initial
+        first = 0
+    for start in range(first, n, block):
+        chunk = values[..., start:start + block]
+        length = chunk.shape[-1]
+        powers = decay ** np.arange(1, length + 1)
+        out[..., start:start + length] = powers * (
+            np.expand_dims(previous, -1) + alpha * np.cumsum(chunk / powers, axis=-1)
+        )
+        previous = out[..., start + length - 1]
+    return out
+
+def _ewma_with_gaps(values, alpha, initial=None):
+    """
+    _ewma() of a series with missing values, as pandas ewm(alpha,
+    adjust=False) computes it: missing values are skipped and the weights
+    of earlier values decay across the gap; a missing position repeats the
+    previous average.
+    """
+    n = values.shape[-1]
+    columns = values.reshape(-1, n).T
+    if initial is not None:
+        first = np.broadcast_to(np.asarray(initial, dtype=np.float64), values.shape[:-1]).reshape(1, -1)
+        columns = np.vstack([first, columns])
+    averages = pd.DataFrame(columns).ewm(alpha=alpha, adjust=False).mean().to_numpy()
+    if initial is not None:
+        averages = averages[1:]
+    return np.ascontiguousarray(averages.T).reshape(values.shape)
+
+def wilder_averages(close, window):
+    """
+    Wilder's average gain and loss, for bars window onwards.
+    
+    The first averages are simple means of the first window price changes;
+    later ones follow avg = (avg * (window - 1) + value) / window.
+    
+    Returns:
+        tuple: (avg_gain, avg_loss) arrays aligned with close[..., window:]
+    """
+    delta = _changes(close)
+    gains = np.maximum(delta, 0.0)
+    losses = np.maximum(-delta, 0.0)
+    first_gain, first_loss = _first_mean(gains, window), _first_mean(losses, window)
+    avg_gain = np.concatenate([
+        np.expand_dims(first_gain, -1), _ewma(gains[..., window:], 1.0 / window, initial=first_gain)
+    ], axis=-1)
+    avg_loss = np.concatenate([
+        np.expand_dims(first_loss, -1), _ewma(losses[..., window:], 1.0 / window, initial=first_loss)
+    ], axis=-1)
+    return avg_gain, avg_loss
+
+def _rsi_from_averages(avg_gain, avg_loss):
+    """RSI from average gains and losses (arrays or floats)."""
+    avg_gain, avg_loss = np.asarray(avg_gain, dtype=np.float64), np.asarray(avg_loss, dtype=np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rsi = 100.0 - 100.0 / (1.0 + avg_gain / avg_loss)
+    # Flat prices have no gains and no losses
+    return np.where((avg_gain == 0) & (avg_loss == 0), 50.0, rsi)
+
+def _rsi(close, window):
+    """Relative Strength Index with Wilder's smoothing along the last axis; NaN until the window is full."""
+    out = np.full(close.shape, np.nan)
+    if close.shape[-1] <= window:
+        return out
+    out[..., window:] = _rsi_from_averages(*wilder_averages(close, window))
+    return out
+
+def _windowed_sums(values, window):
+    """Sums over a trailing window along the last axis, for the positions window - 1 onwards."""
+    sums = np.cumsum(values, axis=-1)
+    out = sums[..., window - 1:].copy()
+    out[..., 1:] -= sums[..., :-window]
+    return out
+
+def _rolling_std(values, window, block=1024):
+    """
+    Population standard deviation over a trailing window along the last
+    axis; NaN until the window is full.
+    
+    Uses running sums of the values and their squares, restarted every
+    block bars and taken relative to the block's first valid value so that
+    the sums stay small and the variance keeps its precision on long
+    histories. The cost is O(n) whatever the window. Windows with a
+    missing value are NaN, as in pandas rolling().std(ddof=0).
+    """
+    n = values.shape[-1]
+    out = np.full(values.shape, np.nan)
+    if window <= 0 or n < window:
+        return out
+    valid = ~np.isnan(values)
+    gaps = not valid.all()
+    block = max(block, 4 * window)
+    for start in range(window - 1, n, block):
+        stop = min(start + block, n)
+        segment = values[..., start - window + 1:stop]
+        if gaps:
+            segment_valid = valid[..., start - window + 1:stop]
+            reference = np.take_along_axis(segment, segment_valid.argmax(axis=-1)[..., None], axis=-1)
+            shifted = np.where(segment_valid, segment - reference, 0.0)
+        else:
+            shifted = segment - segment[..., :1]
+        mean = _windowed_sums(shifted, window) / window
+        variance = _windowed_sums(shifted * shifted, window) / window - mean * mean
+        if gaps:
+            full = _windowed_sums(segment_valid.astype(np.float64), window) == window
+            variance = np.where(full, variance, np.nan)
+        out[..., start:stop] = np.sqrt(np.maximum(variance, 0.0))
+    return out
+
+def _true_range(high, low, close):
+    """
+    True range along the last axis; the first bar has no previous close and
+    uses high - low, and a bar after missing closes uses the last valid one.
+    """
+    true_range = high - low
+    previous = _ffill(close)[..., :-1]
+    true_range[..., 1:] = np.fmax(
+        true_range[..., 1:], np.fmax(np.abs(high[..., 1:] - previous), np.abs(low[..., 1:] - previous))
+    )
+    return true_range
+
+def _atr(high, low, close, window):
+    """
+    Average True Range with Wilder's smoothing, like RSI: the first value
+    (at bar window) averages the true ranges of bars 1..window; NaN before.
+    """
+    out = np.full(close.shape, np.nan)
+    if window <= 0 or close.shape[-1] <= window:
+        return out
+    true_range = _true_range(high, low, close)[..., 1:]
+    first = _first_mean(true_range, window)
+    out[..., window] = first
+    out[..., window + 1:] = _ewma(true_range[..., window:], 1.0 / window, initial=first)
+    return out
+
+def _obv(close, volume):
+    """On-balance volume along the last axis, starting from 0 at the first bar; missing bars add nothing."""
+    signed = np.nan_to_num(np.sign(_changes(close)) * volume[..., 1:])
+    out = np.zeros(close.shape)
+    np.cumsum(signed, axis=-1, out=out[..., 1:])
+    return out
+
+def _vwap(high, low, close, volume, window=0, sessions=None):
+    """
+    Volume weighted average of the typical price (high + low + close) / 3.
+    
+    With a window, over the trailing window bars (NaN until it is full);
+    otherwise from the first bar of each session, where sessions labels
+    each bar with its session (all one session when None). NaN where no
+    volume traded; bars with a missing price are left out.
+    """
+    volume = np.nan_to_num(volume)
+    weighted = (high + low + close) / 3.0 * volume
+    missing = np.isnan(weighted)
+    if missing.any():
+        weighted[missing] = 0.0
+        volume[missing] = 0.0
+    out = np.full(close.shape, np.nan)
+    if window:
+        if close.shape[-1] < window:
+            return out
+        with np.errstate(invalid='ignore', divide='ignore'):
+            out[..., window - 1:] = _windowed_sums(weighted, window) / _windowed_sums(volume, window)
+        return out
+    
+    weighted, volume = np.cumsum(weighted, axis=-1), np.cumsum(volume, axis=-1)
+    if sessions is not None and len(sessions):
+        # Subtract the running totals as they stood before each bar's session began
+        starts = np.flatnonzero(np.diff(sessions, prepend=sessions[0] - 1))
+        first = np.repeat(starts, np.diff(np.append(starts, len(sessions))))
+        before = first - 1
+        opened = before >= 0
+        weighted[..., opened] -= weighted[..., before[opened]]
+        volume[..., opened] -= volume[..., before[opened]]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(volume > 0, weighted / volume, np.nan)
+
+def _session_days(dates):
+    """
+    Calendar day of each bar, as an integer label for session-anchored indicators.
+    
+    Dates may be epoch milliseconds (days are counted in UTC), datetimes or
+    date strings such as the legacy records carry. Returns None when there
+    are no usable dates.
+    """
+    if dates is None or len(dates) == 0:
+        return None
+    dates = np.asarray(dates)
+    if dates.dtype.kind in 'iu':
+        return dates // (24 * 3600 * 1000)
+    try:
+        index = pd.DatetimeIndex(pd.to_datetime(dates))
+    except (ValueError, TypeError):
         return None
+    if index.tz is not None:
+        index = index.tz_localize(None)
+    return index.as_unit('s').asi8 // (24 * 3600)
+
+def _last(values):
+    """Last element of an array as a float, or None if it is missing or NaN."""
+    if len(values) == 0 or np.isnan(values[-1]):
+        return None
+    return float(values[-1])
+
+class Indicator:
+    """
+    A registered indicator: how to compute it from bars and the values of
+    the indicators it depends on.
+    """
+    
+    def __init__(self, kind, compute, defaults=(), depends=None, summarize=None, series=None, empty=None,
+                 cross_sectional=False):
+        self.kind = kind
+        self.compute = compute
+        self.defaults = tuple(defaults)
+        self.depends = depends
+        self.summarize = summarize or _last
+        self.series = series or (lambda value: value)
+        self.empty = empty
+        self.cross_sectional = cross_sectional
+    
+    def node(self, args):
+        """The graph node for this indicator with the given parameters (defaults fill the rest)."""
+        if len(args) > len(self.defaults):
+            raise ValueError(f"Too many parameters for indicator {self.kind}")
+        return (self.kind, tuple(args) + self.defaults[len(args):])
+
+# Registered indicators keyed by kind; see register_indicator()
+INDICATORS = {}
+
+def register_indicator(kind, defaults=(), depends=None, summarize=None, series=None, empty=None,
+                       cross_sectional=False):
+    """
+    Register an indicator computed by the decorated function.
+    
+    The function is called as compute(bars, inputs, *params), where inputs
+    is the list of values of the nodes returned by depends(*params). Each
+    node is a (kind, params) tuple naming another registered indicator, so
+    shared intermediates (such as the EMAs behind MACD) are computed once.
+    
+    Args:
+        kind (str): Indicator name, used as the prefix of requested names ('ma' for 'ma_20')
+        defaults (tuple): Default integer parameters
+        depends (callable): Maps the parameters to a list of dependency nodes
+        summarize (callable): Reduces the full value to the latest value reported
+            for output='last' (defaults to the last array element)
+        series (callable): Converts the full value to what is reported for
+            output='series' (defaults to the value itself, an aligned array)
+        empty: Value reported when there is no data
+        cross_sectional (bool): Whether compute() only uses the kernels that
+            work along the last axis, so compute_indicator_matrix() can run it
+            over a (symbols x time) matrix
+    """
+    def decorator(compute):
+        INDICATORS[kind] = Indicator(kind, compute, defaults, depends, summarize, series, empty, cross_sectional)
+        return compute
+    return decorator
+
+def parse_indicator(name):
+    """
+    Resolve a requested indicator name to its graph node.
+    
+    Args:
+        name (str): Indicator kind followed by optional integer parameters
+            separated by underscores, e.g. 'rsi', 'ma_50' or 'macd_12_26_9'
+    
+    Returns:
+        tuple: (kind, params) node
+    """
+    kind, *args = name.split('_')
+    if kind not in INDICATORS or not all(arg.isdigit() for arg in args):
+        raise ValueError(f"Unknown indicator: {name}")
+    return INDICATORS[kind].node([int(arg) for arg in args])
+
+class IndicatorSession:
+    """
+    Evaluates indicator nodes over one set of bars.
+    
+    Requested nodes are planned into a dependency DAG and every node is
+    evaluated at most once; its value is kept for the life of the session,
+    normally one request. With memoize, values are also shared through the
+    process-wide result cache under the bars' fingerprint, so another
+    session over identical bars (e.g. the next view of a hot ticker before
+    its data is refreshed) reuses them instead of recomputing.
+    """
+    
+    def __init__(self, bars, memoize=True):
+        self.bars = bars
+        self._values = {}
+        self._cache = _result_cache if memoize else None
+    
+    def evaluate(self, node):
+        """
+        Get the full value of a node, evaluating it and its dependencies if needed.
+        
+        Args:
+            node (tuple): (kind, params) node from parse_indicator()
+        
+        Returns:
+            The indicator value (usually an array aligned with the bars)
+        """
+        for pending in self.plan([node]):
+            indicator = INDICATORS[pending[0]]
+            inputs = [self._values[dependency] for dependency in self._dependencies(pending)]
+            value = indicator.compute(self.bars, inputs, *pending[1])
+            if self._cache is not None:
+                value = _freeze(value)
+                self._cache.set((self.bars.fingerprint, pending), value, size=_value_size(value))
+            self._values[pending] = value
+        return self._values[node]
+    
+    def plan(self, nodes):
+        """
+        Order the not yet evaluated nodes needed for some nodes so that every
+        node comes after its dependencies.
+        
+        Returns:
+            list: Nodes to evaluate, in order
+        """
+        order = []
+        state = {}  # node -> 'visiting' or 'done'
+        stack = [(node, False) for node in reversed(nodes)]
+        while stack:
+            node, expanded = stack.pop()
+            if expanded:
+                state[node] = 'done'
+                order.append(node)
+                continue
+            if state.get(node) == 'done' or self._available(node):
+                continue
+            if state.get(node) == 'visiting':
+                raise ValueError(f"Indicator dependency cycle at {node[0]}")
+            
+            state[node] = 'visiting'
+            stack.append((node, True))
+            for dependency in reversed(self._dependencies(node)):
+                if dependency not in self._values and state.get(dependency) != 'done':
+                    stack.append((dependency, False))
+        return order
+    
+    def _available(self, node):
+        """Whether a node's value is known, loading it from the result cache if it is there."""
+        if node in self._values:
+            return True
+        if self._cache is None:
+            return False
+        value = self._cache.get((self.bars.fingerprint, node))
+        if value is None:
+            return False
+        self._values[node] = value
+        return True
+    
+    def _dependencies(self, node):
+        indicator = INDICATORS[node[0]]
+        return indicator.depends(*node[1]) if indicator.depends else []
+
+def _freeze(value):
+    """
+    Make a cached value safe to share with every later session: arrays
+    become read-only, lists tuples and dicts read-only mappings, recursively.
+    """
+    if isinstance(value, np.ndarray):
+        value.flags.writeable = False
+        return value
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    if isinstance(value, Mapping):
+        return MappingProxyType({key: _freeze(item) for key, item in value.items()})
+    return value
+
+def _thaw(value):
+    """Plain dicts and lists copied from a (possibly frozen) value, for callers to modify; arrays are shared."""
+    if isinstance(value, Mapping):
+        return {key: _thaw(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_thaw(item) for item in value]
+    return value
+
+def _value_size(value):
+    """Approximate size in bytes of an indicator value, counting nested containers."""
+    if isinstance(value, np.ndarray):
+        return value.nbytes + 112
+    if isinstance(value, Mapping):
+        return sys.getsizeof({}) + sum(_value_size(key) + _value_size(item) for key, item in value.items())
+    if isinstance(value, (tuple, list)):
+        return sys.getsizeof(value) + sum(_value_size(item) for item in value)
+    if hasattr(value, '__dict__'):
+        return sys.getsizeof(value) + _value_size(vars(value))
+    return sys.getsizeof(value)
+
+@register_indicator('ma', defaults=(20,), cross_sectional=True)
+def _ma_indicator(bars, inputs, window):
+    return _sma(bars.close, window)
+
+@register_indicator('ema', defaults=(20,), cross_sectional=True)
+def _ema_indicator(bars, inputs, span):
+    return ema(bars.close, span)
+
+@register_indicator('rsi', defaults=(14,), cross_sectional=True)
+def _rsi_indicator(bars, inputs, window):
+    return _rsi(bars.close, window)
+
+@register_indicator(
+    'macd', defaults=(12, 26, 9),
+    depends=lambda fast, slow, signal: [('ema', (fast,)), ('ema', (slow,))],
+    summarize=lambda value: {'macd': _last(value[0]), 'signal': _last(value[1]), 'histogram': _last(value[2])},
+    series=lambda value: {'macd': value[0], 'signal': value[1], 'histogram': value[2]},
+    empty={'macd': None, 'signal': None, 'histogram': None},
+    cross_sectional=True
+)
+def _macd_indicator(bars, inputs, fast, slow, signal):
+    ema_fast, ema_slow = inputs
+    macd = ema_fast - ema_slow
+    signal_line = ema(macd, signal)
+    return macd, signal_line, macd - signal_line
+
+@register_indicator('std', defaults=(20,), cross_sectional=True)
+def _std_indicator(bars, inputs, window):
+    return _rolling_std(bars.close, window)
+
+@register_indicator(
+    'bollinger', defaults=(20, 2),
+    depends=lambda window, width: [('ma', (window,)), ('std', (window,))],
+    summarize=lambda value: {'middle': _last(value[0]), 'upper': _last(value[1]), 'lower': _last(value[2])},
+    series=lambda value: {'middle': value[0], 'upper': value[1], 'lower': value[2]},
+    empty={'middle': None, 'upper': None, 'lower': None},
+    cross_sectional=True
+)
+def _bollinger_indicator(bars, inputs, window, width):
+    """Bollinger Bands: the moving average plus and minus width standard deviations, e.g. 'bollinger_20_2'."""
+    middle, std = inputs
+    return middle, middle + width * std, middle - width * std
+
+@register_indicator('atr', defaults=(14,))
+def _atr_indicator(bars, inputs, window):
+    return _atr(bars.high, bars.low, bars.close, window)
+
+@register_indicator('obv')
+def _obv_indicator(bars, inputs):
+    return _obv(bars.close, bars.volume)
+
+@register_indicator('vwap', defaults=(0,))
+def _vwap_indicator(bars, inputs, window):
+    """VWAP anchored to each day's first bar ('vwap'), or over a trailing window ('vwap_20')."""
+    sessions = None if window else _session_days(bars.dates)
+    return _vwap(bars.high, bars.low, bars.close, bars.volume, window, sessions)
+
+@register_indicator(
+    'trend', defaults=(20,),
+    depends=lambda window: [('ma', (window,)), ('ma', (window * 2,))],
+    summarize=lambda value: value, empty='unknown'
+)
+def _trend_indicator(bars, inputs, window):
+    """Classify the trend from the short and long simple moving averages."""
+    short, long = inputs[0][-1], inputs[1][-1]
+    if np.isnan(short) or np.isnan(long):
+        return 'unknown'
+    if short > long * 1.02:
+        return 'uptrend'
+    if short < long * 0.98:
+        return 'downtrend'
+    return 'sideways'
+
+@register_indicator(
+    'linreg', summarize=lambda fit: fit.to_dict(), series=lambda fit: fit.to_dict(),
+    empty={'slope': None, 'intercept': None, 'residual_std': None, 'n': None}
+)
+def _linreg_indicator(bars, inputs):
+    """Closed-form least squares trend line of the closes, shared by every forecast."""
+    fit = fit_trend(bars.close)
+    if fit is None:
+        raise ValueError("Not enough data to fit a trend")
+    return fit
+
+@register_indicator(
+    'prediction', defaults=(30,), depends=lambda days: [('linreg', ())],
+    summarize=lambda value: value, series=lambda value: value, empty=[]
+)
+def _prediction_indicator(bars, inputs, days):
+    return inputs[0].predict(days).tolist()
+
+@register_indicator(
+    'forecast', defaults=(30, 95), depends=lambda days, level: [('linreg', ())],
+    summarize=lambda value: value, series=lambda value: value,
+    empty={'prices': [], 'lower': [], 'upper': [], 'level': None}
+)
+def _forecast_indicator(bars, inputs, days, level):
+    """Trend forecast with a level% prediction interval, e.g. 'forecast_30_95'."""
+    if not 0 < level < 100:
+        raise ValueError("Forecast level must be between 0 and 100")
+    forecast = inputs[0].forecast(days, level / 100.0)
+    return {key: value.tolist() if isinstance(value, np.ndarray) else value for key, value in forecast.items()}
+
+def compute_indicators(data, indicators=None, session=None, output='last'):
+    """
+    Compute a set of indicators over the same bar arrays.
+    
+    The bars are converted to contiguous NumPy arrays once, the requested
+    indicators are planned into a dependency graph, and each intermediate
+    (e.g. the EMA(12) shared by 'ema_12' and 'macd') is computed once.
+    
+    Args:
+        data: Stock data in any shape accepted by Bars.from_data()
+        indicators (list): Indicator names such as 'ma_50', 'ema_12', 'rsi',
+            'macd', 'bollinger', 'atr', 'obv', 'vwap', 'std', 'trend' or
+            'prediction' (defaults to DEFAULT_INDICATORS); see parse_indicator()
+        session (IndicatorSession): Session to reuse values from, e.g. across
+            the calls made while handling one request
+        output (str): 'last' for the latest values, or 'series' for complete
+            NumPy arrays aligned with the bars (NaN where the indicator is
+            not yet defined)
+    
+    Returns:
+        dict: Indicator name -> value. With output='last', 'macd' is a dict
+            of 'macd', 'signal' and 'histogram', 'bollinger' a dict of
+            'middle', 'upper' and 'lower', and other values are floats
+            (None when there is not enough data); with output='series' each
+            float becomes an array. 'trend' is a label, 'prediction' a
+            list of future prices and 'forecast' a dict of future prices
+            with interval bounds either way.
+    """
+    if output not in ('last', 'series'):
+        raise ValueError(f"Unknown output: {output}")
+    if indicators is None:
+        indicators = DEFAULT_INDICATORS
+    
+    nodes = {name: parse_indicator(name) for name in indicators}
+    if session is None:
+        bars = Bars.from_data(data)
+        session = IndicatorSession(bars) if bars is not None else None
+    
+    results = {}
+    for name, node in nodes.items():
+        indicator = INDICATORS[node[0]]
+        if session is None:
+            results[name] = copy.deepcopy(indicator.empty)
+            continue
+        try:
+            value = session.evaluate(node)
+            results[name] = _thaw(indicator.series(value) if output == 'series' else indicator.summarize(value))
+        except Exception as e:
+            print(f"Error calculating {name}: {str(e)}")
+            results[name] = copy.deepcopy(indicator.empty)
+    
+    return results
+
+def align_closes(data_by_symbol, column='Close'):
+    """
+    Align several symbols' bars on their combined calendar.
+    
+    Args:
+        data_by_symbol (dict): Symbol -> stock data in any shape accepted by
+            Bars.from_data(), e.g. get_multiple_stocks_data() results
+        column (str): Bar column to align
+    
+    Returns:
+        tuple: (symbols, dates, matrix) where matrix is a (symbols x dates)
+            float64 array with NaN where a symbol has no bar. Symbols
+            without usable data are left out.
+    """
+    series = {}
+    for symbol, data in data_by_symbol.items():
+        bars = Bars.from_data(data)
+        if bars is not None:
+            series[symbol] = (np.asarray(bars.dates), getattr(bars, column.lower()))
+    
+    symbols = list(series)
+    if not symbols:
+        return symbols, np.array([]), np.empty((0, 0))
+    
+    dates = series[symbols[0]][0]
+    for symbol in symbols[1:]:
+        dates = np.union1d(dates, series[symbol][0])
+    
+    matrix = np.full((len(symbols), len(dates)), np.nan)
+    for i, symbol in enumerate(symbols):
+        symbol_dates, values = series[symbol]
+        matrix[i, np.searchsorted(dates, symbol_dates)] = values
+    return symbols, dates, matrix
+
+def _justify(matrix, shift):
+    """Move row i of a matrix shift[i] columns left (negative: right), padding with NaN."""
+    if not shift.any():
+        return matrix
+    columns = np.arange(matrix.shape[1]) + shift[:, None]
+    inside = (columns >= 0) & (columns < matrix.shape[1])
+    shifted = np.take_along_axis(matrix, np.clip(columns, 0, matrix.shape[1] - 1), axis=1)
+    return np.where(inside, shifted, np.nan)
+
+def compute_indicator_matrix(closes, indicators=None, output='last'):
+    """
+    Compute indicators for many symbols at once from an aligned price matrix.
+    
+    Every symbol goes through the same NumPy operations in one pass instead
+    of one DataFrame per symbol. Symbols may have NaN gaps: leading NaN
+    (shorter histories) delay the start of that symbol's windows, so its
+    values match compute_indicators() over its own bars; interior gaps
+    (e.g. halts) carry the last price forward and report NaN on the
+    missing bars.
+    
+    Args:
+        closes (np.ndarray): (symbols x time) closing prices, e.g. from
+            align_closes()
+        indicators (list): Names of cross-sectional indicators ('ma', 'ema',
+            'rsi' and 'macd' with any parameters); defaults to all of those
+            in DEFAULT_INDICATORS
+        output (str): 'last' for each symbol's value on its latest bar, or
+            'series' for (symbols x time) matrices
+    
+    Returns:
+        dict: Indicator name -> array (one value per symbol for 'last');
+            'macd' is a dict of 'macd', 'signal' and 'histogram' arrays
+    """
+    if output not in ('last', 'series'):
+        raise ValueError(f"Unknown output: {output}")
+    if indicators is None:
+        indicators = [name for name in DEFAULT_INDICATORS if INDICATORS[parse_indicator(name)[0]].cross_sectional]
+    
+    nodes = {name: parse_indicator(name) for name in indicators}
+    for name, node in nodes.items():
+        if not INDICATORS[node[0]].cross_sectional:
+            raise ValueError(f"Indicator {name} cannot be computed across symbols")
+    
+    closes = np.atleast_2d(np.asarray(closes, dtype=np.float64))
+    symbols, length = closes.shape
+    valid = ~np.isnan(closes)
+    
+    # Carry prices forward over gaps, then shift each row so its history
+    # starts in column 0 and every row's windows line up
+    positions = np.where(valid, np.arange(length), 0)
+    np.maximum.accumulate(positions, axis=1, out=positions)
+    filled = closes[np.arange(symbols)[:, None], positions]
+    start = np.where(valid.any(axis=1), valid.argmax(axis=1), 0)
+    
+    empty = np.full(length, np.nan)
+    # Universe matrices are rebuilt rather than revisited, so skip the result cache
+    session = IndicatorSession(Bars(None, empty, empty, empty, _justify(filled, start), empty), memoize=False)
+    
+    if length:
+        # The column of each symbol's latest bar
+        latest = length - 1 - valid[:, ::-1].argmax(axis=1)
+    
+    def finish(values):
+        if output == 'series':
+            values = np.array(_justify(values, -start))
+            values[~valid] = np.nan
+            return values
+        if not length:
+            return np.full(symbols, np.nan)
+        return np.where(valid.any(axis=1), values[np.arange(symbols), latest - start], np.nan)
+    
+    results = {}
+    for name, node in nodes.items():
+        value = INDICATORS[node[0]].series(session.evaluate(node))
+        if isinstance(value, dict):
+            results[name] = {key: finish(values) for key, values in value.items()}
+        else:
+            results[name] = finish(value)
+    return results
+
+def calculate_moving_average(data, window=20):
+    """
+    Calculate the moving average for a given window.
+    
+    Args:
+        data (dict): Dictionary containing stock data
+        window (int): Window size for moving average
+    
+    Returns:
+        float: The latest moving average value
+    """
+    return compute_indicators(data, [f'ma_{window}'])[f'ma_{window}']
 
 def calculate_exponential_moving_average(data, window=20):
     """
@@ -45,24 +887,7 @@ def calculate_exponential_moving_average(data, window=20):
     Returns:
         float: The latest EMA value
     """
-    try:
-        if not data['success'] or not data['data']:
-            return None
-        
-        # Convert to DataFrame if it's a list of dictionaries
-        if isinstance(data['data'], list):
-            df = pd.DataFrame(data['data'])
-        else:
-            df = data['data']
-        
-        # Calculate EMA
-        df['EMA'] = df['Close'].ewm(span=window, adjust=False).mean()
-        
-        # Return the latest value
-        return df['EMA'].iloc[-1] if not df['EMA'].empty else None
-    except Exception as e:
-        print(f"Error calculating EMA: {str(e)}")
-        return None
+    return compute_indicators(data, [f'ema_{window}'])[f'ema_{window}']
 
 def calculate_macd(data, fast=12, slow=26, signal=9):
     """
@@ -77,35 +902,8 @@ def calculate_macd(data, fast=12, slow=26, signal=9):
     Returns:
         dict: Dictionary containing MACD line, signal line, and histogram
     """
-    try:
-        if not data['success'] or not data['data']:
-            return {'macd': None, 'signal': None, 'histogram': None}
-        
-        # Convert to DataFrame if it's a list of dictionaries
-        if isinstance(data['data'], list):
-            df = pd.DataFrame(data['data'])
-        else:
-            df = data['data']
-        
-        # Calculate MACD
-        df['EMA_fast'] = df['Close'].ewm(span=fast, adjust=False).mean()
-        df['EMA_slow'] = df['Close'].ewm(span=slow, adjust=False).mean()
-        df['MACD'] = df['EMA_fast'] - df['EMA_slow']
-        df['Signal'] = df['MACD'].ewm(span=signal, adjust=False).mean()
-        df['Histogram'] = df['MACD'] - df['Signal']
-        
-        # Return the latest values
-        if df.empty:
-            return {'macd': None, 'signal': None, 'histogram': None}
-        
-        return {
-            'macd': df['MACD'].iloc[-1],
-            'signal': df['Signal'].iloc[-1],
-            'histogram': df['Histogram'].iloc[-1]
-        }
-    except Exception as e:
-        print(f"Error calculating MACD: {str(e)}")
-        return {'macd': None, 'signal': None, 'histogram': None}
+    name = f'macd_{fast}_{slow}_{signal}'
+    return compute_indicators(data, [name])[name]
 
 def calculate_rsi(data, window=14):
     """
@@ -118,114 +916,27 @@ def calculate_rsi(data, window=14):
     Returns:
         float: The latest RSI value
     """
-    try:
-        if not data['success'] or not data['data']:
-            return None
-        
-        # Convert to DataFrame if it's a list of dictionaries
-        if isinstance(data['data'], list):
-            df = pd.DataFrame(data['data'])
-        else:
-            df = data['data']
-        
-        # Calculate RSI
-        delta = df['Close'].diff()
-        gain = delta.where(delta > 0, 0)
-        loss = -delta.where(delta < 0, 0)
-        
-        avg_gain = gain.rolling(window=window).mean()
-        avg_loss = loss.rolling(window=window).mean()
-        
-        rs = avg_gain / avg_loss
-        rsi = 100 - (100 / (1 + rs))
-        
-        # Return the latest value
-        return rsi.iloc[-1] if not rsi.empty else None
-    except Exception as e:
-        print(f"Error calculating RSI: {str(e)}")
-        return None
+    return compute_indicators(data, [f'rsi_{window}'])[f'rsi_{window}']
 
-def predict_stock_price(data, days_to_predict=30):
+def predict_stock_price(data, days_to_predict=30, level=None):
     """
-    Predict stock prices using linear regression.
+    Predict stock prices by extrapolating a least squares trend line.
     
     Args:
         data (dict or list): Dictionary containing stock data or list of stock data points
         days_to_predict (int): Number of days to predict
+        level (int): If given, also return a prediction interval at this
+            confidence level in percent (e.g. 95)
     
     Returns:
-        list: List of predicted prices
+        list: List of predicted prices (empty without enough data), or with
+            level a dict of 'prices', 'lower', 'upper' and 'level'
     """
-    try:
-        # Check if data is empty
-        if not data:
-            return []
-        
-        # Handle both dictionary and list inputs
-        if isinstance(data, dict):
-            if not data.get('success', True) or not data.get('data', []):
-                return []
-            data_points = data['data']
-        else:
-            data_points = data
-        
-        # Convert to DataFrame if it's a list of dictionaries
-        if isinstance(data_points, list):
-            df = pd.DataFrame(data_points)
-        else:
-            df = data_points
-        
-        # Simple linear regression model
-        df['Day'] = range(len(df))
-        X = df[['Day']]
-        y = df['Close']
-        
-        # Scale the data
-        scaler_X = StandardScaler()
-        scaler_y = StandardScaler()
-        
-        X_scaled = scaler_X.fit_transform(X)
-        y_scaled = scaler_y.fit_transform(y.values.reshape(-1, 1))
-        
-        # Train the model
-        model = LinearRegression()
-        model.fit(X_scaled, y_scaled)
-        
-        # Predict future prices
-        future_days = np.array(range(len(df), len(df) + days_to_predict)).reshape(-1, 1)
-        future_days_scaled = scaler_X.transform(future_days)
-        future_prices_scaled = model.predict(future_days_scaled)
-        future_prices = scaler_y.inverse_transform(future_prices_scaled)
-        
-        return future_prices.flatten().tolist()
-    except Exception as e:
-        print(f"Error predicting stock prices: {str(e)}")
-        # Return mock predictions
-        try:
-            if isinstance(data, dict) and data.get('success', True) and data.get('data', []):
-                data_points = data['data']
-            else:
-                data_points = data
-                
-            if isinstance(data_points, list) and data_points:
-                last_price = data_points[-1]['Close']
-            elif hasattr(data_points, 'Close'):
-                last_price = data_points['Close'].iloc[-1]
-            else:
-                return []
-                
-            # Generate some random predictions based on the last price
-            predictions = []
-            for i in range(days_to_predict):
-                random_change = random.uniform(-0.02, 0.02)  # Random change between -2% and 2%
-                predicted_price = last_price * (1 + random_change)
-                predictions.append(predicted_price)
-                last_price = predicted_price
-            
-            return predictions
-        except Exception as inner_e:
-            print(f"Error generating mock predictions: {str(inner_e)}")
-            return []
+    if level is not None:
+        name = f'forecast_{days_to_predict}_{level}'
+    else:
+        name = f'prediction_{days_to_predict}'
+    return compute_indicators(data, [name])[name]
 
 def analyze_trend(data, window=20):
     """
@@ -238,30 +949,4 @@ def analyze_trend(data, window=20):
     Returns:
         str: Trend analysis ('uptrend', 'downtrend', or 'sideways')
     """
-    try:
-        if not data['success'] or not data['data']:
-            return 'unknown'
-        
-        # Convert to DataFrame if it's a list of dictionaries
-        if isinstance(data['data'], list):
-            df = pd.DataFrame(data['data'])
-        else:
-            df = data['data']
-        
-        # Calculate short and long-term moving averages
-        df['MA_short'] = df['Close'].rolling(window=window).mean()
-        df['MA_long'] = df['Close'].rolling(window=window*2).mean()
-        
-        # Determine trend
-        if df.empty or df['MA_short'].iloc[-1] is None or df['MA_long'].iloc[-1] is None:
-            return 'unknown'
-        
-        if df['MA_short'].iloc[-1] > df['MA_long'].iloc[-1] * 1.02:
-            return 'uptrend'
-        elif df['MA_short'].iloc[-1] < df['MA_long'].iloc[-1] * 0.98:
-            return 'downtrend'
-        else:
-            return 'sideways'
-    except Exception as e:
-        print(f"Error analyzing trend: {str(e)}")
-        return 'unknown' 
\ No newline at end of file
+    return compute_indicators(data, [f'trend_{window}'])[f'trend_{window}']
\ No newline at end of file
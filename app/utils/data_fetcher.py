@@ -1,169 +1,740 @@
-import yfinance as yf
 import pandas as pd
-from datetime import datetime, timedelta
-import random
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from app.utils.bar_store import BarStore
+from app.utils.cache import LRUCache, TieredCache, ttl_for_interval
+from app.utils.periods import FULL_HISTORY, period_start, slice_period
+from app.utils.providers import YFinanceProvider, create_provider
+from app.utils.resample import covering_windows, plan_fetch, resample_columns, slice_columns
+from app.utils.serialization import columns_to_records, frame_to_columns
+from app.utils.symbol_search import DEFAULT_LISTINGS_FILE, SymbolIndex, load_listings
+from app.utils.synthetic import bars_to_frame, generate_bars, generate_info
 
-def get_stock_data(symbol, period='1y', interval='1d'):
+# Source of bars and metadata; selected by MARKET_DATA_PROVIDER in init_app()
+_provider = YFinanceProvider()
+
+# Fall back to generated mock data when the provider fails
+_mock_fallback = True
+_synthetic_seed = 0
+
+# Cache of fetched price history keyed on (shape, symbol, period, interval),
+# holding both columnar arrays and the legacy records derived from them.
+# Memory-only until init_app() attaches the on-disk tier.
+_bar_cache = TieredCache()
+
+# Company metadata (stock.info) keyed on symbol; changes at most daily
+_info_cache = TieredCache(max_bytes=8 * 1024 * 1024)
+_info_ttl = 24 * 3600
+
+# Latest quote per symbol for the price tickers; kept only briefly
+_quote_cache = LRUCache(max_bytes=4 * 1024 * 1024)
+_quote_ttl = 15
+
+# Local columnar history per (symbol, interval); enabled by init_app()
+_bar_store = None
+
+# Derive coarser intervals and shorter periods from a base history instead
+# of fetching each (period, interval) separately; see resample.plan_fetch()
+_resample_enabled = True
+_derived_counts = {'sliced': 0, 'resampled': 0}
+_derived_counts_lock = threading.Lock()
+
+# Shared pool for get_multiple_stocks_data; sized by init_app()
+_fetch_executor = None
+_fetch_executor_lock = threading.Lock()
+_fetch_max_workers = 8
+_fetch_timeout = 20
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls that share a key into a single in-flight call.
+    
+    The first caller for a key runs the function; callers arriving while it
+    is running wait for it and receive the same result (or exception).
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.executed = 0
+        self.coalesced = 0
+    
+    def do(self, key, fn, *args, **kwargs):
+        """
+        Run fn(*args, **kwargs) unless an identical call is already in flight.
+        
+        Args:
+            key: Hashable key identifying identical calls
+            fn (callable): Function to run
+        
+        Returns:
+            The result of the single shared call
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _FlightCall()
+                self._calls[key] = call
+                self.executed += 1
+            else:
+                self.coalesced += 1
+        
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        
+        try:
+            call.result = fn(*args, **kwargs)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+    
+    def stats(self):
+        """Return how many calls ran and how many were coalesced onto them."""
+        with self._lock:
+            return {
+                'in_flight': len(self._calls),
+                'executed': self.executed,
+                'coalesced': self.coalesced
+            }
+
+class _FlightCall:
+    """State of one in-flight SingleFlight call."""
+    
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+# Symbol search index over LISTINGS_FILE; built on first search
+_listings_file = DEFAULT_LISTINGS_FILE
+_symbol_index = None
+_symbol_index_lock = threading.Lock()
+
+# Concurrent identical provider fetches share one upstream request
+_fetch_flight = SingleFlight()
+
+def init_app(app):
     """
-    Fetch stock data from Yahoo Finance.
+    Configure the market data cache from the Flask app config.
+    
+    Args:
+        app (Flask): Flask application
+    """
+    global _provider, _mock_fallback, _synthetic_seed, _bar_cache, _info_cache, _info_ttl, _bar_store
+    global _quote_cache, _quote_ttl, _resample_enabled
+    global _fetch_executor, _fetch_max_workers, _fetch_timeout, _listings_file, _symbol_index
+    
+    _provider = create_provider(app.config, app.instance_path)
+    _mock_fallback = app.config.get('MARKET_DATA_FALLBACK', True)
+    _synthetic_seed = app.config.get('SYNTHETIC_SEED', 0)
+    
+    with _fetch_executor_lock:
+        _fetch_max_workers = app.config.get('FETCH_MAX_WORKERS', _fetch_max_workers)
+        _fetch_timeout = app.config.get('FETCH_TIMEOUT', _fetch_timeout)
+        if _fetch_executor is not None:
+            _fetch_executor.shutdown(wait=False)
+            _fetch_executor = None
+    
+    with _symbol_index_lock:
+        _listings_file = app.config.get('LISTINGS_FILE') or DEFAULT_LISTINGS_FILE
+        _symbol_index = None
+    
+    # A replay provider's windows end at its last recorded bar, not now
+    if app.config.get('BAR_STORE_ENABLED', True) and _provider.live:
+        store_dir = app.config.get('BAR_STORE_DIR') or os.path.join(app.instance_path, 'bars')
+        _bar_store = BarStore(store_dir)
+    else:
+        _bar_store = None
+    
+    _quote_ttl = app.config.get('QUOTE_CACHE_TTL', _quote_ttl)
+    _resample_enabled = app.config.get('RESAMPLE_ENABLED', True) and _provider.live
+    
+    if not app.config.get('CACHE_ENABLED', True):
+        _bar_cache = _info_cache = _quote_cache = None
+        return
+    
+    _quote_cache = LRUCache(max_bytes=app.config.get('QUOTE_CACHE_MAX_BYTES', 4 * 1024 * 1024))
+    
+    cache_dir = app.config.get('CACHE_DIR') or os.path.join(app.instance_path, 'cache')
+    _bar_cache = TieredCache(
+        max_bytes=app.config.get('CACHE_MAX_BYTES', 64 * 1024 * 1024),
+        directory=os.path.join(cache_dir, 'bars')
+    )
+    _info_cache = TieredCache(
+        max_bytes=app.config.get('INFO_CACHE_MAX_BYTES', 8 * 1024 * 1024),
+        directory=os.path.join(cache_dir, 'info')
+    )
+    _info_ttl = app.config.get('INFO_CACHE_TTL', _info_ttl)
+
+def get_cache_stats():
+    """
+    Get hit/miss/eviction counters for the market data caches, the
+    number of fetches coalesced by single-flight and the number of
+    histories derived from another one instead of fetched.
+    
+    Returns:
+        dict: Counters for the price history, metadata and quote caches
+            (None if caching is disabled), for single-flight and for
+            'derived' histories
+    """
+    return {
+        'bars': _bar_cache.stats() if _bar_cache is not None else None,
+        'info': _info_cache.stats() if _info_cache is not None else None,
+        'quotes': _quote_cache.stats() if _quote_cache is not None else None,
+        'single_flight': _fetch_flight.stats(),
+        'derived': _derived_stats()
+    }
+
+def get_stock_info(symbol):
+    """
+    Fetch company metadata (Yahoo Finance ``info``) for a stock.
+    
+    Metadata is fetched separately from price history and cached with a long
+    time-to-live, since it changes at most daily.
+    
+    Args:
+        symbol (str): Stock symbol (e.g., 'AAPL', 'MSFT')
+    
+    Returns:
+        dict: Company metadata, or an empty dict if it could not be fetched
+    """
+    cache_key = ('info', symbol.upper())
+    if _info_cache is not None:
+        cached = _info_cache.get(cache_key)
+        if cached is not None:
+            return cached
+    
+    return _fetch_flight.do(cache_key, _load_stock_info, symbol, cache_key)
+
+def _load_stock_info(symbol, cache_key):
+    """Fetch company metadata from the provider and cache it."""
+    if _info_cache is not None:
+        # Another caller may have filled the cache since our lookup
+        cached = _info_cache.get(cache_key)
+        if cached is not None:
+            return cached
+    
+    try:
+        info = _provider.fetch_info(symbol)
+    except Exception as e:
+        print(f"Error fetching info for {symbol}: {str(e)}")
+        return {}
+    
+    if _info_cache is not None and info:
+        _info_cache.set(cache_key, info, ttl=_info_ttl)
+    
+    return info
+
+def _fetch_history(symbol, period, interval):
+    """
+    Get price history for a period window from the bar store, asking the
+    provider only for bars newer than the last stored one.
+    
+    Args:
+        symbol (str): Stock symbol
+        period (str): Period of data to fetch
+        interval (str): Data interval
+    
+    Returns:
+        pd.DataFrame: Price history indexed by 'Date'
+    """
+    if _bar_store is None:
+        return _provider.fetch_bars(symbol, period=period, interval=interval)
+    
+    start = period_start(period)
+    covered_from = _bar_store.covered_from(symbol, interval)
+    last_stored = _bar_store.last_timestamp(symbol, interval) if covered_from is not None else None
+    
+    if last_stored is not None and covered_from <= start:
+        # Re-fetch from the last stored bar so a still-forming bar gets refreshed
+        tail = _provider.fetch_bars(symbol, interval=interval, start=last_stored)
+        appended = _bar_store.append(symbol, interval, tail)
+    else:
+        appended = False
+    
+    if not appended:
+        history = _provider.fetch_bars(symbol, period=period, interval=interval)
+        if history.empty:
+            return history
+        _bar_store.write(symbol, interval, history, covered_from=start)
+    
+    bars = _bar_store.read(symbol, interval, start=None if start == FULL_HISTORY else start)
+    if bars is None:
+        return _provider.fetch_bars(symbol, period=period, interval=interval)
+    return slice_period(bars, period)
+
+def get_stock_data(symbol, period='1y', interval='1d', include_info=True):
+    """
+    Fetch stock data from the configured market data provider.
     
     Args:
         symbol (str): Stock symbol (e.g., 'AAPL', 'MSFT')
         period (str): Period of data to fetch (e.g., '1d', '5d', '1mo', '3mo', '6mo', '1y', '2y', '5y', '10y', 'ytd', 'max')
         interval (str): Data interval (e.g., '1m', '2m', '5m', '15m', '30m', '60m', '90m', '1h', '1d', '5d', '1wk', '1mo', '3mo')
+        include_info (bool): Whether to attach company metadata (see get_stock_info);
+            when False, 'info' is an empty dict and no metadata is fetched
     
     Returns:
         dict: Dictionary containing stock data and success status
     """
+    cache_key = ('bars', symbol.upper(), period, interval)
+    if _bar_cache is not None:
+        cached = _bar_cache.get(cache_key)
+        if cached is not None:
+            return _with_info(cached, symbol, include_info)
+    
+    result = _fetch_flight.do(cache_key, _load_stock_data, symbol, period, interval, cache_key)
+    if 'info' in result:
+        # Mock fallback data carries its own info
+        return result
+    return _with_info(result, symbol, include_info)
+
+def _load_stock_data(symbol, period, interval, cache_key):
+    """Build the legacy list-of-records shape from the columnar data and cache it."""
+    if _bar_cache is not None:
+        # Another caller may have filled the cache since our lookup
+        cached = _bar_cache.get(cache_key)
+        if cached is not None:
+            return cached
+    
+    columnar = get_stock_columns(symbol, period, interval)
+    if not columnar['success']:
+        return {'success': False, 'error': columnar.get('error', 'Unknown error'), 'data': [], 'info': {}}
+    
+    result = {
+        'success': True,
+        'data': columns_to_records(columnar['data'], columnar['tz'])
+    }
+    
+    if 'info' in columnar:
+        # Mock fallback data is not cached
+        result['info'] = columnar['info']
+    elif _bar_cache is not None:
+        _bar_cache.set(cache_key, result, ttl=ttl_for_interval(interval))
+    
+    return result
+
+def get_stock_columns(symbol, period='1y', interval='1d'):
+    """
+    Fetch stock data as columns of NumPy arrays instead of a list of records.
+    
+    Cheaper to build, cache and serialize than get_stock_data(), especially
+    for long or intraday histories.
+    
+    Args:
+        symbol (str): Stock symbol (e.g., 'AAPL', 'MSFT')
+        period (str): Period of data to fetch
+        interval (str): Data interval
+    
+    Returns:
+        dict: 'success', 'data' (column name -> array, with 'Date' as int64
+            milliseconds since the epoch in UTC) and 'tz' (exchange time zone).
+            Mock fallback data also carries 'info'; failures carry 'error'.
+    """
+    cache_key = ('columns', symbol.upper(), period, interval)
+    if _bar_cache is not None:
+        cached = _bar_cache.get(cache_key)
+        if cached is not None:
+            return cached
+    
+    return _fetch_flight.do(cache_key, _load_stock_columns, symbol, period, interval, cache_key)
+
+def _load_stock_columns(symbol, period, interval, cache_key):
+    """Fetch price history from the provider and cache it as columns."""
+    if _bar_cache is not None:
+        # Another caller may have filled the cache since our lookup
+        cached = _bar_cache.get(cache_key)
+        if cached is not None:
+            return cached
+    
+    if _resample_enabled:
+        derived = _derive_stock_columns(symbol, period, interval)
+        if derived is not None:
+            return derived
+    
     try:
-        stock = yf.Ticker(symbol)
-        data = stock.history(period=period, interval=interval)
+        columns, tz = frame_to_columns(_fetch_history(symbol, period, interval))
+        result = {'success': True, 'data': columns, 'tz': tz}
         
-        # Reset index to make Date a column
-        data = data.reset_index()
+        # Only real provider data is cached; mock fallbacks are retried next time
+        if _bar_cache is not None:
+            _bar_cache.set(cache_key, result, ttl=ttl_for_interval(interval))
         
-        # Convert Date to string format for JSON serialization
-        data['Date'] = data['Date'].dt.strftime('%Y-%m-%d %H:%M:%S')
-        
-        return {
-            'success': True,
-            'data': data.to_dict('records'),
-            'info': stock.info
-        }
+        return result
     except Exception as e:
         print(f"Error fetching data for {symbol}: {str(e)}")
+        if not _mock_fallback:
+            return {'success': False, 'error': str(e), 'data': {}, 'tz': 'UTC', 'info': {}}
         # Return mock data for demonstration purposes
-        return get_mock_stock_data(symbol, period, interval)
-
-def get_mock_stock_data(symbol, period='1y', interval='1d'):
-    """Generate mock stock data when API calls fail."""
-    # Generate dates
-    end_date = datetime.now()
-    
-    if period == '1d':
-        days = 1
-    elif period == '5d':
-        days = 5
-    elif period == '1mo':
-        days = 30
-    elif period == '3mo':
-        days = 90
-    elif period == '6mo':
-        days = 180
-    elif period == '1y':
-        days = 365
+        return _get_mock_stock_columns(symbol, period, interval)
+
+def _derive_stock_columns(symbol, period, interval):
+    """
+    Build a history from another one rather than fetching it.
+    
+    A longer cached window of the same interval is sliced down to the
+    period; otherwise the base history chosen by plan_fetch() is loaded
+    (from the cache or with one provider fetch) and sliced and resampled.
+    
+    Returns:
+        dict: The history in the get_stock_columns() shape, or None if it
+            has to be fetched as it is
+    """
+    if _bar_cache is not None:
+        for window in covering_windows(period):
+            source_key = ('columns', symbol.upper(), window, interval)
+            cached = _bar_cache.get(source_key)
+            if cached is not None:
+                _count_derived('sliced')
+                return _derived_result(symbol, period, interval, cached, slice_columns(cached['data'], cached['tz'], period),
+                                       source_key)
+    
+    plan = plan_fetch(period, interval)
+    if plan is None:
+        return None
+    
+    base_interval, window = plan
+    base = get_stock_columns(symbol, window, base_interval)
+    if not base['success']:
+        return base
+    
+    columns = slice_columns(base['data'], base['tz'], period)
+    if base_interval != interval:
+        # Drop a leading bucket that starts before the period, as the provider does
+        columns = slice_columns(resample_columns(columns, base['tz'], interval), base['tz'], period)
+        _count_derived('resampled')
     else:
-        days = 365
-    
-    start_date = end_date - timedelta(days=days)
-    
-    # Generate price data
-    base_price = random.uniform(50, 200)
-    price_data = []
-    
-    current_date = start_date
-    while current_date <= end_date:
-        if current_date.weekday() < 5:  # Only weekdays
-            daily_change = random.uniform(-2, 2)
-            open_price = base_price
-            close_price = base_price + daily_change
-            high_price = max(open_price, close_price) + random.uniform(0, 1)
-            low_price = min(open_price, close_price) - random.uniform(0, 1)
-            volume = random.randint(1000000, 10000000)
-            
-            price_data.append({
-                'Date': current_date.strftime('%Y-%m-%d %H:%M:%S'),
-                'Open': open_price,
-                'High': high_price,
-                'Low': low_price,
-                'Close': close_price,
-                'Volume': volume
-            })
-            
-            base_price = close_price
-        
-        if interval == '1d':
-            current_date += timedelta(days=1)
-        elif interval == '1wk':
-            current_date += timedelta(days=7)
-        elif interval == '1mo':
-            current_date += timedelta(days=30)
-        else:
-            current_date += timedelta(days=1)
+        _count_derived('sliced')
+    return _derived_result(symbol, period, interval, base, columns, ('columns', symbol.upper(), window, base_interval))
+
+def _derived_result(symbol, period, interval, source, columns, source_key):
+    """Wrap derived columns like their source and cache them unless the source is mock data."""
+    result = {'success': True, 'data': columns, 'tz': source['tz']}
+    if 'info' in source:
+        result['info'] = source['info']
+    elif _bar_cache is not None:
+        # Derived bars must not outlive the history they came from
+        ttl = _bar_cache.remaining_ttl(source_key)
+        if ttl is None or ttl > 0:
+            _bar_cache.set(('columns', symbol.upper(), period, interval), result,
+                           ttl=min(ttl or ttl_for_interval(interval), ttl_for_interval(interval)))
+    return result
+
+def _count_derived(kind):
+    """Count a derived history; requests derive them from many threads."""
+    with _derived_counts_lock:
+        _derived_counts[kind] += 1
+
+def _derived_stats():
+    """Snapshot of the derived history counters."""
+    with _derived_counts_lock:
+        return dict(_derived_counts)
+
+def _with_info(result, symbol, include_info):
+    """Return a copy of a cached price result with company metadata attached."""
+    return dict(result, info=get_stock_info(symbol) if include_info else {})
+
+def get_mock_stock_data(symbol, period='1y', interval='1d', seed=None):
+    """
+    Generate mock stock data when API calls fail.
     
-    # Mock company info
-    mock_info = {
-        'symbol': symbol,
-        'shortName': f"{symbol} Inc.",
-        'longName': f"{symbol} Corporation",
-        'sector': 'Technology',
-        'industry': 'Software',
-        'website': f"https://www.{symbol.lower()}.com",
-        'marketCap': random.randint(1000000000, 2000000000),
-        'regularMarketPrice': price_data[-1]['Close'],
-        'regularMarketOpen': price_data[-1]['Open'],
-        'regularMarketDayHigh': price_data[-1]['High'],
-        'regularMarketDayLow': price_data[-1]['Low'],
-        'regularMarketVolume': price_data[-1]['Volume'],
-        'regularMarketChange': price_data[-1]['Close'] - price_data[-1]['Open'],
-        'regularMarketChangePercent': ((price_data[-1]['Close'] - price_data[-1]['Open']) / price_data[-1]['Open']) * 100,
-        'fiftyTwoWeekHigh': max([data['High'] for data in price_data]),
-        'fiftyTwoWeekLow': min([data['Low'] for data in price_data]),
-        'country': 'United States',
-        'exchangeName': 'NASDAQ',
-        'quoteType': 'EQUITY',
-        'longBusinessSummary': f"This is a mock description for {symbol} Inc. The company specializes in software development and technology solutions."
+    Bars come from the seeded synthetic generator, so the same symbol,
+    period and interval always produce the same data on a given day.
+    
+    Args:
+        symbol (str): Stock symbol
+        period (str): Period of data to generate
+        interval (str): Data interval
+        seed (int): Generator seed (defaults to SYNTHETIC_SEED)
+    
+    Returns:
+        dict: Dictionary containing stock data and success status
+    """
+    columnar = _get_mock_stock_columns(symbol, period, interval, seed)
+    
+    return {
+        'success': True,
+        'data': columns_to_records(columnar['data'], columnar['tz']),
+        'info': columnar['info']
     }
+
+def _get_mock_stock_columns(symbol, period='1y', interval='1d', seed=None):
+    """Generate mock stock data in the get_stock_columns() shape."""
+    if seed is None:
+        seed = _synthetic_seed
+    
+    bars = bars_to_frame(generate_bars([symbol], period=period, interval=interval, seed=seed))
+    columns, tz = frame_to_columns(bars)
     
     return {
         'success': True,
-        'data': price_data,
-        'info': mock_info
+        'data': columns,
+        'tz': tz,
+        'info': generate_info(symbol, bars, seed=seed)
+    }
+
+def get_quotes(symbols):
+    """
+    Get the latest quote for several stocks.
+    
+    Quotes are served from a short-lived quote cache; symbols that miss are
+    fetched together in one provider batch call covering the last few
+    daily bars, rather than a full price history each.
+    
+    Args:
+        symbols (list): List of stock symbols
+    
+    Returns:
+        dict: Symbol -> quote dict with 'symbol', 'price', 'previous_close',
+            'change', 'change_percent' and 'timestamp' (epoch milliseconds of
+            the latest bar), or None if no quote could be fetched
+    """
+    symbols = list(dict.fromkeys(symbol.upper() for symbol in symbols))
+    quotes = {}
+    missing = []
+    for symbol in symbols:
+        quote = _quote_cache.get(('quote', symbol)) if _quote_cache is not None else None
+        if quote is None:
+            missing.append(symbol)
+        else:
+            quotes[symbol] = quote
+    
+    if missing:
+        key = ('quotes',) + tuple(sorted(missing))
+        quotes.update(_fetch_flight.do(key, _load_quotes, missing))
+    
+    return {symbol: quotes.get(symbol) for symbol in symbols}
+
+def _load_quotes(symbols):
+    """Fetch quotes for symbols in one provider batch call and cache them."""
+    try:
+        bars = _provider.fetch_bars_batch(symbols, period='5d', interval='1d')
+    except Exception as e:
+        print(f"Error fetching quotes for {', '.join(symbols)}: {str(e)}")
+        bars = {}
+    
+    quotes = {}
+    for symbol in symbols:
+        quote = _quote_from_bars(symbol, bars.get(symbol))
+        if quote is not None:
+            quotes[symbol] = quote
+            if _quote_cache is not None:
+                _quote_cache.set(('quote', symbol), quote, ttl=_quote_ttl, size=256)
+    
+    failed = [symbol for symbol in symbols if symbol not in quotes]
+    if failed and _mock_fallback:
+        # One vectorized call generates every missing symbol; mock quotes are not cached
+        mock = generate_bars(failed, period='5d', interval='1d', seed=_synthetic_seed)
+        for i, symbol in enumerate(failed):
+            quotes[symbol] = _quote_from_bars(symbol, bars_to_frame(mock, i))
+    
+    return quotes
+
+def get_bars_batch(symbols, period='1y', interval='1d', fallback=None):
+    """
+    Fetch bars for many symbols with one provider batch call.
+    
+    Meant for background jobs over a whole universe; results are not cached.
+    Symbols the provider fails on fall back to mock data (generated in one
+    vectorized call) when fallback is on, and are otherwise left out.
+    
+    Args:
+        symbols (list): Stock symbols
+        period (str): Period of data to fetch
+        interval (str): Data interval
+        fallback (bool): Fill in failed symbols with mock data (defaults to
+            MARKET_DATA_FALLBACK); jobs that persist or publish what they
+            compute should pass False
+    
+    Returns:
+        dict: Symbol -> columns as returned in get_stock_columns()['data']
+    """
+    try:
+        frames = _provider.fetch_bars_batch(symbols, period=period, interval=interval)
+    except Exception as e:
+        print(f"Error fetching bars for {len(symbols)} symbols: {str(e)}")
+        frames = {}
+    
+    result = {}
+    for symbol in symbols:
+        frame = frames.get(symbol)
+        if frame is not None and not frame.empty:
+            result[symbol] = frame_to_columns(frame)[0]
+    
+    failed = [symbol for symbol in symbols if symbol not in result]
+    if failed and (_mock_fallback if fallback is None else fallback):
+        mock = generate_bars(failed, period=period, interval=interval, seed=_synthetic_seed)
+        for i, symbol in enumerate(failed):
+            result[symbol] = frame_to_columns(bars_to_frame(mock, i))[0]
+    
+    return {symbol: result[symbol] for symbol in symbols if symbol in result}
+
+def _quote_from_bars(symbol, bars):
+    """Build a quote from the last two bars of a bars DataFrame, or None if it is empty."""
+    if bars is None:
+        return None
+    closes = bars['Close'].dropna()
+    if closes.empty:
+        return None
+    
+    price = float(closes.iloc[-1])
+    previous_close = float(closes.iloc[-2]) if len(closes) > 1 else float(bars['Open'].loc[closes.index[-1]])
+    change = price - previous_close
+    
+    return {
+        'symbol': symbol,
+        'price': price,
+        'previous_close': previous_close,
+        'change': change,
+        'change_percent': change / previous_close * 100 if previous_close else 0.0,
+        'timestamp': int(pd.Timestamp(closes.index[-1]).value // 10**6)
     }
 
-def get_multiple_stocks_data(symbols, period='1y', interval='1d'):
+def _get_fetch_executor():
+    """Get the shared thread pool used for batched fetches."""
+    global _fetch_executor
+    
+    with _fetch_executor_lock:
+        if _fetch_executor is None:
+            _fetch_executor = ThreadPoolExecutor(
+                max_workers=_fetch_max_workers,
+                thread_name_prefix='stock-fetch'
+            )
+        return _fetch_executor
+
+def get_multiple_stocks_data(symbols, period='1y', interval='1d', timeout=None, include_info=True):
     """
-    Fetch data for multiple stocks.
+    Fetch data for multiple stocks concurrently.
+    
+    Symbols are fetched in parallel on a bounded thread pool, so the batch
+    takes about as long as its slowest symbol. A symbol that fails or times
+    out is reported with success False without affecting the others.
+    
+    Each symbol's timeout runs from when a worker starts fetching it, so a
+    slow symbol only uses up its own budget. Symbols queued behind a full
+    pool time out if no worker picks them up within one timeout per wave
+    of workers.
     
     Args:
         symbols (list): List of stock symbols
         period (str): Period of data to fetch
         interval (str): Data interval
+        timeout (float): Seconds each symbol may take once its fetch starts
+            (defaults to FETCH_TIMEOUT)
+        include_info (bool): Whether to attach company metadata to each result
     
     Returns:
         dict: Dictionary with stock symbols as keys and their data as values
     """
+    symbols = list(dict.fromkeys(symbols))
+    if not symbols:
+        return {}
+    
+    if len(symbols) == 1:
+        return {symbols[0]: get_stock_data(symbols[0], period, interval, include_info)}
+    
+    if timeout is None:
+        timeout = _fetch_timeout
+    
+    # When each symbol's fetch started on a worker
+    started = {}
+    
+    def fetch(symbol):
+        started[symbol] = time.monotonic()
+        return get_stock_data(symbol, period, interval, include_info)
+    
+    executor = _get_fetch_executor()
+    futures = {executor.submit(fetch, symbol): symbol for symbol in symbols}
+    
+    # Symbols beyond the pool size queue behind earlier ones, so a queued
+    # symbol may wait one timeout per wave of workers to start
+    waves = -(-len(symbols) // _fetch_max_workers)
+    queue_deadline = time.monotonic() + timeout * waves
+    
+    def deadline(future):
+        start = started.get(futures[future])
+        return queue_deadline if start is None else start + timeout
+    
+    pending = set(futures)
+    timed_out = set()
+    while pending:
+        now = time.monotonic()
+        expired = {future for future in pending if not future.done() and deadline(future) <= now}
+        timed_out |= expired
+        pending -= expired
+        if not pending:
+            break
+        _, pending = wait(pending, timeout=min(deadline(future) for future in pending) - now,
+                          return_when=FIRST_COMPLETED)
+    
     result = {}
-    for symbol in symbols:
-        result[symbol] = get_stock_data(symbol, period, interval)
-    return result
+    for future, symbol in futures.items():
+        if future in timed_out:
+            future.cancel()
+            print(f"Timed out fetching data for {symbol}")
+            if symbol in started:
+                error = f"Timed out after {timeout} seconds"
+            else:
+                error = f"Timed out waiting {timeout * waves} seconds for a fetch worker"
+            result[symbol] = {'success': False, 'error': error, 'data': [], 'info': {}}
+            continue
+        
+        try:
+            result[symbol] = future.result()
+        except Exception as e:
+            print(f"Error fetching data for {symbol}: {str(e)}")
+            result[symbol] = {'success': False, 'error': str(e), 'data': [], 'info': {}}
+    
+    # Preserve the caller's symbol order
+    return {symbol: result[symbol] for symbol in symbols}
+
+def _get_symbol_index():
+    """Get the symbol search index, loading LISTINGS_FILE on first use."""
+    global _symbol_index
+    
+    with _symbol_index_lock:
+        if _symbol_index is None:
+            _symbol_index = SymbolIndex(load_listings(_listings_file))
+        return _symbol_index
 
-def search_stocks(query):
+def get_listings():
+    """
+    Get the listing universe from LISTINGS_FILE.
+    
+    Returns:
+        list: Dicts with 'symbol', 'name', 'exchange' and 'sector', in file order
+    """
+    return _get_symbol_index().listings
+
+def search_stocks(query, limit=50, autocomplete=False):
     """
     Search for stocks by name or symbol.
     
     Args:
         query (str): Search query
+        limit (int): Maximum number of results
+        autocomplete (bool): Prefix-only matching for search-as-you-type
     
     Returns:
         dict: Dictionary containing search results
     """
     try:
-        # For simplicity, return some mock results
-        mock_results = [
-            {'symbol': 'AAPL', 'name': 'Apple Inc.', 'exchange': 'NASDAQ', 'sector': 'Technology'},
-            {'symbol': 'MSFT', 'name': 'Microsoft Corporation', 'exchange': 'NASDAQ', 'sector': 'Technology'},
-            {'symbol': 'GOOGL', 'name': 'Alphabet Inc.', 'exchange': 'NASDAQ', 'sector': 'Technology'},
-            {'symbol': 'AMZN', 'name': 'Amazon.com, Inc.', 'exchange': 'NASDAQ', 'sector': 'Consumer Cyclical'},
-            {'symbol': 'TSLA', 'name': 'Tesla, Inc.', 'exchange': 'NASDAQ', 'sector': 'Consumer Cyclical'}
-        ]
-        
-        # Filter results based on query
-        filtered_results = [r for r in mock_results if query.lower() in r['symbol'].lower() or query.lower() in r['name'].lower()]
+        results = _get_symbol_index().search(query, limit=limit, autocomplete=autocomplete)
         
         return {
             'success': True,
-            'results': filtered_results
+            'results': results
         }
     except Exception as e:
         print(f"Error searching stocks: {str(e)}")
@@ -171,4 +742,4 @@ def search_stocks(query):
             'success': False,
             'error': str(e),
             'results': []
-        } 
\ No newline at end of file
+        }
\ No newline at end of file
@@ -1,9 +1,56 @@
-import plotly.graph_objects as go
-import plotly.express as px
-from plotly.subplots import make_subplots
 import pandas as pd
+import numpy as np
 import json
 
+from app.utils.chart_spec import FigureSpec
+from app.utils.comparison import ReturnMatrix
+from app.utils.serialization import RECORD_DATE_FORMAT
+
+def _chart_data(data):
+    """
+    Return the dates and numeric columns of stock data for plotting.
+    
+    Args:
+        data (dict): get_stock_data() or get_stock_columns() result
+    
+    Returns:
+        tuple: (dates, columns) where dates is a list of date strings in the
+            exchange's local time and columns maps each numeric bar column
+            to a float64 array, or None if there is no data
+    """
+    if not data['success'] or data.get('data') is None or len(data['data']) == 0:
+        return None
+    
+    bars = data['data']
+    if isinstance(bars, list):
+        columns = {column: [row.get(column) for row in bars] for column in bars[0]}
+    elif isinstance(bars, pd.DataFrame):
+        columns = {column: bars[column].to_numpy() for column in bars.columns}
+        columns.setdefault('Date', bars.index)
+    else:
+        columns = dict(bars)
+    
+    dates = columns.pop('Date')
+    if isinstance(dates, np.ndarray) and dates.dtype.kind in 'iu':
+        # Epoch milliseconds from get_stock_columns()
+        dates = pd.to_datetime(dates, unit='ms', utc=True).tz_convert(data.get('tz') or 'UTC')
+        dates = dates.strftime(RECORD_DATE_FORMAT)
+    dates = list(dates)
+    
+    numeric = {}
+    for name, values in columns.items():
+        try:
+            numeric[name] = np.asarray(values, dtype=np.float64)
+        except (TypeError, ValueError):
+            continue
+    return dates, numeric
+
+def _indicator_values(values, length):
+    """Return an indicator series as plotted y values, repeating a scalar across the chart."""
+    if values is None or np.isscalar(values):
+        return np.full(length, np.nan if values is None else values, dtype=np.float64)
+    return values
+
 def create_candlestick_chart(data, title='Stock Price'):
     """
     Create a candlestick chart for stock data.
@@ -16,35 +63,32 @@ def create_candlestick_chart(data, title='Stock Price'):
         dict: JSON representation of the chart
     """
     try:
-        if not data['success'] or not data['data']:
+        chart_data = _chart_data(data)
+        if chart_data is None:
             return json.dumps({'data': [], 'layout': {'title': 'No data available'}})
-        
-        # Convert to DataFrame if it's a list of dictionaries
-        if isinstance(data['data'], list):
-            df = pd.DataFrame(data['data'])
-        else:
-            df = data['data']
+        dates, columns = chart_data
         
         # Create candlestick chart
-        fig = go.Figure(data=[go.Candlestick(
-            x=df['Date'],
-            open=df['Open'],
-            high=df['High'],
-            low=df['Low'],
-            close=df['Close'],
+        fig = FigureSpec()
+        fig.add_trace(
+            'candlestick',
+            x=dates,
+            open=columns['Open'],
+            high=columns['High'],
+            low=columns['Low'],
+            close=columns['Close'],
             name='Price'
-        )])
+        )
         
         # Update layout
         fig.update_layout(
             title=title,
-            xaxis_title='Date',
-            yaxis_title='Price',
-            xaxis_rangeslider_visible=False,
+            xaxis=dict(title='Date', rangeslider=dict(visible=False)),
+            yaxis=dict(title='Price'),
             template='plotly_white'
         )
         
-        return json.dumps(fig.to_dict())
+        return fig.to_json()
     except Exception as e:
         print(f"Error creating candlestick chart: {str(e)}")
         return json.dumps({'data': [], 'layout': {'title': 'Error creating chart'}})
@@ -62,37 +106,35 @@ def create_line_chart(data, y_column='Close', title='Stock Price'):
         dict: JSON representation of the chart
     """
     try:
-        if not data['success'] or not data['data']:
+        chart_data = _chart_data(data)
+        if chart_data is None:
             return json.dumps({'data': [], 'layout': {'title': 'No data available'}})
-        
-        # Convert to DataFrame if it's a list of dictionaries
-        if isinstance(data['data'], list):
-            df = pd.DataFrame(data['data'])
-        else:
-            df = data['data']
+        dates, columns = chart_data
         
         # Create line chart
-        fig = go.Figure(data=[go.Scatter(
-            x=df['Date'],
-            y=df[y_column],
+        fig = FigureSpec()
+        fig.add_trace(
+            'scatter',
+            x=dates,
+            y=columns[y_column],
             mode='lines',
             name=y_column
-        )])
+        )
         
         # Update layout
         fig.update_layout(
             title=title,
-            xaxis_title='Date',
-            yaxis_title=y_column,
+            xaxis=dict(title='Date'),
+            yaxis=dict(title=y_column),
             template='plotly_white'
         )
         
-        return json.dumps(fig.to_dict())
+        return fig.to_json()
     except Exception as e:
         print(f"Error creating line chart: {str(e)}")
         return json.dumps({'data': [], 'layout': {'title': 'Error creating chart'}})
 
-def create_technical_analysis_chart(data, ma_periods=[20, 50, 200], include_volume=True):
+def create_technical_analysis_chart(data, ma_periods=[20, 50, 200], include_volume=True, moving_averages=None):
     """
     Create a technical analysis chart with moving averages and volume.
     
@@ -100,157 +142,124 @@ def create_technical_analysis_chart(data, ma_periods=[20, 50, 200], include_volu
         data (dict): Dictionary containing stock data
         ma_periods (list): List of periods for moving averages
         include_volume (bool): Whether to include volume subplot
+        moving_averages (dict): Precomputed moving average series by period,
+            e.g. from compute_indicators(output='series'); when given, these
+            periods are plotted instead of ma_periods
     
     Returns:
         dict: JSON representation of the chart
     """
     try:
-        if not data['success'] or not data['data']:
+        chart_data = _chart_data(data)
+        if chart_data is None:
             return json.dumps({'data': [], 'layout': {'title': 'No data available'}})
+        dates, columns = chart_data
         
-        # Convert to DataFrame if it's a list of dictionaries
-        if isinstance(data['data'], list):
-            df = pd.DataFrame(data['data'])
+        # Calculate moving averages unless they were passed in
+        if moving_averages is not None:
+            averages = {period: _indicator_values(values, len(dates)) for period, values in moving_averages.items()}
         else:
-            df = data['data']
+            close = pd.Series(columns['Close'])
+            averages = {period: close.rolling(window=period).mean().to_numpy() for period in ma_periods}
         
-        # Calculate moving averages
-        for period in ma_periods:
-            df[f'MA_{period}'] = df['Close'].rolling(window=period).mean()
+        fig = FigureSpec()
         
-        # Create figure
-        if include_volume:
-            fig = go.Figure()
-            
-            # Add price line
-            fig.add_trace(go.Scatter(
-                x=df['Date'],
-                y=df['Close'],
+        # Add price line
+        fig.add_trace(
+            'scatter',
+            x=dates,
+            y=columns['Close'],
+            mode='lines',
+            name='Close Price',
+            line=dict(color='#2c7be5', width=2)
+        )
+        
+        # Add moving averages
+        colors = ['#e63946', '#f1c40f', '#2ecc71']
+        for i, (period, values) in enumerate(averages.items()):
+            fig.add_trace(
+                'scatter',
+                x=dates,
+                y=values,
                 mode='lines',
-                name='Close Price',
-                line=dict(color='#2c7be5', width=2)
-            ))
-            
-            # Add moving averages
-            colors = ['#e63946', '#f1c40f', '#2ecc71']
-            for i, period in enumerate(ma_periods):
-                fig.add_trace(go.Scatter(
-                    x=df['Date'],
-                    y=df[f'MA_{period}'],
-                    mode='lines',
-                    name=f'MA {period}',
-                    line=dict(color=colors[i % len(colors)], width=1.5)
-                ))
-            
+                name=f'MA {period}',
+                line=dict(color=colors[i % len(colors)], width=1.5)
+            )
+        
+        fig.update_layout(
+            title='Technical Analysis',
+            xaxis=dict(title='Date'),
+            yaxis=dict(title='Price'),
+            template='plotly_white',
+            legend=dict(
+                orientation='h',
+                y=1.1
+            )
+        )
+        
+        if include_volume:
             # Create volume subplot
-            fig.add_trace(go.Bar(
-                x=df['Date'],
-                y=df['Volume'],
+            fig.add_trace(
+                'bar',
+                x=dates,
+                y=columns['Volume'],
                 name='Volume',
                 marker=dict(color='rgba(44, 123, 229, 0.3)'),
                 yaxis='y2'
-            ))
+            )
             
-            # Update layout
             fig.update_layout(
-                title='Technical Analysis',
-                xaxis_title='Date',
-                yaxis_title='Price',
-                template='plotly_white',
                 yaxis=dict(
                     domain=[0.3, 1]
                 ),
                 yaxis2=dict(
                     domain=[0, 0.2],
                     title='Volume'
-                ),
-                legend=dict(
-                    orientation='h',
-                    y=1.1
-                )
-            )
-        else:
-            fig = go.Figure()
-            
-            # Add price line
-            fig.add_trace(go.Scatter(
-                x=df['Date'],
-                y=df['Close'],
-                mode='lines',
-                name='Close Price',
-                line=dict(color='#2c7be5', width=2)
-            ))
-            
-            # Add moving averages
-            colors = ['#e63946', '#f1c40f', '#2ecc71']
-            for i, period in enumerate(ma_periods):
-                fig.add_trace(go.Scatter(
-                    x=df['Date'],
-                    y=df[f'MA_{period}'],
-                    mode='lines',
-                    name=f'MA {period}',
-                    line=dict(color=colors[i % len(colors)], width=1.5)
-                ))
-            
-            # Update layout
-            fig.update_layout(
-                title='Technical Analysis',
-                xaxis_title='Date',
-                yaxis_title='Price',
-                template='plotly_white',
-                legend=dict(
-                    orientation='h',
-                    y=1.1
                 )
             )
         
-        return json.dumps(fig.to_dict())
+        return fig.to_json()
     except Exception as e:
         print(f"Error creating technical analysis chart: {str(e)}")
         return json.dumps({'data': [], 'layout': {'title': 'Error creating chart'}})
 
-def create_comparison_chart(data_dict, title='Stock Comparison'):
+def create_comparison_chart(data_dict, title='Stock Comparison', matrix=None):
     """
     Create a comparison chart for multiple stocks.
     
     Args:
         data_dict (dict): Dictionary with stock symbols as keys and their data as values
         title (str): Chart title
+        matrix (ReturnMatrix): Aligned matrix already built from data_dict,
+            to avoid building it again
     
     Returns:
         dict: JSON representation of the chart
     """
     try:
-        fig = go.Figure()
+        if matrix is None:
+            matrix = ReturnMatrix.from_data(data_dict)
         
-        # Process each stock
-        for symbol, data in data_dict.items():
-            if not data['success'] or not data['data']:
-                continue
-            
-            # Convert to DataFrame if it's a list of dictionaries
-            if isinstance(data['data'], list):
-                df = pd.DataFrame(data['data'])
-            else:
-                df = data['data']
-            
-            # Normalize prices to percentage change from first day
-            first_price = df['Close'].iloc[0]
-            df['Normalized'] = (df['Close'] / first_price - 1) * 100
-            
-            # Add to chart
-            fig.add_trace(go.Scatter(
-                x=df['Date'],
-                y=df['Normalized'],
+        fig = FigureSpec()
+        
+        # Percentage change from each symbol's first close, on the shared calendar
+        dates = np.asarray(matrix.dates).tolist()
+        normalized = np.ascontiguousarray(matrix.normalized().T)
+        for i, symbol in enumerate(matrix.symbols):
+            fig.add_trace(
+                'scatter',
+                x=dates,
+                y=normalized[i],
                 mode='lines',
-                name=symbol
-            ))
+                name=symbol,
+                connectgaps=True
+            )
         
         # Update layout
         fig.update_layout(
             title=title,
-            xaxis_title='Date',
-            yaxis_title='Percentage Change (%)',
+            xaxis=dict(title='Date'),
+            yaxis=dict(title='Percentage Change (%)'),
             template='plotly_white',
             legend=dict(
                 orientation='h',
@@ -258,18 +267,106 @@ def create_comparison_chart(data_dict, title='Stock Comparison'):
             )
         )
         
-        return json.dumps(fig.to_dict())
+        return fig.to_json()
     except Exception as e:
         print(f"Error creating comparison chart: {str(e)}")
         return json.dumps({'data': [], 'layout': {'title': 'Error creating chart'}})
 
+def create_correlation_chart(matrix, title='Return Correlation'):
+    """
+    Create a heatmap of the pairwise correlation of stock returns.
+    
+    Args:
+        matrix (ReturnMatrix): Aligned returns of the compared stocks
+        title (str): Chart title
+    
+    Returns:
+        dict: JSON representation of the chart
+    """
+    try:
+        correlation = matrix.correlation()
+        
+        fig = FigureSpec()
+        fig.add_trace(
+            'heatmap',
+            z=correlation,
+            x=matrix.symbols,
+            y=matrix.symbols,
+            zmin=-1,
+            zmax=1,
+            colorscale='RdBu',
+            reversescale=True,
+            hovertemplate='%{y} / %{x}: %{z:.2f}<extra></extra>'
+        )
+        
+        fig.update_layout(
+            title=title,
+            template='plotly_white',
+            yaxis=dict(autorange='reversed')
+        )
+        
+        return fig.to_json()
+    except Exception as e:
+        print(f"Error creating correlation chart: {str(e)}")
+        return json.dumps({'data': [], 'layout': {'title': 'Error creating chart'}})
+
+def create_rolling_correlation_chart(matrix, benchmark, window=60, title=None):
+    """
+    Create a chart of each stock's rolling return correlation with a benchmark.
+    
+    Args:
+        matrix (ReturnMatrix): Aligned returns of the compared stocks
+        benchmark (str): Symbol to correlate with
+        window (int): Window length in bars
+        title (str): Chart title
+    
+    Returns:
+        dict: JSON representation of the chart
+    """
+    try:
+        rolling = np.ascontiguousarray(matrix.rolling_correlation(benchmark, window).T)
+        dates = np.asarray(matrix.dates).tolist()
+        
+        fig = FigureSpec()
+        for i, symbol in enumerate(matrix.symbols):
+            if symbol == benchmark:
+                continue
+            fig.add_trace(
+                'scatter',
+                x=dates,
+                y=rolling[i],
+                mode='lines',
+                name=symbol
+            )
+        
+        fig.update_layout(
+            title=title or f'{window}-Bar Correlation with {benchmark}',
+            xaxis=dict(title='Date'),
+            yaxis=dict(title='Correlation', range=[-1, 1]),
+            template='plotly_white',
+            legend=dict(
+                orientation='h',
+                y=1.1
+            )
+        )
+        
+        return fig.to_json()
+    except Exception as e:
+        print(f"Error creating rolling correlation chart: {str(e)}")
+        return json.dumps({'data': [], 'layout': {'title': 'Error creating chart'}})
+
 def create_indicator_chart(data, indicator_data, indicator_name, title='Technical Indicator'):
     """
     Create a chart for a technical indicator.
     
     Args:
         data (dict): Dictionary containing stock data
-        indicator_data (list or dict): Indicator data
+        indicator_data: Indicator series aligned with the bars, e.g. from
+            compute_indicators(output='series'); for MACD a dict of 'macd',
+            'signal' and 'histogram' series, for Bollinger Bands a dict of
+            'upper', 'middle' and 'lower' series. Bollinger Bands and VWAP
+            are drawn over the price, other indicators below it. A single
+            latest value is drawn as a flat line.
         indicator_name (str): Name of the indicator
         title (str): Chart title
     
@@ -277,64 +374,70 @@ def create_indicator_chart(data, indicator_data, indicator_name, title='Technica
         dict: JSON representation of the chart
     """
     try:
-        if not data['success'] or not data['data']:
+        chart_data = _chart_data(data)
+        if chart_data is None:
             return json.dumps({'data': [], 'layout': {'title': 'No data available'}})
+        dates, columns = chart_data
+        length = len(dates)
         
-        # Convert to DataFrame if it's a list of dictionaries
-        if isinstance(data['data'], list):
-            df = pd.DataFrame(data['data'])
-        else:
-            df = data['data']
-        
-        # Create figure with subplots
-        fig = go.Figure()
+        fig = FigureSpec()
         
         # Add price subplot
-        fig.add_trace(go.Scatter(
-            x=df['Date'],
-            y=df['Close'],
+        fig.add_trace(
+            'scatter',
+            x=dates,
+            y=columns['Close'],
             mode='lines',
             name='Close Price',
             line=dict(color='#2c7be5', width=2)
-        ))
+        )
+        
+        fig.update_layout(
+            title=title,
+            xaxis=dict(title='Date'),
+            yaxis=dict(title='Price'),
+            template='plotly_white',
+            legend=dict(
+                orientation='h',
+                y=1.1
+            )
+        )
         
         # Handle different indicator types
         if indicator_name.lower() == 'rsi':
             # Add RSI subplot
-            fig.add_trace(go.Scatter(
-                x=df['Date'],
-                y=[indicator_data] * len(df),  # Use the same value for all dates
+            fig.add_trace(
+                'scatter',
+                x=dates,
+                y=_indicator_values(indicator_data, length),
                 mode='lines',
                 name='RSI',
                 yaxis='y2',
                 line=dict(color='#e63946', width=2)
-            ))
+            )
             
             # Add overbought/oversold lines
-            fig.add_trace(go.Scatter(
-                x=df['Date'],
-                y=[70] * len(df),
+            fig.add_trace(
+                'scatter',
+                x=dates,
+                y=np.full(length, 70.0),
                 mode='lines',
                 name='Overbought (70)',
                 yaxis='y2',
                 line=dict(color='rgba(231, 76, 60, 0.5)', width=1, dash='dash')
-            ))
+            )
             
-            fig.add_trace(go.Scatter(
-                x=df['Date'],
-                y=[30] * len(df),
+            fig.add_trace(
+                'scatter',
+                x=dates,
+                y=np.full(length, 30.0),
                 mode='lines',
                 name='Oversold (30)',
                 yaxis='y2',
                 line=dict(color='rgba(46, 204, 113, 0.5)', width=1, dash='dash')
-            ))
+            )
             
-            # Update layout
             fig.update_layout(
-                title=title,
-                xaxis_title='Date',
-                yaxis_title='Price',
-                template='plotly_white',
                 yaxis=dict(
                     domain=[0.3, 1]
                 ),
@@ -342,81 +445,112 @@ def create_indicator_chart(data, indicator_data, indicator_name, title='Technica
                     domain=[0, 0.2],
                     title='RSI',
                     range=[0, 100]
-                ),
-                legend=dict(
-                    orientation='h',
-                    y=1.1
                 )
             )
+        elif indicator_name.lower() in ('bollinger', 'bollinger bands', 'vwap'):
+            # Price overlays share the price axis
+            if indicator_name.lower() == 'vwap':
+                fig.add_trace(
+                    'scatter',
+                    x=dates,
+                    y=_indicator_values(indicator_data, length),
+                    mode='lines',
+                    name='VWAP',
+                    line=dict(color='#8e44ad', width=1.5)
+                )
+            else:
+                fig.add_trace(
+                    'scatter',
+                    x=dates,
+                    y=_indicator_values(indicator_data['upper'], length),
+                    mode='lines',
+                    name='Upper Band',
+                    line=dict(color='rgba(142, 68, 173, 0.6)', width=1)
+                )
+                
+                fig.add_trace(
+                    'scatter',
+                    x=dates,
+                    y=_indicator_values(indicator_data['lower'], length),
+                    mode='lines',
+                    name='Lower Band',
+                    fill='tonexty',
+                    fillcolor='rgba(142, 68, 173, 0.08)',
+                    line=dict(color='rgba(142, 68, 173, 0.6)', width=1)
+                )
+                
+                fig.add_trace(
+                    'scatter',
+                    x=dates,
+                    y=_indicator_values(indicator_data['middle'], length),
+                    mode='lines',
+                    name='Middle Band',
+                    line=dict(color='#8e44ad', width=1, dash='dash')
+                )
         elif indicator_name.lower() == 'macd':
             # Add MACD subplot
-            fig.add_trace(go.Scatter(
-                x=df['Date'],
-                y=[indicator_data['macd']] * len(df),
+            fig.add_trace(
+                'scatter',
+                x=dates,
+                y=_indicator_values(indicator_data['macd'], length),
                 mode='lines',
                 name='MACD',
                 yaxis='y2',
                 line=dict(color='#3498db', width=2)
-            ))
+            )
             
-            fig.add_trace(go.Scatter(
-                x=df['Date'],
-                y=[indicator_data['signal']] * len(df),
+            fig.add_trace(
+                'scatter',
+                x=dates,
+                y=_indicator_values(indicator_data['signal'], length),
                 mode='lines',
                 name='Signal',
                 yaxis='y2',
                 line=dict(color='#e67e22', width=2)
-            ))
+            )
+            
+            if indicator_data.get('histogram') is not None:
+                fig.add_trace(
+                    'bar',
+                    x=dates,
+                    y=_indicator_values(indicator_data['histogram'], length),
+                    name='Histogram',
+                    yaxis='y2',
+                    marker=dict(color='rgba(149, 165, 166, 0.6)')
+                )
             
-            # Update layout
             fig.update_layout(
-                title=title,
-                xaxis_title='Date',
-                yaxis_title='Price',
-                template='plotly_white',
                 yaxis=dict(
                     domain=[0.3, 1]
                 ),
                 yaxis2=dict(
                     domain=[0, 0.2],
                     title='MACD'
-                ),
-                legend=dict(
-                    orientation='h',
-                    y=1.1
                 )
             )
         else:
             # Generic indicator
-            fig.add_trace(go.Scatter(
-                x=df['Date'],
-                y=[indicator_data] * len(df),
+            fig.add_trace(
+                'scatter',
+                x=dates,
+                y=_indicator_values(indicator_data, length),
                 mode='lines',
                 name=indicator_name,
                 yaxis='y2',
                 line=dict(color='#e63946', width=2)
-            ))
+            )
             
-            # Update layout
             fig.update_layout(
-                title=title,
-                xaxis_title='Date',
-                yaxis_title='Price',
-                template='plotly_white',
                 yaxis=dict(
                     domain=[0.3, 1]
                 ),
                 yaxis2=dict(
                     domain=[0, 0.2],
                     title=indicator_name
-                ),
-                legend=dict(
-                    orientation='h',
-                    y=1.1
                 )
             )
         
-        return json.dumps(fig.to_dict())
+        return fig.to_json()
     except Exception as e:
         print(f"Error creating indicator chart: {str(e)}")
-        return json.dumps({'data': [], 'layout': {'title': 'Error creating chart'}}) 
\ No newline at end of file
+        return json.dumps({'data': [], 'layout': {'title': 'Error creating chart'}})
@@ -0,0 +1,397 @@
+import math
+
+import numpy as np
+
+from app.utils.data_analyzer import ema, parse_indicator, wilder_averages
+
+class StreamingIndicator:
+    """
+    Incremental indicator state over a stream of closing prices.
+    
+    update() advances the state by one bar in constant time and returns the
+    new value, matching the last value data_analyzer would compute over the
+    whole history (None until enough bars have been seen). snapshot()
+    returns plain JSON-serializable state that restore_indicator() turns
+    back into an equivalent object, e.g. to persist intraday state or hand
+    it to another worker.
+    """
+    
+    kind = None
+    
+    @property
+    def value(self):
+        """The current indicator value, or None if not enough bars have been seen."""
+        raise NotImplementedError
+    
+    def update(self, close):
+        """
+        Advance the indicator by one bar.
+        
+        Args:
+            close (float): Closing price of the new bar
+        
+        Returns:
+            The new value (see value)
+        """
+        raise NotImplementedError
+    
+    def preview(self, close):
+        """
+        The value update() would return for a bar, without advancing the state.
+        
+        Used for the bar still forming, whose close changes with every
+        quote until it is committed with update().
+        
+        Args:
+            close (float): Provisional closing price of the next bar
+        
+        Returns:
+            The value after that bar (see value)
+        """
+        return restore_indicator(self.snapshot()).update(close)
+    
+    def seed(self, closes):
+        """
+        Bring the state up to date with a price history in one vectorized pass.
+        
+        Equivalent to calling update() for every close, but uses the batch
+        kernels, so priming thousands of symbols from their cached bars stays
+        cheap.
+        
+        Args:
+            closes (array-like): Closing prices, oldest first
+        
+        Returns:
+            The value after the last close
+        """
+        for close in closes:
+            self.update(close)
+        return self.value
+    
+    def snapshot(self):
+        """
+        Capture the state.
+        
+        Returns:
+            dict: 'kind', 'params' and 'state', all JSON-serializable
+        """
+        return {'kind': self.kind, 'params': list(self.params()), 'state': self._state()}
+    
+    def params(self):
+        """The indicator parameters, in data_analyzer order."""
+        raise NotImplementedError
+    
+    def _state(self):
+        raise NotImplementedError
+    
+    def _load(self, state):
+        raise NotImplementedError
+
+class RollingMean(StreamingIndicator):
+    """Simple moving average over a ring buffer of the last window closes."""
+    
+    kind = 'ma'
+    
+    def __init__(self, window=20):
+        if window <= 0:
+            raise ValueError("window must be positive")
+        self.window = window
+        self._buffer = [0.0] * window
+        self._position = 0
+        self._count = 0
+        self._total = 0.0
+    
+    @property
+    def value(self):
+        if self._count < self.window:
+            return None
+        return self._total / self.window
+    
+    def update(self, close):
+        close = float(close)
+        if self._count == self.window:
+            self._total -= self._buffer[self._position]
+        else:
+            self._count += 1
+        self._buffer[self._position] = close
+        self._total += close
+        self._position = (self._position + 1) % self.window
+        if self._position == 0:
+            # Re-add the buffer once per lap so rounding errors cannot accumulate
+            self._total = math.fsum(self._buffer)
+        return self.value
+    
+    def preview(self, close):
+        if self._count < self.window - 1:
+            return None
+        evicted = self._buffer[self._position] if self._count == self.window else 0.0
+        return (self._total - evicted + float(close)) / self.window
+    
+    def seed(self, closes):
+        closes = np.asarray(closes, dtype=np.float64)
+        # Only the last window closes can still be in the buffer
+        for close in closes[-self.window:]:
+            self.update(close)
+        return self.value
+    
+    def params(self):
+        return (self.window,)
+    
+    def _state(self):
+        # The buffer in arrival order, oldest first
+        recent = self._buffer[self._position:] + self._buffer[:self._position]
+        return {'values': recent[self.window - self._count:]}
+    
+    def _load(self, state):
+        for close in state['values']:
+            self.update(close)
+
+class ExponentialMean(StreamingIndicator):
+    """Exponential moving average, y = y + alpha * (close - y), seeded with the first close."""
+    
+    kind = 'ema'
+    
+    def __init__(self, span=20):
+        if span <= 0:
+            raise ValueError("span must be positive")
+        self.span = span
+        self.alpha = 2.0 / (span + 1)
+        self._value = None
+    
+    @property
+    def value(self):
+        return self._value
+    
+    def update(self, close):
+        close = float(close)
+        if self._value is None:
+            self._value = close
+        else:
+            self._value += self.alpha * (close - self._value)
+        return self._value
+    
+    def preview(self, close):
+        close = float(close)
+        if self._value is None:
+            return close
+        return self._value + self.alpha * (close - self._value)
+    
+    def seed(self, closes):
+        closes = np.asarray(closes, dtype=np.float64)
+        if len(closes) == 0:
+            return self._value
+        if self._value is not None:
+            # Continue from the current value by prepending it as the first close
+            closes = np.concatenate([[self._value], closes])
+        self._value = float(ema(closes, self.span)[-1])
+        return self._value
+    
+    def params(self):
+        return (self.span,)
+    
+    def _state(self):
+        return {'value': self._value}
+    
+    def _load(self, state):
+        self._value = state['value']
+
+class WilderRSI(StreamingIndicator):
+    """
+    Relative Strength Index with Wilder's smoothing.
+    
+    The first window price changes are averaged; after that the average
+    gain and loss are smoothed with alpha = 1 / window.
+    """
+    
+    kind = 'rsi'
+    
+    def __init__(self, window=14):
+        if window <= 0:
+            raise ValueError("window must be positive")
+        self.window = window
+        self._previous = None
+        self._changes = 0
+        self._avg_gain = 0.0
+        self._avg_loss = 0.0
+    
+    @property
+    def value(self):
+        return self._value_of(self._changes, self._avg_gain, self._avg_loss)
+    
+    def _value_of(self, changes, avg_gain, avg_loss):
+        if changes < self.window:
+            return None
+        # Same cases as data_analyzer._rsi_from_averages, without NumPy scalar overhead
+        if avg_loss == 0:
+            return 50.0 if avg_gain == 0 else 100.0
+        return 100.0 - 100.0 / (1.0 + avg_gain / avg_loss)
+    
+    def _advance(self, close):
+        # (changes, avg_gain, avg_loss) after a bar closing at close
+        if self._previous is None:
+            return self._changes, self._avg_gain, self._avg_loss
+        delta = close - self._previous
+        gain, loss = max(delta, 0.0), max(-delta, 0.0)
+        changes = self._changes + 1
+        # Still filling the first window: keep a running mean
+        divisor = changes if changes <= self.window else self.window
+        return (changes, self._avg_gain + (gain - self._avg_gain) / divisor,
+                self._avg_loss + (loss - self._avg_loss) / divisor)
+    
+    def update(self, close):
+        close = float(close)
+        self._changes, self._avg_gain, self._avg_loss = self._advance(close)
+        self._previous = close
+        return self.value
+    
+    def preview(self, close):
+        return self._value_of(*self._advance(float(close)))
+    
+    def seed(self, closes):
+        closes = np.asarray(closes, dtype=np.float64)
+        if self._previous is not None or len(closes) <= self.window:
+            return super().seed(closes)
+        avg_gain, avg_loss = wilder_averages(closes, self.window)
+        self._avg_gain, self._avg_loss = float(avg_gain[-1]), float(avg_loss[-1])
+        self._changes = len(closes) - 1
+        self._previous = float(closes[-1])
+        return self.value
+    
+    def params(self):
+        return (self.window,)
+    
+    def _state(self):
+        return {
+            'previous': self._previous, 'changes': self._changes,
+            'avg_gain': self._avg_gain, 'avg_loss': self._avg_loss
+        }
+    
+    def _load(self, state):
+        self._previous = state['previous']
+        self._changes = state['changes']
+        self._avg_gain = state['avg_gain']
+        self._avg_loss = state['avg_loss']
+
+class MACD(StreamingIndicator):
+    """MACD line (fast EMA - slow EMA), its signal EMA and the histogram."""
+    
+    kind = 'macd'
+    
+    def __init__(self, fast=12, slow=26, signal=9):
+        self.fast = ExponentialMean(fast)
+        self.slow = ExponentialMean(slow)
+        self.signal = ExponentialMean(signal)
+    
+    @property
+    def value(self):
+        if self.signal.value is None:
+            return None
+        macd = self.fast.value - self.slow.value
+        return {'macd': macd, 'signal': self.signal.value, 'histogram': macd - self.signal.value}
+    
+    def update(self, close):
+        self.signal.update(self.fast.update(close) - self.slow.update(close))
+        return self.value
+    
+    def preview(self, close):
+        macd = self.fast.preview(close) - self.slow.preview(close)
+        signal = self.signal.preview(macd)
+        return {'macd': macd, 'signal': signal, 'histogram': macd - signal}
+    
+    def seed(self, closes):
+        closes = np.asarray(closes, dtype=np.float64)
+        if len(closes) == 0:
+            return self.value
+        fast = ema(closes if self.fast.value is None else np.concatenate([[self.fast.value], closes]), self.fast.span)
+        slow = ema(closes if self.slow.value is None else np.concatenate([[self.slow.value], closes]), self.slow.span)
+        macd = fast - slow
+        if self.fast.value is not None:
+            # Drop the prepended previous values
+            macd = macd[1:]
+        self.fast._value, self.slow._value = float(fast[-1]), float(slow[-1])
+        self.signal.seed(macd)
+        return self.value
+    
+    def params(self):
+        return (self.fast.span, self.slow.span, self.signal.span)
+    
+    def _state(self):
+        return {'fast': self.fast.value, 'slow': self.slow.value, 'signal': self.signal.value}
+    
+    def _load(self, state):
+        self.fast._value = state['fast']
+        self.slow._value = state['slow']
+        self.signal._value = state['signal']
+
+# Streaming implementations keyed by data_analyzer indicator kind
+STREAMING_INDICATORS = {
+    cls.kind: cls for cls in (RollingMean, ExponentialMean, WilderRSI, MACD)
+}
+
+def create_streaming_indicator(name):
+    """
+    Create streaming state for an indicator name understood by data_analyzer.
+    
+    Args:
+        name (str): Indicator name such as 'ma_50', 'ema_12', 'rsi' or 'macd_12_26_9'
+    
+    Returns:
+        StreamingIndicator: Fresh state with the same parameters
+    """
+    kind, params = parse_indicator(name)
+    if kind not in STREAMING_INDICATORS:
+        raise ValueError(f"Indicator {name} has no streaming implementation")
+    return STREAMING_INDICATORS[kind](*params)
+
+def restore_indicator(snapshot):
+    """
+    Rebuild streaming state from StreamingIndicator.snapshot().
+    
+    Returns:
+        StreamingIndicator: State equivalent to the one snapshotted
+    """
+    if snapshot.get('kind') not in STREAMING_INDICATORS:
+        raise ValueError(f"Unknown streaming indicator: {snapshot.get('kind')}")
+    indicator = STREAMING_INDICATORS[snapshot['kind']](*snapshot['params'])
+    indicator._load(snapshot['state'])
+    return indicator
+
+class IndicatorStream:
+    """
+    Streaming state for a set of indicators on one symbol.
+    
+    Prime it once from cached bars with seed(), then feed each new bar to
+    update() for constant-time indicator values.
+    """
+    
+    def __init__(self, names):
+        self.indicators = {name: create_streaming_indicator(name) for name in names}
+    
+    def seed(self, closes):
+        """Bring every indicator up to date with a price history; returns the values."""
+        closes = np.asarray(closes, dtype=np.float64)
+        return {name: indicator.seed(closes) for name, indicator in self.indicators.items()}
+    
+    def update(self, close):
+        """Advance every indicator by one bar; returns the values."""
+        return {name: indicator.update(close) for name, indicator in self.indicators.items()}
+    
+    def preview(self, close):
+        """Values if the next bar closed at close, without advancing; see StreamingIndicator.preview()."""
+        return {name: indicator.preview(close) for name, indicator in self.indicators.items()}
+    
+    @property
+    def values(self):
+        """Indicator name -> current value."""
+        return {name: indicator.value for name, indicator in self.indicators.items()}
+    
+    def snapshot(self):
+        """Capture every indicator's state as JSON-serializable data."""
+        return {name: indicator.snapshot() for name, indicator in self.indicators.items()}
+    
+    @classmethod
+    def restore(cls, snapshot):
+        """Rebuild a stream from snapshot()."""
+        stream = cls([])
+        stream.indicators = {name: restore_indicator(state) for name, state in snapshot.items()}
+        return stream
@@ -0,0 +1,58 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+# Sentinel window start meaning the full history ('max')
+FULL_HISTORY = np.iinfo(np.int64).min
+
+_PERIOD_PATTERN = re.compile(r'^(\d+)(d|mo|y)$')
+
+def period_start(period, now=None):
+    """
+    Get the earliest timestamp a period window needs.
+    
+    Args:
+        period (str): Period of data (e.g., '5d', '6mo', '1y', 'ytd', 'max')
+        now (pd.Timestamp): End of the window (defaults to the current time)
+    
+    Returns:
+        int: Nanoseconds since the epoch in UTC, or FULL_HISTORY for 'max'
+    """
+    if period == 'max':
+        return FULL_HISTORY
+    
+    now = pd.Timestamp.now(tz='UTC') if now is None else pd.Timestamp(now).tz_convert('UTC')
+    if period == 'ytd':
+        return now.normalize().replace(month=1, day=1).value
+    
+    match = _PERIOD_PATTERN.match(period)
+    if not match:
+        raise ValueError(f"Unsupported period: {period}")
+    
+    count, unit = int(match.group(1)), match.group(2)
+    if unit == 'd':
+        # Day periods count trading sessions, so leave room for weekends and holidays
+        return (now.normalize() - pd.Timedelta(days=count + 4)).value
+    if unit == 'mo':
+        return (now - pd.DateOffset(months=count)).value
+    return (now - pd.DateOffset(years=count)).value
+
+def slice_period(bars, period):
+    """
+    Trim bars starting at period_start() to the sessions a day period covers.
+    
+    Args:
+        bars (pd.DataFrame): Bars indexed by a datetime index
+        period (str): Period of data
+    
+    Returns:
+        pd.DataFrame: The bars belonging to the period
+    """
+    match = _PERIOD_PATTERN.match(period)
+    if len(bars) == 0 or not match or match.group(2) != 'd':
+        return bars
+    
+    sessions = bars.index.normalize()
+    keep = sessions.unique()[-int(match.group(1)):]
+    return bars[sessions >= keep[0]]
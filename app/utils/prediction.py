@@ -0,0 +1,268 @@
+from statistics import NormalDist
+
+import numpy as np
+
+# Confidence level of reported prediction intervals
+DEFAULT_LEVEL = 0.95
+
+class TrendFit:
+    """
+    Ordinary least squares line through closing prices against bar number.
+    
+    The fields are floats for one series, or arrays with one entry per
+    symbol for fit_trends(); every method works on both.
+    
+    Attributes:
+        slope: Price change per bar
+        intercept: Fitted price at bar 0
+        residual_std: Standard deviation of the residuals (n - 2 degrees of freedom)
+        n: Number of bars fitted
+        x_mean: Mean bar number of the fitted bars
+        sxx: Sum of squared deviations of the bar numbers
+        last: Bar number that forecasts step forward from
+    """
+    
+    def __init__(self, slope, intercept, residual_std, n, x_mean, sxx, last):
+        self.slope = slope
+        self.intercept = intercept
+        self.residual_std = residual_std
+        self.n = n
+        self.x_mean = x_mean
+        self.sxx = sxx
+        self.last = last
+    
+    def _future(self, steps):
+        # Bar numbers of the next steps bars, one row per series
+        return np.expand_dims(np.asarray(self.last, dtype=np.float64), -1) + np.arange(1, steps + 1)
+    
+    def _column(self, value):
+        return np.expand_dims(np.asarray(value, dtype=np.float64), -1)
+    
+    def predict(self, steps):
+        """
+        Extrapolate the line.
+        
+        Args:
+            steps (int): Number of bars to forecast
+        
+        Returns:
+            np.ndarray: Forecast prices, shape (steps,) or (symbols, steps)
+        """
+        return self._column(self.intercept) + self._column(self.slope) * self._future(steps)
+    
+    def interval(self, steps, level=DEFAULT_LEVEL):
+        """
+        Prediction interval for the next steps bars.
+        
+        Uses the OLS prediction variance
+        s^2 * (1 + 1/n + (x - x_mean)^2 / sxx) with a normal quantile, which
+        is close to Student's t for the hundreds of bars usually fitted.
+        
+        Args:
+            steps (int): Number of bars to forecast
+            level (float): Confidence level, e.g. 0.95
+        
+        Returns:
+            tuple: (lower, upper) arrays shaped like predict()
+        """
+        z = NormalDist().inv_cdf(0.5 + level / 2)
+        future = self._future(steps)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            spread = z * self._column(self.residual_std) * np.sqrt(
+                1.0 + 1.0 / self._column(self.n) + (future - self._column(self.x_mean)) ** 2 / self._column(self.sxx)
+            )
+        prices = self.predict(steps)
+        return prices - spread, prices + spread
+    
+    def forecast(self, steps, level=DEFAULT_LEVEL):
+        """
+        Forecast prices with a prediction interval.
+        
+        Returns:
+            dict: 'prices', 'lower' and 'upper' arrays and the 'level'
+        """
+        lower, upper = self.interval(steps, level)
+        return {'prices': self.predict(steps), 'lower': lower, 'upper': upper, 'level': level}
+    
+    def to_dict(self):
+        """The fitted coefficients as plain values."""
+        return {
+            'slope': _plain(self.slope), 'intercept': _plain(self.intercept),
+            'residual_std': _plain(self.residual_std), 'n': _plain(self.n)
+        }
+
+def _plain(value):
+    value = np.asarray(value)
+    if value.ndim:
+        return value
+    value = value.item()
+    return None if isinstance(value, float) and value != value else value
+
+def fit_trend(close):
+    """
+    Fit a line to one series of closing prices in closed form.
+    
+    Missing bars (NaN) are left out of the fit as in fit_trends(), and
+    forecasts still step forward from the last bar.
+    
+    Args:
+        close (np.ndarray): Closing prices, oldest first
+    
+    Returns:
+        TrendFit: The fitted line, or None with fewer than 2 prices
+    """
+    close = np.asarray(close, dtype=np.float64)
+    n = len(close)
+    if np.isnan(close).any():
+        fit = fit_trends(close)
+        if not fit.n[0] >= 2:
+            return None
+        return TrendFit(float(fit.slope[0]), float(fit.intercept[0]), float(fit.residual_std[0]),
+                        int(fit.n[0]), float(fit.x_mean[0]), float(fit.sxx[0]), float(fit.last[0]))
+    if n < 2:
+        return None
+    
+    # Bar numbers 0..n-1 have a closed-form mean and spread
+    x_mean = (n - 1) / 2.0
+    sxx = n * (n * n - 1) / 12.0
+    y_mean = close.mean()
+    dx = np.arange(n) - x_mean
+    slope = float(dx @ (close - y_mean)) / sxx
+    residuals = close - y_mean - slope * dx
+    residual_std = float(np.sqrt(residuals @ residuals / (n - 2))) if n > 2 else float('nan')
+    return TrendFit(slope, y_mean - slope * x_mean, residual_std, n, x_mean, sxx, n - 1)
+
+def fit_trends(closes):
+    """
+    Fit lines to many series at once.
+    
+    Every row is fitted with the same handful of matrix reductions. Rows
+    are aligned on a shared calendar: NaN bars are left out of a row's fit,
+    and all forecasts step forward from the last column.
+    
+    Args:
+        closes (np.ndarray): (symbols x time) closing prices
+    
+    Returns:
+        TrendFit: Fit whose fields are arrays with one entry per symbol
+            (NaN for rows with fewer than 2 prices)
+    """
+    closes = np.atleast_2d(np.asarray(closes, dtype=np.float64))
+    valid = ~np.isnan(closes)
+    weights = valid.astype(np.float64)
+    x = np.arange(closes.shape[1], dtype=np.float64)
+    y = np.where(valid, closes, 0.0)
+    
+    with np.errstate(divide='ignore', invalid='ignore'):
+        n = weights.sum(axis=1)
+        x_mean = weights @ x / n
+        y_mean = y.sum(axis=1) / n
+        dx = (x - x_mean[:, None]) * weights
+        dy = (y - y_mean[:, None]) * weights
+        sxx = (dx * dx).sum(axis=1)
+        sxy = (dx * dy).sum(axis=1)
+        slope = sxy / sxx
+        sse = np.maximum((dy * dy).sum(axis=1) - slope * sxy, 0.0)
+        residual_std = np.where(n > 2, np.sqrt(sse / (n - 2)), np.nan)
+    
+    slope = np.where(n >= 2, slope, np.nan)
+    return TrendFit(slope, y_mean - slope * x_mean, residual_std, n, x_mean, sxx,
+                    np.full(len(closes), closes.shape[1] - 1.0))
+
+class AutoregressiveModel:
+    """
+    Ridge-regularized AR(p) model of log returns.
+    
+    Each return is regressed on the previous lags returns plus an intercept,
+    which captures short-term momentum and mean reversion that a straight
+    trend line cannot. Fitting is one small linear solve, cheap enough to
+    train thousands of symbols in a background job, and the fitted model is
+    a handful of coefficients that inference only has to iterate.
+    """
+    
+    def __init__(self, coefficients, sigma, observations=0):
+        self.coefficients = np.asarray(coefficients, dtype=np.float64)
+        self.sigma = float(sigma)
+        self.observations = int(observations)
+    
+    @property
+    def lags(self):
+        return len(self.coefficients) - 1
+    
+    @classmethod
+    def fit(cls, close, lags=5, ridge=1e-4):
+        """
+        Fit the model to a series of closing prices.
+        
+        Args:
+            close (np.ndarray): Closing prices, oldest first
+            lags (int): Number of lagged returns
+            ridge (float): L2 penalty on the lag coefficients (not the intercept)
+        
+        Returns:
+            AutoregressiveModel: The fitted model
+        """
+        close = np.asarray(close, dtype=np.float64)
+        close = close[~np.isnan(close)]
+        if len(close) < lags + 3 or (close <= 0).any():
+            raise ValueError(f"Need at least {lags + 3} positive prices to fit AR({lags})")
+        
+        returns = np.diff(np.log(close))
+        n = len(returns) - lags
+        design = np.empty((n, lags + 1))
+        design[:, 0] = 1.0
+        for lag in range(1, lags + 1):
+            design[:, lag] = returns[lags - lag:len(returns) - lag]
+        target = returns[lags:]
+        
+        penalty = np.full(lags + 1, ridge * n)
+        penalty[0] = 0.0
+        coefficients = np.linalg.solve(design.T @ design + np.diag(penalty), design.T @ target)
+        residuals = target - design @ coefficients
+        sigma = np.sqrt(residuals @ residuals / max(n - lags - 1, 1))
+        return cls(coefficients, sigma, n)
+    
+    def forecast(self, close, steps, level=DEFAULT_LEVEL):
+        """
+        Forecast prices following the end of a price series.
+        
+        The interval treats log returns as independent with the residual
+        standard deviation, so it widens with the square root of the horizon.
+        
+        Args:
+            close (np.ndarray): Recent closing prices, at least lags + 1
+            steps (int): Number of bars to forecast
+            level (float): Confidence level of the interval
+        
+        Returns:
+            dict: 'prices', 'lower' and 'upper' arrays and the 'level'
+        """
+        close = np.asarray(close, dtype=np.float64)
+        close = close[~np.isnan(close)]
+        if len(close) < self.lags + 1:
+            raise ValueError(f"Need at least {self.lags + 1} prices to forecast")
+        
+        # Most recent return first
+        recent = list(np.diff(np.log(close[-(self.lags + 1):]))[::-1])
+        predicted = np.empty(steps)
+        for step in range(steps):
+            value = self.coefficients[0] + float(np.dot(self.coefficients[1:], recent[:self.lags]))
+            predicted[step] = value
+            recent.insert(0, value)
+        
+        prices = close[-1] * np.exp(np.cumsum(predicted))
+        spread = NormalDist().inv_cdf(0.5 + level / 2) * self.sigma * np.sqrt(np.arange(1, steps + 1))
+        return {'prices': prices, 'lower': prices * np.exp(-spread), 'upper': prices * np.exp(spread), 'level': level}
+    
+    def to_arrays(self):
+        """The model as NumPy arrays, for np.savez()."""
+        return {
+            'coefficients': self.coefficients,
+            'sigma': np.array(self.sigma),
+            'observations': np.array(self.observations)
+        }
+    
+    @classmethod
+    def from_arrays(cls, arrays):
+        """Rebuild a model from to_arrays() output."""
+        return cls(arrays['coefficients'], float(arrays['sigma']), int(arrays['observations']))
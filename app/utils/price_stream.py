@@ -0,0 +1,300 @@
+import queue
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from app.utils.data_fetcher import get_quotes, get_stock_columns
+from app.utils.indicator_state import IndicatorStream
+from app.utils.serialization import dumps
+
+# Daily history live indicators are primed from; long enough for ma_200
+LIVE_HISTORY_PERIOD = '1y'
+
+class LiveIndicators:
+    """
+    Live indicator values for streamed quotes.
+    
+    Each (symbol, indicator set) gets an IndicatorStream primed once from
+    the cached daily bars before the current session. Every quote then
+    previews the indicators as if the session closed at the quote price,
+    in constant time instead of recomputing the whole history; when a quote
+    from a later session arrives, the previous session's last price is
+    committed as a bar.
+    """
+    
+    def __init__(self, period=LIVE_HISTORY_PERIOD, max_states=10000):
+        self.period = period
+        self.max_states = max_states
+        self._states = {}  # (symbol, names) -> _LiveState, oldest first
+        self._lock = threading.Lock()
+    
+    def values(self, symbol, names, quote):
+        """
+        Indicator values as of a quote.
+        
+        Args:
+            symbol (str): Stock symbol
+            names (tuple): Indicator names, e.g. ('rsi', 'macd')
+            quote (dict): Quote with 'price' and 'timestamp' (epoch milliseconds)
+        
+        Returns:
+            dict: Indicator name -> value, or None if there is no history to prime from
+        """
+        key = (symbol, names)
+        with self._lock:
+            state = self._states.get(key)
+        if state is None:
+            # Primed outside the lock, since it may fetch bars
+            state = self._prime(symbol, names)
+            if state is None:
+                return None
+            with self._lock:
+                if key not in self._states and len(self._states) >= self.max_states:
+                    del self._states[next(iter(self._states))]
+                state = self._states.setdefault(key, state)
+        return state.advance(quote)
+    
+    def _prime(self, symbol, names):
+        data = get_stock_columns(symbol, period=self.period, interval='1d')
+        if not data['success'] or len(data['data']['Close']) == 0:
+            return None
+        closes = np.asarray(data['data']['Close'], dtype=np.float64)
+        stream = IndicatorStream(names)
+        # The last bar is the session still forming; quotes keep revising it
+        history = closes[:-1]
+        stream.seed(history[~np.isnan(history)])
+        tz = data.get('tz') or 'UTC'
+        return _LiveState(stream, tz, _session_day(data['data']['Date'][-1], tz), closes[-1])
+    
+    def __len__(self):
+        with self._lock:
+            return len(self._states)
+    
+    def clear(self):
+        """Drop every primed state, e.g. after the bar cache was cleared."""
+        with self._lock:
+            self._states.clear()
+
+class _LiveState:
+    """An IndicatorStream plus the session and last price of the bar still forming."""
+    
+    def __init__(self, stream, tz, session, price):
+        self.stream = stream
+        self.tz = tz
+        self.session = session
+        self.price = None if np.isnan(price) else float(price)
+        self.lock = threading.Lock()
+    
+    def advance(self, quote):
+        session = _session_day(quote['timestamp'], self.tz)
+        with self.lock:
+            if session > self.session:
+                if self.price is not None:
+                    self.stream.update(self.price)
+                self.session = session
+            self.price = float(quote['price'])
+            return self.stream.preview(self.price)
+
+def _session_day(timestamp, tz):
+    """Calendar date in the exchange time zone of an epoch-milliseconds timestamp."""
+    return pd.Timestamp(int(timestamp), unit='ms', tz='UTC').tz_convert(tz).date()
+
+class QuoteBroadcaster:
+    """
+    Fans quote updates out to every subscribed client in the process.
+    
+    One background thread refreshes the union of all subscribed symbols on
+    a fixed interval with a single get_quotes() call, so upstream load
+    scales with the number of distinct symbols watched rather than with
+    the number of connected browsers. Each subscriber only receives quotes
+    for its own symbols, and only when they change.
+    
+    Every open stream holds a server thread for as long as it is connected,
+    so at most max_subscribers streams are admitted at once, leaving the
+    rest of the thread pool for ordinary requests.
+    """
+    
+    def __init__(self, refresh_interval=15, queue_size=256, max_subscribers=16):
+        self.refresh_interval = refresh_interval
+        self.queue_size = queue_size
+        self.max_subscribers = max_subscribers
+        self._subscribers = {}  # Subscription -> set of symbols
+        self._latest = {}  # symbol -> last broadcast quote
+        self._lock = threading.Lock()
+        # Signalled (under _lock) when a new subscriber needs a prompt refresh
+        self._wakeup = threading.Condition(self._lock)
+        self._refresh_requested = False
+        self._thread = None
+        self.live_indicators = LiveIndicators()
+        self.refreshes = 0
+        self.dropped = 0
+        self.rejected = 0
+    
+    def subscribe(self, symbols, indicators=()):
+        """
+        Subscribe to quote updates for some symbols.
+        
+        Args:
+            symbols (list): Stock symbols to watch
+            indicators (tuple): Indicator names (with a streaming
+                implementation) whose live values each quote should carry
+                under 'indicators'
+        
+        Returns:
+            Subscription: Queue of quote dicts; pass it to unsubscribe() when
+                done. None if max_subscribers streams are already open.
+        """
+        subscription = Subscription(self.queue_size, indicators)
+        symbols = {symbol.upper() for symbol in symbols}
+        with self._lock:
+            if len(self._subscribers) >= self.max_subscribers:
+                self.rejected += 1
+                return None
+            self._subscribers[subscription] = symbols
+            snapshot = [self._latest[symbol] for symbol in symbols if symbol in self._latest]
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='quote-stream', daemon=True)
+                self._thread.start()
+            # New subscribers start from the last known quotes, then get a prompt refresh
+            if len(snapshot) < len(symbols):
+                self._refresh_requested = True
+                self._wakeup.notify()
+        
+        for quote in snapshot:
+            self._deliver(subscription, self._with_indicators(subscription, quote, {}))
+        return subscription
+    
+    def unsubscribe(self, subscription):
+        """Stop delivering quotes to a subscription."""
+        with self._lock:
+            self._subscribers.pop(subscription, None)
+    
+    def _run(self):
+        while True:
+            with self._lock:
+                if not self._subscribers:
+                    # Exit when idle; the next subscribe() starts a new thread
+                    self._thread = None
+                    return
+                symbols = sorted(set().union(*self._subscribers.values()))
+            
+            try:
+                self._publish(get_quotes(symbols))
+            except Exception as e:
+                print(f"Error refreshing streamed quotes: {str(e)}")
+            
+            with self._lock:
+                # A request made while refreshing is kept in the flag, not lost
+                if not self._refresh_requested:
+                    self._wakeup.wait(self.refresh_interval)
+                self._refresh_requested = False
+    
+    def _publish(self, quotes):
+        with self._lock:
+            self.refreshes += 1
+            changed = {}
+            for symbol, quote in quotes.items():
+                if quote is not None and quote != self._latest.get(symbol):
+                    self._latest[symbol] = quote
+                    changed[symbol] = quote
+            
+            deliveries = [
+                (subscription, changed[symbol])
+                for subscription, symbols in self._subscribers.items()
+                for symbol in symbols if symbol in changed
+            ]
+        
+        # Each (symbol, indicator set) is advanced once per refresh
+        computed = {}
+        for subscription, quote in deliveries:
+            self._deliver(subscription, self._with_indicators(subscription, quote, computed))
+    
+    def _with_indicators(self, subscription, quote, computed):
+        if not subscription.indicators:
+            return quote
+        key = (quote['symbol'], subscription.indicators)
+        if key not in computed:
+            try:
+                values = self.live_indicators.values(quote['symbol'], subscription.indicators, quote)
+            except Exception as e:
+                print(f"Error updating live indicators for {quote['symbol']}: {str(e)}")
+                values = None
+            computed[key] = dict(quote, indicators=values)
+        return computed[key]
+    
+    def _deliver(self, subscription, quote):
+        # A slow client loses its oldest update rather than stalling everyone
+        while True:
+            try:
+                subscription.put_nowait(quote)
+                return
+            except queue.Full:
+                try:
+                    subscription.get_nowait()
+                except queue.Empty:
+                    continue
+                with self._lock:
+                    self.dropped += 1
+    
+    def stats(self):
+        """Return subscriber and refresh counters."""
+        with self._lock:
+            return {
+                'subscribers': len(self._subscribers),
+                'symbols': len(set().union(*self._subscribers.values())) if self._subscribers else 0,
+                'refreshes': self.refreshes,
+                'dropped': self.dropped,
+                'rejected': self.rejected,
+                'max_subscribers': self.max_subscribers,
+                'live_indicators': len(self.live_indicators),
+                'running': self._thread is not None and self._thread.is_alive()
+            }
+
+class Subscription(queue.Queue):
+    """Bounded queue of quotes for one streaming client, and the live indicators it asked for."""
+    
+    def __init__(self, maxsize=0, indicators=()):
+        super().__init__(maxsize)
+        self.indicators = tuple(indicators)
+
+# Shared by every request handled by this process; configured by init_app()
+quote_broadcaster = QuoteBroadcaster()
+
+def init_app(app):
+    """
+    Configure the quote stream from the Flask app config.
+    
+    Args:
+        app (Flask): Flask application
+    """
+    quote_broadcaster.refresh_interval = app.config.get('STREAM_REFRESH_INTERVAL', quote_broadcaster.refresh_interval)
+    quote_broadcaster.max_subscribers = app.config.get('STREAM_MAX_CLIENTS', quote_broadcaster.max_subscribers)
+
+def stream_quotes(subscription, heartbeat=20):
+    """
+    Generate a Server-Sent Events stream of quote updates.
+    
+    Args:
+        subscription (Subscription): From quote_broadcaster.subscribe();
+            unsubscribed when the stream ends
+        heartbeat (float): Seconds between keep-alive comments when idle
+    
+    Yields:
+        str: SSE messages; each 'quote' event carries one quote as JSON
+    """
+    try:
+        # Let EventSource reconnect after one refresh interval if dropped
+        yield f"retry: {int(quote_broadcaster.refresh_interval * 1000)}\n\n"
+        last_sent = time.monotonic()
+        while True:
+            try:
+                quote = subscription.get(timeout=max(0.1, heartbeat - (time.monotonic() - last_sent)))
+            except queue.Empty:
+                yield ": keep-alive\n\n"
+            else:
+                yield f"event: quote\ndata: {dumps(quote).decode('utf-8')}\n\n"
+            last_sent = time.monotonic()
+    finally:
+        quote_broadcaster.unsubscribe(subscription)
@@ -0,0 +1,289 @@
+import json
+import os
+import random
+import threading
+import time
+
+import click
+import pandas as pd
+import yfinance as yf
+
+from app.utils.periods import FULL_HISTORY, period_start, slice_period
+from app.utils.synthetic import bars_to_frame, generate_bars, generate_info
+
+class MarketDataProvider:
+    """
+    Interface for a source of price bars and company metadata.
+    
+    Bars are returned as a DataFrame indexed by a time zone aware 'Date'
+    index with at least the Open, High, Low, Close and Volume columns.
+    """
+    
+    name = None
+    # Whether period windows end at the current time; the local bar store
+    # and derived histories measure periods from the wall clock, so they
+    # are only used with live providers
+    live = True
+    
+    def fetch_bars(self, symbol, period=None, interval='1d', start=None):
+        """
+        Fetch price bars for a symbol.
+        
+        Args:
+            symbol (str): Stock symbol
+            period (str): Period of data to fetch (ignored when start is given)
+            interval (str): Data interval
+            start (pd.Timestamp): Only return bars at or after this time
+        
+        Returns:
+            pd.DataFrame: Bars indexed by 'Date'
+        """
+        raise NotImplementedError
+    
+    def fetch_info(self, symbol):
+        """
+        Fetch company metadata for a symbol.
+        
+        Returns:
+            dict: Company metadata (may be empty)
+        """
+        raise NotImplementedError
+    
+    def fetch_bars_batch(self, symbols, period='1y', interval='1d'):
+        """
+        Fetch price bars for several symbols.
+        
+        Symbols that fail are left out of the result.
+        
+        Returns:
+            dict: Symbol -> bars DataFrame
+        """
+        result = {}
+        for symbol in symbols:
+            try:
+                result[symbol] = self.fetch_bars(symbol, period=period, interval=interval)
+            except Exception as e:
+                print(f"Error fetching bars for {symbol}: {str(e)}")
+        return result
+
+class YFinanceProvider(MarketDataProvider):
+    """Market data from Yahoo Finance via yfinance."""
+    
+    name = 'yfinance'
+    
+    def fetch_bars(self, symbol, period=None, interval='1d', start=None):
+        stock = yf.Ticker(symbol)
+        if start is not None:
+            history = stock.history(start=start, interval=interval)
+        else:
+            history = stock.history(period=period, interval=interval)
+        
+        # Daily history is indexed by 'Date', intraday by 'Datetime'
+        history.index.name = 'Date'
+        return history
+    
+    def fetch_info(self, symbol):
+        return yf.Ticker(symbol).info
+    
+    def fetch_bars_batch(self, symbols, period='1y', interval='1d'):
+        # One multi-ticker download instead of a round trip per symbol
+        frames = yf.download(
+            list(symbols), period=period, interval=interval,
+            group_by='ticker', auto_adjust=False, threads=True, progress=False
+        )
+        result = {}
+        for symbol in symbols:
+            if symbol not in frames.columns.get_level_values(0):
+                continue
+            history = frames[symbol].dropna(how='all')
+            history.index.name = 'Date'
+            result[symbol] = history
+        return result
+
+class ReplayProvider(MarketDataProvider):
+    """
+    Serves recorded bars from local disk with simulated latency, for
+    deterministic offline benchmarks and load tests.
+    
+    Recordings live in ``<directory>/<SYMBOL>/<interval>.csv`` (a 'Date'
+    column plus OHLCV), ``<directory>/<SYMBOL>/info.json`` and
+    ``<directory>/<SYMBOL>/meta.json`` (the exchange time zone). Period
+    windows are measured back from the last recorded bar, so a recording
+    serves the same bars no matter when it is replayed.
+    """
+    
+    name = 'replay'
+    live = False
+    
+    def __init__(self, directory, latency=0.0, jitter=0.0):
+        self.directory = directory
+        self.latency = latency
+        self.jitter = jitter
+        self._frames = {}
+        self._lock = threading.Lock()
+    
+    def _sleep(self):
+        delay = self.latency + (random.uniform(0, self.jitter) if self.jitter else 0.0)
+        if delay > 0:
+            time.sleep(delay)
+    
+    def _load(self, symbol, interval):
+        key = (symbol.upper(), interval)
+        with self._lock:
+            if key not in self._frames:
+                symbol_dir = os.path.join(self.directory, symbol.upper())
+                path = os.path.join(symbol_dir, f"{interval}.csv")
+                if not os.path.exists(path):
+                    raise LookupError(f"No recorded {interval} bars for {symbol}")
+                
+                tz = 'UTC'
+                if os.path.exists(os.path.join(symbol_dir, 'meta.json')):
+                    with open(os.path.join(symbol_dir, 'meta.json')) as f:
+                        tz = json.load(f).get('tz', tz)
+                
+                frame = pd.read_csv(path, index_col='Date')
+                frame.index = pd.DatetimeIndex(pd.to_datetime(frame.index, utc=True).tz_convert(tz), name='Date')
+                self._frames[key] = frame
+            return self._frames[key]
+    
+    def fetch_bars(self, symbol, period=None, interval='1d', start=None):
+        self._sleep()
+        frame = self._load(symbol, interval)
+        if start is not None:
+            return frame[frame.index >= pd.Timestamp(start)].copy()
+        
+        window_start = period_start(period or '1y', now=frame.index[-1]) if len(frame) else FULL_HISTORY
+        if window_start == FULL_HISTORY:
+            return frame.copy()
+        return slice_period(frame[frame.index.as_unit('ns').asi8 >= window_start], period).copy()
+    
+    def fetch_info(self, symbol):
+        self._sleep()
+        path = os.path.join(self.directory, symbol.upper(), 'info.json')
+        if not os.path.exists(path):
+            return {}
+        with open(path) as f:
+            return json.load(f)
+
+class SyntheticProvider(MarketDataProvider):
+    """
+    Seeded geometric Brownian motion bars that need no network access.
+    A batch fetch generates the whole universe in one vectorized call.
+    """
+    
+    name = 'synthetic'
+    
+    def __init__(self, seed=0, correlation=0.0):
+        self.seed = seed
+        self.correlation = correlation
+    
+    def fetch_bars(self, symbol, period=None, interval='1d', start=None):
+        return self.fetch_bars_batch([symbol], period=period or '1y', interval=interval, start=start)[symbol]
+    
+    def fetch_info(self, symbol):
+        bars = bars_to_frame(generate_bars([symbol], period='1y', seed=self.seed))
+        return generate_info(symbol, bars, seed=self.seed)
+    
+    def fetch_bars_batch(self, symbols, period='1y', interval='1d', start=None):
+        if start is not None:
+            # A day period of at least as many sessions as calendar days since start
+            start = pd.Timestamp(start)
+            start = start.tz_localize('UTC') if start.tz is None else start
+            period = f"{max(1, (pd.Timestamp.now(tz='UTC') - start).days + 1)}d"
+        bars = generate_bars(symbols, period=period, interval=interval,
+                             seed=self.seed, correlation=self.correlation)
+        result = {}
+        for i, symbol in enumerate(symbols):
+            frame = bars_to_frame(bars, i)
+            result[symbol] = frame[frame.index >= pd.Timestamp(start)] if start is not None else frame
+        return result
+
+def record_bars(provider, directory, symbols, period='1y', interval='1d'):
+    """
+    Record bars and metadata from a provider for later use by ReplayProvider.
+    
+    Args:
+        provider (MarketDataProvider): Provider to record from
+        directory (str): Recording directory
+        symbols (list): Stock symbols to record
+        period (str): Period of data to record
+        interval (str): Data interval to record
+    
+    Returns:
+        list: Symbols that were recorded
+    """
+    recorded = []
+    for symbol in symbols:
+        try:
+            bars = provider.fetch_bars(symbol, period=period, interval=interval)
+            info = provider.fetch_info(symbol)
+        except Exception as e:
+            print(f"Error recording {symbol}: {str(e)}")
+            continue
+        
+        symbol_dir = os.path.join(directory, symbol.upper())
+        os.makedirs(symbol_dir, exist_ok=True)
+        bars.to_csv(os.path.join(symbol_dir, f"{interval}.csv"), index_label='Date')
+        with open(os.path.join(symbol_dir, 'info.json'), 'w') as f:
+            json.dump(info, f, default=str)
+        with open(os.path.join(symbol_dir, 'meta.json'), 'w') as f:
+            json.dump({'tz': str(bars.index.tz or 'UTC')}, f)
+        recorded.append(symbol)
+    return recorded
+
+PROVIDERS = {
+    'yfinance': YFinanceProvider,
+    'replay': ReplayProvider,
+    'synthetic': SyntheticProvider,
+}
+
+def create_provider(config, instance_path='.'):
+    """
+    Create the market data provider selected by MARKET_DATA_PROVIDER.
+    
+    Args:
+        config (dict): Flask app config
+        instance_path (str): Flask instance folder, home of the default replay directory
+    
+    Returns:
+        MarketDataProvider: The configured provider
+    """
+    name = config.get('MARKET_DATA_PROVIDER', 'yfinance')
+    if name not in PROVIDERS:
+        raise ValueError(f"Unknown market data provider: {name}")
+    
+    if name == 'replay':
+        return ReplayProvider(
+            config.get('REPLAY_DATA_DIR') or os.path.join(instance_path, 'replay'),
+            latency=config.get('REPLAY_LATENCY', 0.0),
+            jitter=config.get('REPLAY_LATENCY_JITTER', 0.0)
+        )
+    if name == 'synthetic':
+        return SyntheticProvider(
+            seed=config.get('SYNTHETIC_SEED', 0),
+            correlation=config.get('SYNTHETIC_CORRELATION', 0.0)
+        )
+    return PROVIDERS[name]()
+
+def init_app(app):
+    """
+    Register the ``flask record-bars`` command, which makes recordings for
+    the replay provider.
+    
+    Args:
+        app (Flask): Flask application
+    """
+    @app.cli.command('record-bars')
+    @click.argument('symbols', nargs=-1, required=True)
+    @click.option('--source', default='yfinance', type=click.Choice(sorted(set(PROVIDERS) - {'replay'})),
+                  help='Provider to record from.')
+    @click.option('--period', default='1y', help='Period of data to record.')
+    @click.option('--interval', default='1d', help='Data interval to record.')
+    @click.option('--directory', default=None, help='Recording directory (defaults to REPLAY_DATA_DIR).')
+    def record_bars_command(symbols, source, period, interval, directory):
+        """Record bars and metadata of SYMBOLS for MARKET_DATA_PROVIDER=replay."""
+        provider = create_provider(dict(app.config, MARKET_DATA_PROVIDER=source), app.instance_path)
+        directory = directory or app.config.get('REPLAY_DATA_DIR') or os.path.join(app.instance_path, 'replay')
+        symbols = [symbol.upper() for symbol in symbols]
+        recorded = record_bars(provider, directory, symbols, period=period, interval=interval)
+        click.echo(f"Recorded {len(recorded)} of {len(symbols)} symbols to {directory}")
@@ -0,0 +1,224 @@
+import numpy as np
+import pandas as pd
+
+from app.utils.periods import FULL_HISTORY, period_start
+
+# Bar widths in minutes of the intraday intervals
+INTRADAY_MINUTES = {
+    '1m': 1, '2m': 2, '5m': 5, '15m': 15, '30m': 30,
+    '60m': 60, '90m': 90, '1h': 60,
+}
+
+# Calendar buckets of the intervals longer than a day, labelled like Yahoo Finance
+CALENDAR_FREQUENCIES = {'1wk': 'W-SUN', '1mo': 'M', '3mo': 'Q'}
+
+# Intervals fetched from the provider and resampled into coarser ones,
+# finest first: (interval, longest period the provider serves at that
+# interval or None, window fetched when a shorter period is asked for).
+# Limits are periods so they are padded by period_start() like the periods
+# compared with them (a '5d' request reaches back 9 days, within '7d')
+BASE_INTERVALS = (
+    ('1m', '7d', '5d'),
+    ('5m', '60d', '1mo'),
+    ('1d', None, '2y'),
+)
+
+# Windows a cached history may have been fetched for, checked shortest first
+# when a shorter period can be sliced out of one
+CACHED_WINDOWS = ('5d', '1mo', '3mo', '6mo', 'ytd', '1y', '2y', '5y', '10y', 'max')
+
+# Trading days and regular-session minutes a year has, for annualizing per-bar figures
+TRADING_DAYS_PER_YEAR = 252
+SESSION_MINUTES = 390
+
+# Bars per year of the intervals of a day or longer
+_DAILY_BARS_PER_YEAR = {'1d': TRADING_DAYS_PER_YEAR, '5d': 52, '1wk': 52, '1mo': 12, '3mo': 4}
+
+_DAY_NS = 24 * 3600 * 10**9
+_MINUTE_NS = 60 * 10**9
+
+def bars_per_year(interval):
+    """
+    Number of bars of an interval in a trading year.
+    
+    Intraday intervals count the bars of a regular session, including a
+    shorter last bar (a 390-minute session has seven 60m bars).
+    
+    Args:
+        interval (str): Bar interval, e.g. '5m', '1d' or '1wk'
+    
+    Returns:
+        int: Bars per year, for annualizing returns and volatility
+    
+    Raises:
+        ValueError: If the interval is not known
+    """
+    if interval in INTRADAY_MINUTES:
+        return TRADING_DAYS_PER_YEAR * -(-SESSION_MINUTES // INTRADAY_MINUTES[interval])
+    if interval in _DAILY_BARS_PER_YEAR:
+        return _DAILY_BARS_PER_YEAR[interval]
+    raise ValueError(f"Unknown interval: {interval}")
+
+def can_resample(base, interval):
+    """
+    Check whether bars of one interval can be aggregated into another.
+    
+    Args:
+        base (str): Interval of the bars held
+        interval (str): Interval wanted
+    
+    Returns:
+        bool: True for a finer intraday base dividing the wanted width, or
+            a daily base for weekly, monthly and quarterly bars
+    """
+    if base in INTRADAY_MINUTES and interval in INTRADAY_MINUTES:
+        width = INTRADAY_MINUTES[interval]
+        return INTRADAY_MINUTES[base] < width and width % INTRADAY_MINUTES[base] == 0
+    return base == '1d' and interval in CALENDAR_FREQUENCIES
+
+def _period_days(period, now):
+    start = period_start(period, now)
+    if start == FULL_HISTORY:
+        return float('inf')
+    return (now.value - start) / _DAY_NS
+
+def plan_fetch(period, interval, now=None):
+    """
+    Choose the history to fetch from the provider for a period and interval.
+    
+    The finest base interval that can produce the wanted bars and still
+    covers the period is used, with its window widened to the base window,
+    so one fetch per symbol and base interval serves every coarser interval
+    and shorter period.
+    
+    Args:
+        period (str): Period of data wanted
+        interval (str): Interval wanted
+        now (pd.Timestamp): End of the window (defaults to the current time)
+    
+    Returns:
+        tuple: (base interval, window) to fetch, or None if the wanted
+            history is best fetched as it is
+    """
+    now = pd.Timestamp.now(tz='UTC') if now is None else now
+    days = _period_days(period, now)
+    for base, longest, window in BASE_INTERVALS:
+        if base != interval and not can_resample(base, interval):
+            continue
+        if longest is not None and days > _period_days(longest, now):
+            continue
+        if _period_days(window, now) < days:
+            window = period
+        if base == interval and window == period:
+            return None
+        return base, window
+    return None
+
+def covering_windows(period, now=None):
+    """
+    List the CACHED_WINDOWS strictly longer than a period, shortest first.
+    
+    Returns:
+        list: Window names
+    """
+    now = pd.Timestamp.now(tz='UTC') if now is None else now
+    start = period_start(period, now)
+    starts = [(period_start(window, now), window) for window in CACHED_WINDOWS if window != period]
+    return [window for window_start, window in sorted(starts, reverse=True) if window_start < start]
+
+def slice_columns(columns, tz, period, now=None):
+    """
+    Cut the bars of a shorter period out of a longer history.
+    
+    Matches what the provider returns for the period: bars from
+    period_start() on, and for day periods the last that many sessions.
+    
+    Args:
+        columns (dict): Column name -> array, with 'Date' in epoch milliseconds
+        tz (str): Exchange time zone, which sessions are counted in
+        period (str): Period of data wanted
+    
+    Returns:
+        dict: Columns of the period (views of the input arrays)
+    """
+    dates = columns['Date']
+    start = period_start(period, now)
+    first = 0 if start == FULL_HISTORY else int(np.searchsorted(dates, start // 10**6, side='left'))
+    
+    if period.endswith('d') and period[:-1].isdigit() and first < len(dates):
+        days = _local_ns(dates[first:], tz) // _DAY_NS
+        sessions = np.unique(days)[-int(period[:-1]):]
+        first += int(np.searchsorted(days, sessions[0], side='left'))
+    
+    return {name: values[first:] for name, values in columns.items()}
+
+def _local_ns(dates, tz):
+    """Epoch milliseconds in UTC as nanoseconds on the local wall clock of tz."""
+    index = pd.to_datetime(np.asarray(dates, dtype=np.int64), unit='ms', utc=True).tz_convert(tz)
+    return index.tz_localize(None).as_unit('ns').asi8
+
+def resample_columns(columns, tz, interval):
+    """
+    Aggregate bars into a coarser interval.
+    
+    Open is the first bar's open, High and Low the extremes, Close the last
+    close, Volume and Dividends the sum and Stock Splits the compounded
+    ratio; any other column keeps its last value. Intraday buckets are
+    aligned to the usual first bar of the session (09:30 for US
+    exchanges), weekly buckets start on Monday and monthly and quarterly
+    ones on the first of the month, in the exchange time zone.
+    
+    Args:
+        columns (dict): Column name -> array, with 'Date' in epoch
+            milliseconds, oldest first
+        tz (str): Exchange time zone
+        interval (str): Interval to aggregate into (see can_resample())
+    
+    Returns:
+        dict: Aggregated columns, each bar dated at the start of its bucket
+    """
+    dates = np.asarray(columns['Date'], dtype=np.int64)
+    if len(dates) == 0:
+        return {name: values[:0] for name, values in columns.items()}
+    
+    local = _local_ns(dates, tz)
+    if interval in INTRADAY_MINUTES:
+        width = INTRADAY_MINUTES[interval]
+        minutes = local // _MINUTE_NS
+        days = minutes // 1440
+        time_of_day = minutes - days * 1440
+        # Align buckets to the typical first bar of a session
+        first_bars = time_of_day[np.flatnonzero(np.diff(days, prepend=days[0] - 1))]
+        offset = int(np.median(first_bars)) % width
+        buckets = days * 1440 + (time_of_day - offset) // width * width + offset
+        starts = np.flatnonzero(np.diff(buckets, prepend=buckets[0] - 1))
+        # Back to UTC with the offset in force at each bucket's first bar
+        utc_offset = local[starts] - dates[starts] * 10**6
+        label_ms = (buckets[starts] * _MINUTE_NS - utc_offset) // 10**6
+    else:
+        periods = pd.DatetimeIndex(local.view('datetime64[ns]')).to_period(CALENDAR_FREQUENCIES[interval])
+        buckets = periods.asi8
+        starts = np.flatnonzero(np.diff(buckets, prepend=buckets[0] - 1))
+        labels = periods[starts].start_time.tz_localize(tz, ambiguous='NaT', nonexistent='shift_forward')
+        label_ms = labels.tz_convert('UTC').as_unit('ms').asi8
+    
+    result = {'Date': label_ms}
+    for name, values in columns.items():
+        if name == 'Date':
+            continue
+        values = np.asarray(values)
+        if name == 'Open':
+            result[name] = values[starts]
+        elif name == 'High':
+            result[name] = np.fmax.reduceat(values, starts)
+        elif name == 'Low':
+            result[name] = np.fmin.reduceat(values, starts)
+        elif name in ('Volume', 'Dividends'):
+            result[name] = np.add.reduceat(np.nan_to_num(values) if values.dtype.kind == 'f' else values, starts)
+        elif name == 'Stock Splits':
+            # Ratios compound; 0 means no split
+            ratios = np.multiply.reduceat(np.where(values > 0, values, 1.0), starts)
+            result[name] = np.where(ratios == 1.0, 0.0, ratios)
+        else:
+            result[name] = values[np.append(starts[1:], len(values)) - 1]
+    return result
@@ -0,0 +1,338 @@
+import operator
+import re
+import threading
+import time
+
+import numpy as np
+
+from app.utils.data_analyzer import align_closes, compute_indicator_matrix
+from app.utils.data_fetcher import get_bars_batch, get_listings
+from app.utils.prediction import fit_trends
+
+# Indicator columns of the snapshot, by the name compute_indicator_matrix() knows them as
+_INDICATOR_COLUMNS = {
+    'ma_20': 'ma_20', 'ma_40': 'ma_40', 'ma_50': 'ma_50', 'ma_200': 'ma_200',
+    'ema_12': 'ema_12', 'ema_26': 'ema_26', 'rsi': 'rsi',
+}
+
+# Columns that hold text; every other column is numeric
+TEXT_COLUMNS = ('symbol', 'name', 'exchange', 'sector', 'trend')
+
+# Columns returned when the query does not pick any
+DEFAULT_FIELDS = ('symbol', 'name', 'price', 'change_percent', 'volume', 'rsi', 'macd_histogram', 'trend')
+
+_OPERATORS = {
+    '<': operator.lt, '<=': operator.le, '>': operator.gt, '>=': operator.ge,
+    '=': operator.eq, '==': operator.eq, '!=': operator.ne,
+}
+
+_CONDITION_PATTERN = re.compile(r'^\s*([a-z_0-9]+)\s*(<=|>=|==|!=|<|>|=)\s*(.+?)\s*$', re.IGNORECASE)
+_AND_PATTERN = re.compile(r',|\s+and\s+', re.IGNORECASE)
+
+class ScreenerSnapshot:
+    """
+    Columnar table of the latest price and indicator values for a universe.
+    
+    Every column is a NumPy array with one entry per symbol, so a screen is
+    a handful of vectorized comparisons, a sort and a slice, whatever the
+    size of the universe.
+    """
+    
+    def __init__(self, symbols, columns, built_at=None):
+        self.symbols = list(symbols)
+        self.columns = columns
+        self.built_at = built_at if built_at is not None else time.time()
+        # Case-folded text columns for matching
+        self._folded = {
+            name: np.array([str(value).lower() for value in columns[name]], dtype=object)
+            for name in TEXT_COLUMNS if name in columns
+        }
+    
+    def __len__(self):
+        return len(self.symbols)
+    
+    @classmethod
+    def build(cls, listings, bars):
+        """
+        Build a snapshot from bars for a universe.
+        
+        Args:
+            listings (list): Listing dicts ('symbol', 'name', 'exchange', 'sector')
+            bars (dict): Symbol -> columns, as returned by get_bars_batch()
+        
+        Returns:
+            ScreenerSnapshot: Latest values for every listing with bars
+        """
+        listings = [listing for listing in listings if listing['symbol'] in bars]
+        symbols = [listing['symbol'] for listing in listings]
+        data = {symbol: bars[symbol] for symbol in symbols}
+        _, _, closes = align_closes(data)
+        _, _, volumes = align_closes(data, column='Volume')
+        
+        indicators = compute_indicator_matrix(closes, list(_INDICATOR_COLUMNS) + ['macd'])
+        columns = {
+            'symbol': np.array(symbols, dtype=object),
+            'name': np.array([listing.get('name', '') for listing in listings], dtype=object),
+            'exchange': np.array([listing.get('exchange', '') for listing in listings], dtype=object),
+            'sector': np.array([listing.get('sector', '') for listing in listings], dtype=object),
+        }
+        
+        if closes.shape[1] == 0:
+            # No bars at all: one missing bar per symbol keeps the code below uniform
+            closes = volumes = np.full((len(symbols), 1), np.nan)
+        
+        rows = np.arange(len(symbols))
+        valid = ~np.isnan(closes)
+        latest = closes.shape[1] - 1 - valid[:, ::-1].argmax(axis=1)
+        # The bar before each symbol's latest one, for the daily change
+        earlier = valid.copy()
+        earlier[rows, latest] = False
+        previous = closes.shape[1] - 1 - earlier[:, ::-1].argmax(axis=1)
+        
+        price = np.where(valid.any(axis=1), closes[rows, latest], np.nan)
+        previous_close = np.where(earlier.any(axis=1), closes[rows, previous], np.nan)
+        recent = closes[:, -252:]
+        has_recent = ~np.isnan(recent).all(axis=1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            columns['price'] = price
+            columns['change_percent'] = (price / previous_close - 1) * 100
+            columns['volume'] = np.where(valid.any(axis=1), volumes[rows, latest], np.nan)
+            columns['high_52w'] = np.where(has_recent, np.max(np.where(np.isnan(recent), -np.inf, recent), axis=1), np.nan)
+            columns['low_52w'] = np.where(has_recent, np.min(np.where(np.isnan(recent), np.inf, recent), axis=1), np.nan)
+        
+        for column, name in _INDICATOR_COLUMNS.items():
+            columns[column] = indicators[name]
+        columns['macd'] = indicators['macd']['macd']
+        columns['macd_signal'] = indicators['macd']['signal']
+        columns['macd_histogram'] = indicators['macd']['histogram']
+        
+        # Change implied by the 30-bar trend forecast, every symbol in one fit
+        with np.errstate(invalid='ignore', divide='ignore'):
+            columns['prediction_change_percent'] = (fit_trends(closes).predict(30)[:, -1] / price - 1) * 100
+        
+        # Same rule as data_analyzer.analyze_trend(): MA(20) against MA(40)
+        short, long = columns['ma_20'], columns['ma_40']
+        with np.errstate(invalid='ignore'):
+            columns['trend'] = np.select(
+                [np.isnan(short) | np.isnan(long), short > long * 1.02, short < long * 0.98],
+                ['unknown', 'uptrend', 'downtrend'], 'sideways'
+            ).astype(object)
+        
+        return cls(symbols, columns)
+    
+    def query(self, filters='', sort=None, limit=50, offset=0, fields=None):
+        """
+        Screen the universe.
+        
+        Args:
+            filters (str): Conditions joined by ',' or 'and', each
+                '<column> <op> <value>' with op one of < <= > >= = != and
+                value a number, another column (e.g. 'ma_50 > ma_200') or,
+                for text columns, a case-insensitive string
+            sort (str): Column to sort by, prefixed with '-' for descending;
+                missing values sort last (defaults to listing order)
+            limit (int): Maximum number of rows to return
+            offset (int): Number of matching rows to skip
+            fields (list): Columns to return (defaults to DEFAULT_FIELDS)
+        
+        Returns:
+            dict: 'total' matching rows and 'results', a list of row dicts
+        """
+        fields = list(fields or DEFAULT_FIELDS)
+        for field in fields:
+            self._check_column(field)
+        
+        mask = np.ones(len(self.symbols), dtype=bool)
+        for column, compare, operand in self.parse_filters(filters):
+            mask &= self._evaluate(column, compare, operand)
+        matches = np.nonzero(mask)[0]
+        
+        if sort:
+            descending = sort.startswith('-')
+            column = self._check_column(sort.lstrip('-+'))
+            values = self.columns[column][matches]
+            if column in TEXT_COLUMNS:
+                order = np.argsort(self._folded[column][matches].astype(str), kind='stable')
+                if descending:
+                    order = order[::-1]
+            else:
+                values = values.astype(np.float64)
+                order = np.argsort(-values if descending else values, kind='stable')
+            matches = matches[order]
+        
+        page = matches[offset:offset + limit]
+        results = []
+        for row in page:
+            results.append({field: _json_value(self.columns[field][row]) for field in fields})
+        return {'total': int(len(matches)), 'results': results}
+    
+    def parse_filters(self, filters):
+        """
+        Parse a filter expression into (column, comparison, operand) conditions.
+        
+        Raises:
+            ValueError: If a condition or column is not recognised
+        """
+        conditions = []
+        for condition in _AND_PATTERN.split(filters or ''):
+            if not condition.strip():
+                continue
+            match = _CONDITION_PATTERN.match(condition)
+            if match is None:
+                raise ValueError(f"Invalid filter: {condition.strip()}")
+            column, op, value = match.groups()
+            column = self._check_column(column.lower())
+            value = value.strip('\'"')
+            
+            if column in TEXT_COLUMNS:
+                if op not in ('=', '==', '!='):
+                    raise ValueError(f"Text column {column} only supports = and !=")
+                operand = value.lower()
+            elif value.lower() in self.columns and value.lower() not in TEXT_COLUMNS:
+                operand = ('column', value.lower())
+            else:
+                try:
+                    operand = float(value)
+                except ValueError:
+                    raise ValueError(f"Invalid value for {column}: {value}")
+            conditions.append((column, _OPERATORS[op], operand))
+        return conditions
+    
+    def _evaluate(self, column, compare, operand):
+        if column in TEXT_COLUMNS:
+            return compare(self._folded[column], operand).astype(bool)
+        values = self.columns[column]
+        if isinstance(operand, tuple):
+            operand = self.columns[operand[1]]
+        # Comparisons with missing values are false
+        with np.errstate(invalid='ignore'):
+            return compare(values, operand)
+    
+    def _check_column(self, column):
+        if column not in self.columns:
+            raise ValueError(f"Unknown column: {column}")
+        return column
+    
+    def stats(self):
+        """Return the size and age of the snapshot."""
+        return {
+            'symbols': len(self.symbols),
+            'columns': sorted(self.columns),
+            'built_at': self.built_at,
+            'age': time.time() - self.built_at
+        }
+
+def _json_value(value):
+    if isinstance(value, (float, np.floating)):
+        return None if np.isnan(value) else float(value)
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+class ScreenerService:
+    """
+    Keeps the screener snapshot of a universe fresh in the background.
+    
+    The first query starts a single daemon thread that builds the snapshot
+    and then rebuilds it every refresh_interval seconds; no request ever
+    builds one itself, so until the first build completes queries get no
+    snapshot and are told to retry. Queries always read the latest
+    complete snapshot; a rebuild swaps it in whole.
+    """
+    
+    # Seconds between attempts while the first build keeps failing
+    RETRY_INTERVAL = 60
+    
+    def __init__(self, refresh_interval=900, period='1y', batch_size=200, symbols=None):
+        self.refresh_interval = refresh_interval
+        self.period = period
+        self.batch_size = batch_size
+        self.symbols = symbols
+        self._snapshot = None
+        self._build_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._thread = None
+        self.refreshes = 0
+    
+    def get_snapshot(self):
+        """
+        Get the latest snapshot, starting the background refresh if needed.
+        
+        Returns:
+            ScreenerSnapshot: The current snapshot, or None while the first
+                one is still being built
+        """
+        self.start()
+        return self._snapshot
+    
+    def start(self):
+        """Start the refresh thread unless it is already running."""
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='screener-refresh', daemon=True)
+                self._thread.start()
+    
+    def refresh(self):
+        """Rebuild the snapshot now."""
+        with self._build_lock:
+            self._snapshot = self._build()
+        return self._snapshot
+    
+    def _run(self):
+        while True:
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"Error refreshing screener snapshot: {str(e)}")
+            if self._snapshot is None:
+                time.sleep(min(self.refresh_interval, self.RETRY_INTERVAL))
+            else:
+                time.sleep(self.refresh_interval)
+    
+    def _build(self):
+        listings = get_listings()
+        if self.symbols:
+            known = {listing['symbol']: listing for listing in listings}
+            listings = [known.get(symbol, {'symbol': symbol, 'name': symbol, 'exchange': '', 'sector': ''})
+                        for symbol in self.symbols]
+        
+        # Only the provider's bars: symbols it has none for are left out of the
+        # snapshot rather than screened on mock prices
+        bars = {}
+        symbols = [listing['symbol'] for listing in listings]
+        for start in range(0, len(symbols), self.batch_size):
+            bars.update(get_bars_batch(symbols[start:start + self.batch_size], period=self.period, fallback=False))
+        if symbols and not bars:
+            # Keep serving the last snapshot through a provider outage
+            raise ValueError("No bars from the market data provider")
+        
+        self.refreshes += 1
+        return ScreenerSnapshot.build(listings, bars)
+    
+    def stats(self):
+        """Return refresh counters and snapshot details."""
+        snapshot = self._snapshot
+        return {
+            'refreshes': self.refreshes,
+            'running': self._thread is not None and self._thread.is_alive(),
+            'snapshot': snapshot.stats() if snapshot is not None else None
+        }
+
+# Shared by every request handled by this process; configured by init_app()
+screener = ScreenerService()
+
+def init_app(app):
+    """
+    Configure the screener from the Flask app config.
+    
+    Args:
+        app (Flask): Flask application
+    """
+    screener.refresh_interval = app.config.get('SCREENER_REFRESH_INTERVAL', screener.refresh_interval)
+    screener.period = app.config.get('SCREENER_PERIOD', screener.period)
+    screener.batch_size = app.config.get('SCREENER_BATCH_SIZE', screener.batch_size)
+    symbols = app.config.get('SCREENER_SYMBOLS')
+    if isinstance(symbols, str):
+        symbols = [symbol.strip().upper() for symbol in symbols.split(',') if symbol.strip()]
+    screener.symbols = symbols or None
+    screener._snapshot = None
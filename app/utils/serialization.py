@@ -0,0 +1,92 @@
+import json
+
+import numpy as np
+import pandas as pd
+from flask import current_app
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is optional
+    orjson = None
+
+# Legacy record timestamps, in the exchange's local time
+RECORD_DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+def frame_to_columns(bars):
+    """
+    Convert a bars DataFrame to columns of NumPy arrays.
+    
+    Args:
+        bars (pd.DataFrame): Bars indexed by a datetime index
+    
+    Returns:
+        tuple: (columns, tz) where columns maps 'Date' to int64 milliseconds
+            since the epoch in UTC and every other column to its values, and
+            tz is the name of the index time zone
+    """
+    index = pd.DatetimeIndex(bars.index)
+    tz = str(index.tz) if index.tz is not None else 'UTC'
+    if index.tz is not None:
+        index = index.tz_convert('UTC')
+    
+    columns = {'Date': index.as_unit('ms').asi8.copy()}
+    for column in bars.columns:
+        columns[column] = bars[column].to_numpy()
+    return columns, tz
+
+def columns_to_records(columns, tz='UTC'):
+    """
+    Convert columns from frame_to_columns() to the legacy list-of-records shape.
+    
+    Args:
+        columns (dict): Column name -> array, with 'Date' in epoch milliseconds
+        tz (str): Time zone used to format the 'Date' strings
+    
+    Returns:
+        list: One dict per bar, with 'Date' formatted as RECORD_DATE_FORMAT
+    """
+    frame = pd.DataFrame(columns)
+    if len(frame) == 0:
+        return []
+    dates = pd.to_datetime(frame['Date'], unit='ms', utc=True).dt.tz_convert(tz)
+    frame['Date'] = dates.dt.strftime(RECORD_DATE_FORMAT)
+    return frame.to_dict('records')
+
+def _default(obj):
+    """Encode the NumPy and pandas values the standard library json module rejects."""
+    if isinstance(obj, np.ndarray):
+        if obj.dtype.kind == 'f':
+            # NaN is not valid JSON
+            if obj.ndim > 1:
+                return np.where(np.isnan(obj), None, obj).tolist()
+            return [None if value != value else value for value in obj.tolist()]
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, pd.Timestamp):
+        return obj.isoformat()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+def dumps(obj):
+    """
+    Serialize an object containing NumPy arrays to JSON bytes.
+    
+    Arrays are encoded straight from their buffers by orjson when it is
+    installed; otherwise the standard library encoder is used. NaN is
+    encoded as null either way.
+    
+    Returns:
+        bytes: UTF-8 encoded JSON
+    """
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, default=_default, separators=(',', ':')).encode('utf-8')
+
+def json_response(obj, status=200):
+    """
+    Build a JSON response with dumps(), for payloads that carry NumPy arrays.
+    
+    Returns:
+        flask.Response: application/json response
+    """
+    return current_app.response_class(dumps(obj), status=status, mimetype='application/json')
@@ -0,0 +1,186 @@
+import csv
+import os
+import re
+
+# Bundled starter universe; point LISTINGS_FILE at a full exchange listing for more
+DEFAULT_LISTINGS_FILE = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'listings.csv')
+
+# Accepted header names per field, covering plain CSV exports and the
+# NASDAQ Trader symbol directory files (nasdaqlisted.txt / otherlisted.txt)
+_FIELD_ALIASES = {
+    'symbol': ('symbol', 'act symbol', 'nasdaq symbol', 'ticker'),
+    'name': ('name', 'security name', 'company name', 'company'),
+    'exchange': ('exchange', 'listing exchange'),
+    'sector': ('sector',),
+}
+
+# Exchange codes used by the NASDAQ Trader symbol directory
+_EXCHANGE_CODES = {
+    'A': 'NYSE American', 'N': 'NYSE', 'P': 'NYSE Arca', 'Z': 'Cboe BZX',
+    'V': 'IEX', 'Q': 'NASDAQ', 'G': 'NASDAQ', 'S': 'NASDAQ',
+}
+
+# Ranked ids kept on every symbol trie node
+_TRIE_FANOUT = 64
+
+_TOKEN_PATTERN = re.compile(r'[a-z0-9]+')
+
+def load_listings(path):
+    """
+    Load a listings file.
+    
+    Comma, tab and pipe delimited files are accepted. Rows are kept in file
+    order, which is used as the tie-breaking rank, so files sorted by market
+    cap or volume give the best results.
+    
+    Args:
+        path (str): Path to the listings file
+    
+    Returns:
+        list: Dicts with 'symbol', 'name', 'exchange' and 'sector'
+    """
+    with open(path, newline='', encoding='utf-8') as f:
+        sample = f.readline()
+        f.seek(0)
+        delimiter = max(',|\t', key=sample.count)
+        reader = csv.DictReader(f, delimiter=delimiter)
+        
+        fields = {}
+        for field, aliases in _FIELD_ALIASES.items():
+            for column in reader.fieldnames or []:
+                if column.strip().lower() in aliases:
+                    fields[field] = column
+                    break
+        if 'symbol' not in fields:
+            raise ValueError(f"No symbol column in {path}")
+        
+        default_exchange = 'NASDAQ' if 'nasdaq' in os.path.basename(path).lower() else ''
+        listings = []
+        for row in reader:
+            symbol = (row.get(fields['symbol']) or '').strip()
+            if not symbol or symbol.startswith('File Creation Time') or row.get('Test Issue') == 'Y':
+                continue
+            
+            exchange = (row.get(fields.get('exchange')) or '').strip() if 'exchange' in fields else default_exchange
+            listings.append({
+                # Yahoo Finance writes share classes as BRK-B rather than BRK.B
+                'symbol': symbol.upper().replace('.', '-'),
+                'name': (row.get(fields.get('name')) or '').strip() if 'name' in fields else symbol,
+                'exchange': _EXCHANGE_CODES.get(exchange, exchange),
+                'sector': (row.get(fields.get('sector')) or '').strip() if 'sector' in fields else ''
+            })
+    return listings
+
+def _tokens(text):
+    return _TOKEN_PATTERN.findall(text.lower())
+
+class SymbolIndex:
+    """
+    In-memory search index over a listing universe.
+    
+    Symbols go into a prefix trie whose nodes keep their best-ranked
+    listings, so a symbol prefix lookup costs one step per character. Company
+    names are indexed by every prefix of every word (for type-ahead) and by
+    character trigrams (for matches inside words, e.g. 'soft' in
+    'Microsoft'). Results are ranked by match quality, then by listing rank.
+    """
+    
+    def __init__(self, listings):
+        self.listings = []
+        self._by_symbol = {}
+        for listing in listings:
+            if listing['symbol'] not in self._by_symbol:
+                self._by_symbol[listing['symbol']] = len(self.listings)
+                self.listings.append(listing)
+        
+        self._names = [' '.join(_tokens(listing['name'])) for listing in self.listings]
+        self._trie = {}
+        self._word_prefixes = {}
+        self._word_prefix_sets = {}
+        self._trigrams = {}
+        
+        for i, listing in enumerate(self.listings):
+            node = self._trie
+            for char in listing['symbol']:
+                node = node.setdefault(char, {})
+                ranked = node.setdefault(None, [])
+                if len(ranked) < _TRIE_FANOUT:
+                    ranked.append(i)
+        
+        for i, name in enumerate(self._names):
+            seen = set()
+            for word in name.split():
+                for end in range(1, len(word) + 1):
+                    prefix = word[:end]
+                    if prefix not in seen:
+                        seen.add(prefix)
+                        self._word_prefixes.setdefault(prefix, []).append(i)
+            for start in range(len(name) - 2):
+                self._trigrams.setdefault(name[start:start + 3], set()).add(i)
+        
+        for prefix, ids in self._word_prefixes.items():
+            self._word_prefix_sets[prefix] = frozenset(ids)
+    
+    def __len__(self):
+        return len(self.listings)
+    
+    def search(self, query, limit=20, autocomplete=False):
+        """
+        Find listings matching a query.
+        
+        Args:
+            query (str): Symbol or company name fragment
+            limit (int): Maximum number of results
+            autocomplete (bool): Only match symbol and word prefixes, the
+                cheapest mode, suited to querying on every keystroke
+        
+        Returns:
+            list: Matching listing dicts, best first
+        """
+        query = query.strip()
+        words = _tokens(query)
+        if not query or limit <= 0:
+            return []
+        
+        ranked = []
+        seen = set()
+        
+        def add(ids):
+            for i in ids:
+                if len(ranked) >= limit:
+                    return
+                if i not in seen:
+                    seen.add(i)
+                    ranked.append(i)
+        
+        # Exact symbol, then symbol prefix
+        symbol = query.upper().replace('.', '-')
+        if symbol in self._by_symbol:
+            add([self._by_symbol[symbol]])
+        node = self._trie
+        for char in symbol:
+            node = node.get(char)
+            if node is None:
+                break
+        else:
+            add(node.get(None, ()))
+        
+        # Company names where every query word starts a word of the name
+        if words and len(ranked) < limit:
+            # Walk the rarest word's ranked postings and probe the others
+            words_by_rarity = sorted(set(words), key=lambda word: len(self._word_prefixes.get(word, ())))
+            rarest = self._word_prefixes.get(words_by_rarity[0], ())
+            if rarest:
+                others = [self._word_prefix_sets[word] for word in words_by_rarity[1:]]
+                add(i for i in rarest if all(i in other for other in others))
+        
+        # Company names containing the query anywhere
+        if not autocomplete and len(ranked) < limit:
+            needle = ' '.join(words)
+            grams = [needle[start:start + 3] for start in range(len(needle) - 2)]
+            if grams:
+                candidates = sorted((self._trigrams.get(gram, set()) for gram in grams), key=len)
+                matches = set(candidates[0]).intersection(*candidates[1:])
+                add(i for i in sorted(matches) if needle in self._names[i])
+        
+        return [self.listings[i] for i in ranked]
@@ -0,0 +1,322 @@
+import zlib
+
+import numpy as np
+import pandas as pd
+
+from app.utils.periods import FULL_HISTORY, period_start, slice_period
+
+DEFAULT_TZ = 'America/New_York'
+
+# Regular US session: 09:30-16:00 exchange time
+_SESSION_OPEN_MINUTES = 9 * 60 + 30
+_SESSION_MINUTES = 390
+_TRADING_DAYS_PER_YEAR = 252
+
+_INTRADAY_MINUTES = {
+    '1m': 1, '2m': 2, '5m': 5, '15m': 15, '30m': 30,
+    '60m': 60, '90m': 90, '1h': 60,
+}
+
+# Labels for bars longer than a day, matching Yahoo Finance
+_INTERVAL_FREQUENCIES = {'1wk': 'W-MON', '1mo': 'MS', '3mo': 'QS'}
+
+# Prices live on a clock of integer units since 1970-01-01: each business day
+# is 30 overnight units followed by 390 one-minute session units.
+_EPOCH = np.datetime64('1970-01-01', 'D')
+_OVERNIGHT_UNITS = 30
+_UNITS_PER_SESSION = _OVERNIGHT_UNITS + _SESSION_MINUTES
+_UNITS_PER_YEAR = _UNITS_PER_SESSION * _TRADING_DAYS_PER_YEAR
+
+# Depth of the Brownian bridge tree; 2**25 units cover ~79,000 sessions
+_TREE_LEVELS = 25
+
+# Base prices are drawn for this date; paths wander away from it in both directions
+_REFERENCE_DATE = np.datetime64('2020-01-02', 'D')
+
+# Independent random streams per symbol
+_STREAM_PATH, _STREAM_HIGH, _STREAM_LOW, _STREAM_VOLUME, _STREAM_PARAMS = range(1, 6)
+_MARKET_SYMBOL = '^MARKET'
+
+_MIX_INCREMENT = np.uint64(0x9E3779B97F4A7C15)
+_MIX_MULTIPLIER_1 = np.uint64(0xBF58476D1CE4E5B9)
+_MIX_MULTIPLIER_2 = np.uint64(0x94D049BB133111EB)
+
+def trading_calendar(period='1y', interval='1d', end=None, tz=DEFAULT_TZ):
+    """
+    Build bar timestamps for a period/interval combination.
+    
+    Args:
+        period (str): Period of data (e.g., '5d', '1y', 'ytd', 'max')
+        interval (str): Data interval (e.g., '1m', '1h', '1d', '1wk', '1mo')
+        end (pd.Timestamp): Last day of the calendar (defaults to today)
+        tz (str): Exchange time zone
+    
+    Returns:
+        pd.DatetimeIndex: Time zone aware bar timestamps
+    """
+    if interval not in _INTRADAY_MINUTES and interval not in ('1d', '5d') and interval not in _INTERVAL_FREQUENCIES:
+        raise ValueError(f"Unsupported interval: {interval}")
+    
+    end = pd.Timestamp.now(tz=tz) if end is None else pd.Timestamp(end)
+    end = end.tz_localize(tz) if end.tz is None else end.tz_convert(tz)
+    end_day = end.normalize()
+    
+    start = period_start(period, now=end)
+    if start == FULL_HISTORY:
+        start_day = end_day - pd.DateOffset(years=30)
+    else:
+        start_day = pd.Timestamp(start, unit='ns', tz='UTC').tz_convert(tz)
+    
+    sessions = pd.bdate_range(start_day.normalize(), end_day, tz=tz, name='Date')
+    sessions = sessions[sessions >= start_day]
+    sessions = slice_period(pd.DataFrame(index=sessions), period).index
+    
+    if interval in _INTRADAY_MINUTES:
+        offsets = np.arange(0, _SESSION_MINUTES, _INTRADAY_MINUTES[interval]) + _SESSION_OPEN_MINUTES
+        stamps = sessions.as_unit('ns').asi8[:, None] + offsets[None, :] * 60 * 10**9
+        return pd.DatetimeIndex(pd.to_datetime(stamps.ravel(), utc=True).tz_convert(tz), name='Date')
+    
+    if interval == '1d':
+        return sessions
+    if interval == '5d':
+        return sessions[::5]
+    return pd.date_range(start_day.normalize(), end_day, freq=_INTERVAL_FREQUENCIES[interval], tz=tz, name='Date')
+
+def _bar_clock(dates, interval, last_day):
+    """
+    Map bar timestamps to the clock units at which each bar opens and closes.
+    
+    Args:
+        dates (pd.DatetimeIndex): Bar timestamps from trading_calendar()
+        interval (str): Data interval
+        last_day (np.datetime64): Last calendar day; the final long bar runs up to it
+    
+    Returns:
+        tuple: (start, stop) uint64 arrays
+    """
+    days = dates.tz_localize(None).values.astype('datetime64[D]')
+    session_open = np.busday_count(_EPOCH, days).astype(np.uint64) * _UNITS_PER_SESSION + _OVERNIGHT_UNITS
+    
+    if interval in _INTRADAY_MINUTES:
+        minutes = (dates.hour * 60 + dates.minute - _SESSION_OPEN_MINUTES).to_numpy().astype(np.uint64)
+        start = session_open + minutes
+        stop = np.minimum(start + np.uint64(_INTRADAY_MINUTES[interval]), session_open + np.uint64(_SESSION_MINUTES))
+        return start, stop
+    
+    if interval == '1d':
+        return session_open, session_open + np.uint64(_SESSION_MINUTES)
+    
+    # Longer bars close with the last session before the next label
+    next_days = np.append(days[1:], last_day + 1)
+    last_sessions = np.busday_count(_EPOCH, next_days).astype(np.uint64) - np.uint64(1)
+    return session_open, (last_sessions + np.uint64(1)) * _UNITS_PER_SESSION
+
+def _mix(x):
+    """SplitMix64 finalizer: a fast, well-distributed 64-bit hash."""
+    # Wrap-around is the point; numpy only warns about it for scalars
+    with np.errstate(over='ignore'):
+        x = x + _MIX_INCREMENT
+        x = (x ^ (x >> np.uint64(30))) * _MIX_MULTIPLIER_1
+        x = (x ^ (x >> np.uint64(27))) * _MIX_MULTIPLIER_2
+        return x ^ (x >> np.uint64(31))
+
+def _hash_uniform(keys, counters):
+    """Uniform [0, 1) draws keyed by (key, counter), broadcasting keys against counters."""
+    return (_mix(keys ^ _mix(counters)) >> np.uint64(11)).astype(np.float64) * 2.0 ** -53
+
+def _hash_normal(keys, counters):
+    """Standard normal draws keyed by (key, counter), via Box-Muller on the two halves of one hash."""
+    h = _mix(keys ^ _mix(counters))
+    u1 = (h >> np.uint64(32)).astype(np.float64) * 2.0 ** -32
+    u2 = (h & np.uint64(0xFFFFFFFF)).astype(np.float64) * 2.0 ** -32
+    return np.sqrt(-2.0 * np.log1p(-u1)) * np.cos(2.0 * np.pi * u2)
+
+def _symbol_keys(symbols, seed, stream):
+    """uint64 key per symbol for one random stream."""
+    crcs = np.array([zlib.crc32(symbol.upper().encode('utf-8')) for symbol in symbols], dtype=np.uint64)
+    base = _mix(_mix(np.uint64(seed)) ^ np.uint64(stream))
+    return _mix(crcs ^ base)
+
+def _brownian_motion(keys, points):
+    """
+    Evaluate independent standard Brownian motions at integer clock points.
+    
+    Each path is the dyadic Brownian bridge refinement of [0, 2**25] whose
+    midpoint draws are keyed by (key, midpoint), so any point can be
+    evaluated without generating the path before it, and every window of the
+    same path agrees. Only tree nodes above the requested points are visited.
+    
+    Args:
+        keys (np.ndarray): uint64 key per path, shape (S,)
+        points (np.ndarray): Sorted unique uint64 clock points, shape (n,)
+    
+    Returns:
+        np.ndarray: Path values of shape (S, n), with Var[W(t) - W(s)] = t - s
+    """
+    size = 1 << _TREE_LEVELS
+    keys = keys[:, None]
+    los = np.zeros(1, dtype=np.uint64)
+    w_lo = np.zeros((len(keys), 1))
+    w_hi = np.sqrt(size) * _hash_normal(keys, np.array([size], dtype=np.uint64))
+    
+    for level in range(1, _TREE_LEVELS + 1):
+        half = size >> level
+        mids = los + np.uint64(half)
+        w_mid = 0.5 * (w_lo + w_hi) + np.sqrt(half / 2.0) * _hash_normal(keys, mids)
+        
+        # Children that still contain requested points
+        shift = np.uint64(_TREE_LEVELS - level)
+        child_los = (points >> shift) << shift
+        keep = np.empty(len(points), dtype=bool)
+        keep[0] = True
+        keep[1:] = child_los[1:] != child_los[:-1]
+        child_los = child_los[keep]
+        
+        parents = np.searchsorted(los, child_los, side='right') - 1
+        right = child_los != los[parents]
+        w_lo, w_hi = (
+            np.where(right, w_mid[:, parents], w_lo[:, parents]),
+            np.where(right, w_hi[:, parents], w_mid[:, parents])
+        )
+        los = child_los
+    
+    # Leaves have unit width and start at the requested points
+    return w_lo
+
+def generate_bars(symbols, period='1y', interval='1d', seed=0, correlation=0.0,
+                  drift=0.07, end=None, tz=DEFAULT_TZ):
+    """
+    Generate OHLCV bars for many symbols with geometric Brownian motion.
+    
+    Each symbol follows one continuous price path on an absolute clock, and
+    every draw is keyed by (symbol, seed, time) rather than by position. A
+    symbol's bars therefore depend only on (symbol, seed): any period or
+    interval is a consistent view of the same path, e.g. a daily close equals
+    the close of that session's last minute bar. Cross-symbol correlation
+    comes from a shared market path: W = sqrt(c) * market + sqrt(1 - c) * own.
+    
+    Args:
+        symbols (list): Stock symbols
+        period (str): Period of data to generate
+        interval (str): Data interval
+        seed (int): Seed shared by the whole universe
+        correlation (float): Pairwise correlation of returns, between 0 and 1
+        drift (float): Annualized drift
+        end (pd.Timestamp): Last day of the calendar (defaults to today)
+        tz (str): Exchange time zone
+    
+    Returns:
+        dict: 'Date' (DatetimeIndex of n bars) and 'Open', 'High', 'Low',
+            'Close', 'Volume' arrays of shape (len(symbols), n)
+    """
+    if not 0.0 <= correlation <= 1.0:
+        raise ValueError("correlation must be between 0 and 1")
+    
+    end = pd.Timestamp.now(tz=tz) if end is None else pd.Timestamp(end)
+    end = end.tz_localize(tz) if end.tz is None else end.tz_convert(tz)
+    dates = trading_calendar(period, interval, end=end, tz=tz)
+    n_symbols, n_bars = len(symbols), len(dates)
+    if n_bars == 0:
+        empty = np.empty((n_symbols, 0))
+        return {'Date': dates, 'Open': empty, 'High': empty, 'Low': empty,
+                'Close': empty, 'Volume': empty.astype(np.int64)}
+    
+    # Per-symbol parameters
+    params = _hash_uniform(_symbol_keys(symbols, seed, _STREAM_PARAMS)[:, None], np.arange(3, dtype=np.uint64))
+    base_price = np.exp(np.log(10) + params[:, 0] * np.log(50))
+    volatility = 0.15 + params[:, 1] * 0.45
+    base_volume = np.exp(np.log(2e5) + params[:, 2] * np.log(100))
+    
+    # Evaluate the paths once at every distinct bar boundary and the reference point
+    start, stop = _bar_clock(dates, interval, np.datetime64(end.date(), 'D'))
+    reference = np.uint64(np.busday_count(_EPOCH, _REFERENCE_DATE) * _UNITS_PER_SESSION + _OVERNIGHT_UNITS)
+    points, inverse = np.unique(np.concatenate([start, stop, [reference]]), return_inverse=True)
+    
+    paths = _brownian_motion(_symbol_keys(symbols, seed, _STREAM_PATH), points)
+    if correlation > 0:
+        market = _brownian_motion(_symbol_keys([_MARKET_SYMBOL], seed, _STREAM_PATH), points)
+        paths = np.sqrt(correlation) * market + np.sqrt(1.0 - correlation) * paths
+    
+    sigma = volatility[:, None]
+    elapsed = points.astype(np.float64) - float(reference)
+    ref_index = inverse[-1]
+    log_price = (np.log(base_price)[:, None]
+                 + (drift - 0.5 * sigma ** 2) * elapsed / _UNITS_PER_YEAR
+                 + sigma / np.sqrt(_UNITS_PER_YEAR) * (paths - paths[:, ref_index:ref_index + 1]))
+    prices = np.exp(log_price)
+    open_ = prices[:, inverse[:n_bars]]
+    close = prices[:, inverse[n_bars:2 * n_bars]]
+    
+    # Intrabar extremes scale with the bar's length
+    bar_sd = sigma * np.sqrt((stop - start).astype(np.float64) / _UNITS_PER_YEAR)
+    high_draw = np.abs(_hash_normal(_symbol_keys(symbols, seed, _STREAM_HIGH)[:, None], stop))
+    low_draw = np.abs(_hash_normal(_symbol_keys(symbols, seed, _STREAM_LOW)[:, None], stop))
+    high = np.maximum(open_, close) * np.exp(0.5 * bar_sd * high_draw)
+    low = np.minimum(open_, close) * np.exp(-0.5 * bar_sd * low_draw)
+    
+    # Volume scales with bar length, with busier bars on bigger moves
+    bar_sessions = (stop - start).astype(np.float64) / _SESSION_MINUTES
+    volume_draw = _hash_normal(_symbol_keys(symbols, seed, _STREAM_VOLUME)[:, None], stop)
+    volume = base_volume[:, None] * bar_sessions * np.exp(0.3 * volume_draw + 2.0 * np.abs(np.log(close / open_)))
+    
+    return {
+        'Date': dates,
+        'Open': open_,
+        'High': high,
+        'Low': low,
+        'Close': close,
+        'Volume': volume.astype(np.int64)
+    }
+
+def bars_to_frame(bars, index=0):
+    """
+    Extract one symbol from generate_bars() output as a DataFrame.
+    
+    Args:
+        bars (dict): Output of generate_bars()
+        index (int): Position of the symbol in the generated universe
+    
+    Returns:
+        pd.DataFrame: OHLCV bars indexed by 'Date'
+    """
+    return pd.DataFrame(
+        {column: bars[column][index] for column in ('Open', 'High', 'Low', 'Close', 'Volume')},
+        index=bars['Date']
+    )
+
+def generate_info(symbol, bars_frame, seed=0):
+    """
+    Build mock company metadata consistent with generated bars.
+    
+    Args:
+        symbol (str): Stock symbol
+        bars_frame (pd.DataFrame): Generated bars for the symbol
+        seed (int): Seed used for the bars
+    
+    Returns:
+        dict: Company metadata in the shape of Yahoo Finance ``info``
+    """
+    market_cap = _hash_uniform(_symbol_keys([symbol], seed, _STREAM_PARAMS), np.uint64(3))[0]
+    latest = bars_frame.iloc[-1]
+    return {
+        'symbol': symbol,
+        'shortName': f"{symbol} Inc.",
+        'longName': f"{symbol} Corporation",
+        'sector': 'Technology',
+        'industry': 'Software',
+        'website': f"https://www.{symbol.lower()}.com",
+        'marketCap': int(1000000000 + market_cap * 1000000000),
+        'regularMarketPrice': float(latest['Close']),
+        'regularMarketOpen': float(latest['Open']),
+        'regularMarketDayHigh': float(latest['High']),
+        'regularMarketDayLow': float(latest['Low']),
+        'regularMarketVolume': int(latest['Volume']),
+        'regularMarketChange': float(latest['Close'] - latest['Open']),
+        'regularMarketChangePercent': float((latest['Close'] - latest['Open']) / latest['Open'] * 100),
+        'fiftyTwoWeekHigh': float(bars_frame['High'].max()),
+        'fiftyTwoWeekLow': float(bars_frame['Low'].min()),
+        'country': 'United States',
+        'exchangeName': 'NASDAQ',
+        'quoteType': 'EQUITY',
+        'longBusinessSummary': f"This is a mock description for {symbol} Inc. The company specializes in software development and technology solutions."
+    }
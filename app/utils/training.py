@@ -0,0 +1,286 @@
+import json
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import click
+import numpy as np
+
+from app.utils.cache import LRUCache
+from app.utils.data_fetcher import get_bars_batch, get_listings
+from app.utils.prediction import DEFAULT_LEVEL, AutoregressiveModel
+
+# Marks a (symbol, interval) with no trained model in the loader cache
+_NO_MODEL = 'none'
+
+class ModelStore:
+    """
+    Versioned model artifacts on local disk.
+    
+    Each training run writes ``<directory>/<SYMBOL>/<interval>/<version>.npz``
+    (the model arrays) and ``<version>.json`` (training metadata), then
+    points ``LATEST`` at the new version. Versions sort by training time,
+    and the pointer is replaced atomically, so readers never see a
+    half-written model.
+    """
+    
+    def __init__(self, directory, keep=3):
+        self.directory = directory
+        self.keep = keep
+    
+    def _model_dir(self, symbol, interval):
+        return os.path.join(self.directory, symbol.upper(), interval)
+    
+    def save(self, symbol, interval, model, metadata=None):
+        """
+        Persist a new version of a symbol's model and make it the latest.
+        
+        Args:
+            symbol (str): Stock symbol
+            interval (str): Bar interval the model was trained on
+            model (AutoregressiveModel): Trained model
+            metadata (dict): JSON-serializable training details
+        
+        Returns:
+            str: The new version
+        """
+        model_dir = self._model_dir(symbol, interval)
+        os.makedirs(model_dir, exist_ok=True)
+        version = time.strftime('%Y%m%dT%H%M%S', time.gmtime()) + f"-{time.time_ns() % 10**9:09d}"
+        
+        fd, tmp_path = tempfile.mkstemp(dir=model_dir, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            np.savez(f, **model.to_arrays())
+        os.replace(tmp_path, os.path.join(model_dir, f"{version}.npz"))
+        
+        info = dict(metadata or {}, symbol=symbol.upper(), interval=interval, version=version)
+        self._write(model_dir, f"{version}.json", json.dumps(info))
+        self._write(model_dir, 'LATEST', version)
+        self._prune(model_dir)
+        return version
+    
+    def _write(self, model_dir, name, text):
+        fd, tmp_path = tempfile.mkstemp(dir=model_dir, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            f.write(text)
+        os.replace(tmp_path, os.path.join(model_dir, name))
+    
+    def _prune(self, model_dir):
+        for version in self._versions(model_dir)[:-self.keep]:
+            for suffix in ('.npz', '.json'):
+                try:
+                    os.remove(os.path.join(model_dir, version + suffix))
+                except OSError:
+                    pass
+    
+    def _versions(self, model_dir):
+        try:
+            return sorted(name[:-4] for name in os.listdir(model_dir) if name.endswith('.npz'))
+        except OSError:
+            return []
+    
+    def versions(self, symbol, interval):
+        """List the stored versions of a symbol's model, oldest first."""
+        return self._versions(self._model_dir(symbol, interval))
+    
+    def latest_version(self, symbol, interval):
+        """Get the latest version of a symbol's model, or None if none was trained."""
+        try:
+            with open(os.path.join(self._model_dir(symbol, interval), 'LATEST')) as f:
+                return f.read().strip() or None
+        except OSError:
+            return None
+    
+    def load(self, symbol, interval, version=None):
+        """
+        Load a model version (the latest by default).
+        
+        Returns:
+            tuple: (model, metadata), or None if there is no such model
+        """
+        version = version or self.latest_version(symbol, interval)
+        if version is None:
+            return None
+        model_dir = self._model_dir(symbol, interval)
+        try:
+            with np.load(os.path.join(model_dir, f"{version}.npz")) as arrays:
+                model = AutoregressiveModel.from_arrays(arrays)
+            with open(os.path.join(model_dir, f"{version}.json")) as f:
+                metadata = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Error loading model {symbol} {interval} {version}: {str(e)}")
+            return None
+        return model, metadata
+    
+    def clear(self):
+        """Remove every stored model."""
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+class ModelLoader:
+    """
+    Lazily loads the latest trained models into a bounded in-memory LRU.
+    
+    Entries expire after ttl seconds, so a retrained model is picked up
+    without restarting the web process; symbols without a model are cached
+    too, so they do not hit the disk on every request.
+    """
+    
+    def __init__(self, store, max_bytes=16 * 1024 * 1024, ttl=300):
+        self.store = store
+        self.ttl = ttl
+        self._cache = LRUCache(max_bytes=max_bytes)
+    
+    def get(self, symbol, interval='1d'):
+        """
+        Get the latest model for a symbol.
+        
+        Returns:
+            tuple: (model, metadata), or None if no model was trained
+        """
+        key = (symbol.upper(), interval)
+        entry = self._cache.get(key)
+        if entry is None:
+            entry = self.store.load(symbol, interval) or _NO_MODEL
+            size = entry[0].coefficients.nbytes + 512 if entry != _NO_MODEL else 64
+            self._cache.set(key, entry, ttl=self.ttl, size=size)
+        return None if entry == _NO_MODEL else entry
+    
+    def stats(self):
+        """Return the LRU counters."""
+        return self._cache.stats()
+
+def _train_symbol(task):
+    """Train one symbol's model; runs in a worker process, so it must stay picklable."""
+    symbol, close, lags = task
+    try:
+        started = time.perf_counter()
+        model = AutoregressiveModel.fit(close, lags=lags)
+        return symbol, model.to_arrays(), {
+            'lags': lags,
+            'observations': model.observations,
+            'sigma': model.sigma,
+            'training_seconds': time.perf_counter() - started
+        }
+    except Exception as e:
+        return symbol, None, {'error': str(e)}
+
+def train_models(symbols, store, period='2y', interval='1d', lags=5, max_workers=None, batch_size=200):
+    """
+    Train and persist models for many symbols across a process pool.
+    
+    Bars are fetched in the calling process, one provider batch at a time,
+    while worker processes fit the previous batch, so training uses every
+    core and never runs inside a web request. Mock data is never trained
+    on: symbols the provider has no bars for are reported as failed.
+    
+    Args:
+        symbols (list): Stock symbols
+        store (ModelStore): Where to save the models
+        period (str): Training history
+        interval (str): Bar interval
+        lags (int): Autoregressive order
+        max_workers (int): Worker processes (defaults to the CPU count)
+        batch_size (int): Symbols fetched per provider call
+    
+    Returns:
+        dict: 'trained' (symbol -> version), 'failed' (symbol -> error) and 'seconds'
+    """
+    started = time.perf_counter()
+    trained, failed = {}, {}
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        pending = None
+        for start in range(0, len(symbols) + batch_size, batch_size):
+            batch = symbols[start:start + batch_size]
+            tasks = []
+            if batch:
+                bars = get_bars_batch(batch, period=period, interval=interval, fallback=False)
+                failed.update({symbol: 'No data from the provider' for symbol in batch if symbol not in bars})
+                tasks = [(symbol, bars[symbol]['Close'], lags) for symbol in batch if symbol in bars]
+            
+            # Save the previous batch while this one is fetched and trained
+            if pending is not None:
+                for symbol, arrays, metadata in pending:
+                    if arrays is None:
+                        failed[symbol] = metadata['error']
+                        continue
+                    metadata.update(period=period, trained_at=time.time())
+                    trained[symbol] = store.save(symbol, interval, AutoregressiveModel.from_arrays(arrays), metadata)
+            chunksize = max(1, len(tasks) // (4 * (max_workers or os.cpu_count() or 1)))
+            pending = pool.map(_train_symbol, tasks, chunksize=chunksize) if tasks else None
+    
+    return {'trained': trained, 'failed': failed, 'seconds': time.perf_counter() - started}
+
+# Configured by init_app()
+model_store = None
+model_loader = None
+_training_config = {}
+
+def init_app(app):
+    """
+    Configure model storage and register the ``flask train-models`` command.
+    
+    Args:
+        app (Flask): Flask application
+    """
+    global model_store, model_loader
+    
+    model_store = ModelStore(
+        app.config.get('MODEL_DIR') or os.path.join(app.instance_path, 'models'),
+        keep=app.config.get('MODEL_VERSIONS_KEPT', 3)
+    )
+    model_loader = ModelLoader(
+        model_store,
+        max_bytes=app.config.get('MODEL_CACHE_MAX_BYTES', 16 * 1024 * 1024),
+        ttl=app.config.get('MODEL_CACHE_TTL', 300)
+    )
+    _training_config.update(
+        period=app.config.get('TRAINING_PERIOD', '2y'),
+        lags=app.config.get('TRAINING_LAGS', 5),
+        max_workers=app.config.get('TRAINING_MAX_WORKERS') or None
+    )
+    
+    @app.cli.command('train-models')
+    @click.argument('symbols', nargs=-1)
+    @click.option('--interval', default='1d', help='Bar interval to train on.')
+    def train_models_command(symbols, interval):
+        """Train forecasting models (for SYMBOLS, or the whole listings universe)."""
+        symbols = [symbol.upper() for symbol in symbols] or [listing['symbol'] for listing in get_listings()]
+        result = train_models(symbols, model_store, interval=interval, **_training_config)
+        click.echo(f"Trained {len(result['trained'])} models in {result['seconds']:.1f}s; "
+                   f"{len(result['failed'])} failed")
+        for symbol, error in sorted(result['failed'].items()):
+            click.echo(f"  {symbol}: {error}")
+
+def forecast_with_model(symbol, close, steps=30, interval='1d', level=DEFAULT_LEVEL):
+    """
+    Forecast a symbol's prices with its latest trained model.
+    
+    Only inference happens here: the model is read from the in-memory LRU
+    (or loaded from disk once) and iterated over the recent closes.
+    
+    Args:
+        symbol (str): Stock symbol
+        close (np.ndarray): Recent closing prices, oldest first
+        steps (int): Number of bars to forecast
+        interval (str): Bar interval of close
+        level (float): Confidence level of the interval
+    
+    Returns:
+        dict: 'prices', 'lower', 'upper', 'level' and the 'model' version,
+            or None if no model was trained for the symbol
+    """
+    if model_loader is None:
+        return None
+    entry = model_loader.get(symbol, interval)
+    if entry is None:
+        return None
+    model, metadata = entry
+    try:
+        forecast = model.forecast(close, steps, level)
+    except ValueError as e:
+        print(f"Error forecasting {symbol}: {str(e)}")
+        return None
+    forecast['model'] = metadata['version']
+    return forecast
@@ -19,6 +19,80 @@ class Config:
     
     # API Keys
     # ALPHA_VANTAGE_API_KEY = os.environ.get('ALPHA_VANTAGE_API_KEY')
+    
+    # Market data provider: 'yfinance', 'replay' (recorded bars from
+    # REPLAY_DATA_DIR, default <instance_path>/replay, with simulated
+    # latency) or 'synthetic'
+    MARKET_DATA_PROVIDER = os.environ.get('MARKET_DATA_PROVIDER') or 'yfinance'
+    MARKET_DATA_FALLBACK = True
+    REPLAY_DATA_DIR = os.environ.get('REPLAY_DATA_DIR')
+    REPLAY_LATENCY = float(os.environ.get('REPLAY_LATENCY') or 0.0)
+    REPLAY_LATENCY_JITTER = float(os.environ.get('REPLAY_LATENCY_JITTER') or 0.0)
+    SYNTHETIC_SEED = int(os.environ.get('SYNTHETIC_SEED') or 0)
+    SYNTHETIC_CORRELATION = float(os.environ.get('SYNTHETIC_CORRELATION') or 0.0)
+    
+    # Market data cache (CACHE_DIR defaults to <instance_path>/cache)
+    CACHE_ENABLED = True
+    CACHE_DIR = os.environ.get('CACHE_DIR')
+    CACHE_MAX_BYTES = int(os.environ.get('CACHE_MAX_BYTES') or 64 * 1024 * 1024)
+    INFO_CACHE_MAX_BYTES = int(os.environ.get('INFO_CACHE_MAX_BYTES') or 8 * 1024 * 1024)
+    INFO_CACHE_TTL = int(os.environ.get('INFO_CACHE_TTL') or 24 * 3600)
+    
+    # Memoized indicator values keyed by a fingerprint of the bars (0 disables)
+    ANALYSIS_CACHE_MAX_BYTES = int(os.environ.get('ANALYSIS_CACHE_MAX_BYTES') or 32 * 1024 * 1024)
+    
+    # Latest quotes served by /stocks/api/quotes
+    QUOTE_CACHE_TTL = int(os.environ.get('QUOTE_CACHE_TTL') or 15)
+    QUOTE_CACHE_MAX_BYTES = int(os.environ.get('QUOTE_CACHE_MAX_BYTES') or 4 * 1024 * 1024)
+    QUOTE_MAX_SYMBOLS = int(os.environ.get('QUOTE_MAX_SYMBOLS') or 100)
+    
+    # Server-Sent Events quote stream (/stocks/api/stream)
+    STREAM_REFRESH_INTERVAL = float(os.environ.get('STREAM_REFRESH_INTERVAL') or 15)
+    STREAM_HEARTBEAT = float(os.environ.get('STREAM_HEARTBEAT') or 20)
+    # Open streams per process; each holds a server thread (see Procfile --threads)
+    STREAM_MAX_CLIENTS = int(os.environ.get('STREAM_MAX_CLIENTS') or 16)
+    
+    # Screener (/stocks/api/screen): latest indicator values for the listing
+    # universe (or the comma-separated SCREENER_SYMBOLS), rebuilt in the background
+    SCREENER_SYMBOLS = os.environ.get('SCREENER_SYMBOLS')
+    SCREENER_PERIOD = os.environ.get('SCREENER_PERIOD') or '1y'
+    SCREENER_REFRESH_INTERVAL = float(os.environ.get('SCREENER_REFRESH_INTERVAL') or 900)
+    SCREENER_BATCH_SIZE = int(os.environ.get('SCREENER_BATCH_SIZE') or 200)
+    SCREENER_MAX_RESULTS = int(os.environ.get('SCREENER_MAX_RESULTS') or 500)
+    
+    # Forecasting models trained offline with `flask train-models` and
+    # stored under MODEL_DIR (defaults to <instance_path>/models)
+    MODEL_DIR = os.environ.get('MODEL_DIR')
+    MODEL_VERSIONS_KEPT = int(os.environ.get('MODEL_VERSIONS_KEPT') or 3)
+    MODEL_CACHE_MAX_BYTES = int(os.environ.get('MODEL_CACHE_MAX_BYTES') or 16 * 1024 * 1024)
+    MODEL_CACHE_TTL = int(os.environ.get('MODEL_CACHE_TTL') or 300)
+    TRAINING_PERIOD = os.environ.get('TRAINING_PERIOD') or '2y'
+    TRAINING_LAGS = int(os.environ.get('TRAINING_LAGS') or 5)
+    TRAINING_MAX_WORKERS = int(os.environ.get('TRAINING_MAX_WORKERS') or 0)
+    
+    # Worker processes for `flask backtest-sweep` (0 = one per CPU); small
+    # sweeps run in one process regardless
+    BACKTEST_MAX_WORKERS = int(os.environ.get('BACKTEST_MAX_WORKERS') or 0)
+    
+    # Serve coarser intervals and shorter periods from one base history per symbol
+    RESAMPLE_ENABLED = True
+    
+    # Send chart arrays as base64 typed arrays; needs Plotly.js 2.28+ in
+    # templates/base.html (the plotly-latest CDN build is frozen at 1.58)
+    PLOTLY_TYPED_ARRAYS = False
+    
+    # Local columnar price history (BAR_STORE_DIR defaults to <instance_path>/bars)
+    BAR_STORE_ENABLED = True
+    BAR_STORE_DIR = os.environ.get('BAR_STORE_DIR')
+    
+    # Symbol search universe: CSV/pipe-delimited listings (defaults to app/data/listings.csv)
+    LISTINGS_FILE = os.environ.get('LISTINGS_FILE')
+    SEARCH_RESULT_LIMIT = int(os.environ.get('SEARCH_RESULT_LIMIT') or 50)
+    AUTOCOMPLETE_RESULT_LIMIT = int(os.environ.get('AUTOCOMPLETE_RESULT_LIMIT') or 10)
+    
+    # Batched fetching (get_multiple_stocks_data)
+    FETCH_MAX_WORKERS = int(os.environ.get('FETCH_MAX_WORKERS') or 8)
+    FETCH_TIMEOUT = float(os.environ.get('FETCH_TIMEOUT') or 20)
 
 class DevelopmentConfig(Config):
     """Development configuration."""
@@ -28,6 +102,8 @@ class TestingConfig(Config):
     """Testing configuration."""
     TESTING = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    CACHE_ENABLED = False
+    BAR_STORE_ENABLED = False
     
 class ProductionConfig(Config):
     """Production configuration."""
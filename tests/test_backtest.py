@@ -0,0 +1,99 @@
+"""The vectorized backtester against bar-by-bar references."""
+import numpy as np
+import pytest
+
+from app.utils.backtest import backtest, evaluate_positions, sweep
+from app.utils.resample import bars_per_year
+
+def make_close(n=1000):
+    rng = np.random.default_rng(11)
+    return 100 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+
+def make_positions(n=1000):
+    rng = np.random.default_rng(12)
+    # Hold each random position for 10 bars, ending flat
+    positions = np.repeat(rng.choice([-1.0, 0.0, 1.0], n // 10), 10)
+    positions[-10:] = 0.0
+    return positions
+
+def make_data(close):
+    return {'success': True, 'tz': 'UTC', 'data': {
+        'Date': np.arange(len(close), dtype=np.int64) * 86400000,
+        'Open': close, 'High': close, 'Low': close, 'Close': close, 'Volume': np.ones(len(close)),
+    }}
+
+def test_equity_matches_bar_by_bar_compounding():
+    close, positions = make_close(), make_positions()
+    equity = 1.0
+    for i in range(1, len(close)):
+        # A position decided on a close is held over the next bar
+        equity *= 1 + positions[i - 1] * (close[i] / close[i - 1] - 1)
+    result = evaluate_positions(close, positions)
+    assert result['total_return'] == pytest.approx(equity - 1, rel=1e-9)
+
+def test_trades_include_their_round_trip_cost():
+    close = np.full(8, 100.0)
+    result = evaluate_positions(close, np.array([0, 1, 1, 0, 0, 0, 0, 0.0]), cost=0.01)
+    assert result['trades'] == 1
+    # Charged on entry and on exit
+    assert result['average_trade'] == pytest.approx(0.99 ** 2 - 1)
+    assert result['total_return'] == pytest.approx(0.99 ** 2 - 1)
+
+def test_trade_returns_match_the_equity_curve():
+    close, positions = make_close(), make_positions()
+    result = evaluate_positions(close, positions, cost=0.002, include_series=True)
+    equity = np.concatenate([[1.0], result['equity']])
+    held = np.concatenate([[0.0], positions[:-1]])
+    # Each trade's return from the equity before its first bar to its last bar
+    trades = []
+    start = None
+    for i in range(1, len(held) + 1):
+        if start is not None and (i == len(held) or held[i] != held[start]):
+            trades.append(equity[i] / equity[start] - 1)
+            start = None
+        if start is None and i < len(held) and held[i] != 0:
+            start = i
+    assert result['trades'] == len(trades) > 10
+    assert result['average_trade'] == pytest.approx(np.mean(trades), rel=1e-9)
+    assert result['win_rate'] == pytest.approx(np.mean(np.array(trades) > 0))
+
+def test_missing_close_is_carried_over():
+    close, positions = make_close(), make_positions()
+    gappy = close.copy()
+    gappy[[100, 500, 501]] = np.nan
+    filled = gappy.copy()
+    filled[100], filled[500], filled[501] = filled[99], filled[499], filled[499]
+    result = evaluate_positions(gappy, positions, cost=0.001)
+    expected = evaluate_positions(filled, positions, cost=0.001)
+    assert all(np.isfinite(value) for value in result.values())
+    assert result == pytest.approx(expected, rel=1e-12)
+
+def test_matrix_rows_match_single_evaluations():
+    close, positions = make_close(), make_positions()
+    matrix = np.vstack([positions, -positions, np.zeros_like(positions)])
+    results = evaluate_positions(close, matrix, cost=0.001)
+    for row in range(3):
+        single = evaluate_positions(close, matrix[row], cost=0.001)
+        for key, value in single.items():
+            assert results[key][row] == pytest.approx(value, nan_ok=True)
+
+def test_sweep_matches_single_backtests():
+    data = make_data(make_close())
+    results = sweep(data, 'macd', grid={'fast': [8, 12], 'slow': [20, 26], 'signal': [9]}, cost=0.001, max_workers=1)
+    assert len(results) == 4
+    for result in results:
+        single = backtest(data, 'macd', tuple(result['params'].values()), cost=0.001)
+        assert result['sharpe'] == pytest.approx(single['sharpe'])
+        assert result['total_return'] == pytest.approx(single['total_return'])
+    assert [result['sharpe'] for result in results] == sorted((result['sharpe'] for result in results), reverse=True)
+
+def test_annualization_follows_the_interval():
+    assert bars_per_year('1d') == 252
+    assert bars_per_year('1h') == 252 * 7
+    assert bars_per_year('1wk') == 52
+    with pytest.raises(ValueError):
+        bars_per_year('7x')
+    close, positions = make_close(), make_positions()
+    daily = evaluate_positions(close, positions)
+    hourly = evaluate_positions(close, positions, bars_per_year=bars_per_year('1h'))
+    assert hourly['volatility'] == pytest.approx(daily['volatility'] * np.sqrt(7))
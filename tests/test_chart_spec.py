@@ -0,0 +1,69 @@
+"""Plotly figure specs built without plotly.graph_objects."""
+import base64
+import json
+
+import numpy as np
+import plotly.graph_objects as go
+import pytest
+
+from app.utils.chart_spec import FigureSpec, typed_array
+
+def decode(spec):
+    dtypes = {'f8': '<f8', 'f4': '<f4', 'i4': '<i4', 'i2': '<i2', 'i1': 'i1', 'u4': '<u4', 'u2': '<u2', 'u1': 'u1'}
+    values = np.frombuffer(base64.b64decode(spec['bdata']), dtype=dtypes[spec['dtype']])
+    if 'shape' in spec:
+        values = values.reshape([int(size) for size in spec['shape'].split(',')])
+    return values
+
+@pytest.mark.parametrize('values', [
+    np.array([1.5, np.nan, -2.25]),
+    np.arange(5, dtype=np.int32),
+    np.arange(5, dtype='>f8'),
+    np.array([True, False]),
+    np.arange(6, dtype=np.int64).reshape(2, 3),
+], ids=['float64', 'int32', 'big-endian', 'bool', 'int64-2d'])
+def test_typed_array_round_trip(values):
+    np.testing.assert_array_equal(decode(typed_array(values)), values.astype(np.float64))
+
+def test_to_dict_encodes_only_numeric_arrays():
+    close = np.array([1.0, 2.0, 3.0])
+    dates = np.array(['2024-01-02', '2024-01-03', '2024-01-04'], dtype=object)
+    fig = FigureSpec().add_trace('scatter', x=dates, y=close, name='Close', customdata=[1, 2, 3])
+    trace = fig.to_dict(typed_arrays=True)['data'][0]
+    assert trace['x'] is dates and trace['customdata'] == [1, 2, 3]
+    np.testing.assert_array_equal(decode(trace['y']), close)
+    # The figure itself keeps its arrays
+    assert fig.data[0]['y'] is close
+
+def test_layout_updates_merge():
+    fig = FigureSpec(layout={'title': 'Prices', 'xaxis': {'title': 'Date', 'showgrid': False}})
+    fig.update_layout(xaxis={'rangeslider': {'visible': False}}, height=600)
+    assert fig.layout == {
+        'title': {'text': 'Prices'},
+        'xaxis': {'title': {'text': 'Date'}, 'showgrid': False, 'rangeslider': {'visible': False}},
+        'height': 600,
+    }
+
+def plain(value):
+    """JSON figure data with typed arrays expanded to lists, whichever encoding produced it."""
+    if isinstance(value, dict):
+        if 'bdata' in value:
+            return [None if item != item else item for item in decode(value).tolist()]
+        return {key: plain(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [plain(item) for item in value]
+    return value
+
+@pytest.mark.parametrize('typed_arrays', [False, True])
+def test_json_matches_graph_objects(typed_arrays):
+    x = np.arange(4, dtype=np.float64)
+    y = np.array([1.0, 2.5, np.nan, 4.0])
+    spec = FigureSpec().add_trace('scatter', x=x, y=y, mode='lines', name='Close')
+    spec.update_layout(title='Prices', xaxis={'title': 'Date'})
+    figure = go.Figure(go.Scatter(x=x, y=y, mode='lines', name='Close'))
+    figure.update_layout(title='Prices', xaxis={'title': 'Date'})
+    expected = plain(json.loads(figure.to_json(engine='json')))
+    actual = plain(json.loads(spec.to_json(typed_arrays=typed_arrays)))
+    assert actual['data'] == expected['data']
+    assert actual['layout']['title'] == expected['layout']['title']
+    assert actual['layout']['xaxis'] == expected['layout']['xaxis']
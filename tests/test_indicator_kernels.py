@@ -0,0 +1,101 @@
+"""The O(n) indicator kernels against straightforward pandas references."""
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.utils.data_analyzer import compute_indicator_matrix, compute_indicators
+
+NAMES = ['ma_20', 'ema_12', 'rsi', 'macd', 'std_20', 'bollinger', 'atr', 'obv', 'vwap_20']
+
+# Bars that are missing from the provider's data
+GAPS = [5, 120, 121, 250]
+
+def make_columns(n=400, gaps=()):
+    rng = np.random.default_rng(7)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+    high = close * (1 + rng.uniform(0, 0.02, n))
+    low = close * (1 - rng.uniform(0, 0.02, n))
+    volume = rng.integers(100000, 1000000, n).astype(np.float64)
+    for column in (close, high, low):
+        column[list(gaps)] = np.nan
+    return {
+        'Date': (np.arange(n) * 86400000 + 1600000000000).astype(np.int64),
+        'Open': close.copy(), 'High': high, 'Low': low, 'Close': close, 'Volume': volume,
+    }
+
+def wilder(values, window):
+    """Wilder smoothing seeded with the mean of the first window values (from bar 1 on)."""
+    seed = values.iloc[1:window + 1].mean()
+    smoothed = pd.concat([pd.Series([seed]), values.iloc[window + 1:]]).ewm(alpha=1 / window, adjust=False).mean()
+    out = np.full(len(values), np.nan)
+    out[window:] = smoothed.to_numpy()
+    return out
+
+def references(columns):
+    close, high, low = (pd.Series(columns[name]) for name in ('Close', 'High', 'Low'))
+    volume = pd.Series(columns['Volume'])
+    std = close.rolling(20).std(ddof=0)
+    macd = close.ewm(span=12, adjust=False).mean() - close.ewm(span=26, adjust=False).mean()
+    signal = macd.ewm(span=9, adjust=False).mean()
+    
+    # Changes are measured from the last valid close; a missing bar has none
+    delta = close.ffill().diff().where(close.notna())
+    avg_gain, avg_loss = wilder(delta.clip(lower=0), 14), wilder((-delta).clip(lower=0), 14)
+    previous = close.ffill().shift()
+    true_range = pd.concat([high - low, (high - previous).abs(), (low - previous).abs()], axis=1).max(axis=1, skipna=False)
+    
+    typical = (high + low + close) / 3
+    valid = typical.notna()
+    return {
+        'ma_20': close.rolling(20).mean(),
+        'ema_12': close.ewm(span=12, adjust=False).mean(),
+        'rsi': 100 - 100 / (1 + avg_gain / avg_loss),
+        'macd': {'macd': macd, 'signal': signal, 'histogram': macd - signal},
+        'std_20': std,
+        'bollinger': {'middle': close.rolling(20).mean(), 'upper': close.rolling(20).mean() + 2 * std,
+                      'lower': close.rolling(20).mean() - 2 * std},
+        'atr': wilder(true_range, 14),
+        'obv': (np.sign(delta).fillna(0) * volume).cumsum(),
+        'vwap_20': (typical * volume).where(valid, 0).rolling(20).sum() / volume.where(valid, 0).rolling(20).sum(),
+    }
+
+def assert_matches(actual, expected):
+    if isinstance(expected, dict):
+        assert set(actual) == set(expected)
+        for key in expected:
+            assert_matches(actual[key], expected[key])
+        return
+    np.testing.assert_allclose(np.asarray(actual, dtype=np.float64), np.asarray(expected, dtype=np.float64),
+                               rtol=1e-9, atol=1e-9, equal_nan=True)
+
+@pytest.mark.parametrize('gaps', [(), GAPS], ids=['complete', 'with-gaps'])
+def test_series_match_pandas(gaps):
+    columns = make_columns(gaps=gaps)
+    series = compute_indicators({'success': True, 'data': columns, 'tz': 'UTC'}, NAMES, output='series')
+    expected = references(columns)
+    for name in NAMES:
+        assert_matches(series[name], expected[name])
+
+def test_gap_does_not_spread():
+    columns = make_columns(gaps=GAPS)
+    series = compute_indicators({'success': True, 'data': columns, 'tz': 'UTC'}, NAMES, output='series')
+    for name in ('ema_12', 'rsi', 'atr', 'obv'):
+        assert not np.isnan(series[name][-50:]).any(), name
+    # Windowed indicators recover once the gap leaves the window
+    assert not np.isnan(series['ma_20'][GAPS[-1] + 20:]).any()
+
+def test_matrix_rows_match_single_series():
+    # A symbol listed later has leading NaN in the matrix
+    columns = make_columns()
+    closes = np.vstack([columns['Close'], np.concatenate([np.full(100, np.nan), columns['Close'][100:]])])
+    names = ['ma_20', 'ema_12', 'rsi', 'macd']
+    matrix = compute_indicator_matrix(closes, names, output='series')
+    for row, start in enumerate((0, 100)):
+        own = {key: values[start:] for key, values in columns.items()}
+        series = compute_indicators({'success': True, 'data': own, 'tz': 'UTC'}, names, output='series')
+        for name in names:
+            if name == 'macd':
+                for key in series[name]:
+                    assert_matches(matrix[name][key][row, start:], series[name][key])
+            else:
+                assert_matches(matrix[name][row, start:], series[name])
@@ -0,0 +1,68 @@
+"""Streaming indicator state against the batch indicators it mirrors."""
+import json
+
+import numpy as np
+import pytest
+
+from app.utils.data_analyzer import compute_indicators
+from app.utils.indicator_state import IndicatorStream, create_streaming_indicator
+
+NAMES = ['ma_20', 'ema_12', 'rsi', 'rsi_7', 'macd']
+
+def make_closes(n=400):
+    rng = np.random.default_rng(3)
+    return 100 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+
+def batch_series(closes):
+    columns = {'Date': np.arange(len(closes), dtype=np.int64) * 86400000, 'Close': closes}
+    return compute_indicators({'success': True, 'data': columns, 'tz': 'UTC'}, NAMES, output='series')
+
+def batch_value(series, name, i):
+    """The batch value of an indicator at bar i, as the streaming state reports it."""
+    if name == 'macd':
+        values = {key: float(series[name][key][i]) for key in ('macd', 'signal', 'histogram')}
+        return None if np.isnan(values['signal']) else values
+    value = float(series[name][i])
+    return None if np.isnan(value) else value
+
+def assert_same(streamed, batch):
+    if batch is None:
+        assert streamed is None
+    else:
+        assert streamed == pytest.approx(batch, rel=1e-9, abs=1e-9)
+
+@pytest.mark.parametrize('name', NAMES)
+def test_updates_match_batch_at_every_bar(name):
+    closes = make_closes()
+    series = batch_series(closes)
+    indicator = create_streaming_indicator(name)
+    for i, close in enumerate(closes):
+        assert_same(indicator.update(close), batch_value(series, name, i))
+
+@pytest.mark.parametrize('name', NAMES)
+def test_seeded_from_history_with_gaps(name):
+    # Missing bars in the cached history the state is primed from
+    closes = make_closes()
+    closes[[40, 41, 150]] = np.nan
+    series = batch_series(closes)
+    indicator = create_streaming_indicator(name)
+    indicator.seed(closes[:300])
+    for i in range(300, len(closes)):
+        assert_same(indicator.update(closes[i]), batch_value(series, name, i))
+
+def test_preview_does_not_advance():
+    closes = make_closes()
+    stream = IndicatorStream(NAMES)
+    stream.seed(closes[:-1])
+    before = stream.snapshot()
+    preview = stream.preview(closes[-1])
+    assert stream.snapshot() == before
+    assert preview == stream.update(closes[-1])
+
+def test_snapshot_round_trip():
+    closes = make_closes()
+    stream = IndicatorStream(NAMES)
+    stream.seed(closes[:200])
+    restored = IndicatorStream.restore(json.loads(json.dumps(stream.snapshot())))
+    for close in closes[200:]:
+        assert restored.update(close) == stream.update(close)
@@ -0,0 +1,46 @@
+"""Closed-form trend fits against NumPy's least squares."""
+import numpy as np
+import pytest
+
+from app.utils.prediction import fit_trend, fit_trends
+
+def make_close(n=300):
+    rng = np.random.default_rng(5)
+    return 50 + 0.2 * np.arange(n) + rng.normal(0, 2, n)
+
+def test_fit_matches_polyfit():
+    close = make_close()
+    fit = fit_trend(close)
+    slope, intercept = np.polyfit(np.arange(len(close)), close, 1)
+    assert fit.slope == pytest.approx(slope)
+    assert fit.intercept == pytest.approx(intercept)
+    assert fit.predict(3) == pytest.approx(intercept + slope * np.arange(len(close), len(close) + 3))
+
+def test_missing_closes_are_left_out():
+    close = make_close()
+    close[[0, 100, 101, len(close) - 1]] = np.nan
+    valid = ~np.isnan(close)
+    fit = fit_trend(close)
+    slope, intercept = np.polyfit(np.arange(len(close))[valid], close[valid], 1)
+    assert fit.n == valid.sum()
+    assert fit.slope == pytest.approx(slope)
+    assert fit.intercept == pytest.approx(intercept)
+    # Forecasts still start after the last bar, missing or not
+    forecast = fit.forecast(5)
+    assert forecast['prices'] == pytest.approx(intercept + slope * np.arange(len(close), len(close) + 5))
+    assert np.isfinite(forecast['lower']).all() and np.isfinite(forecast['upper']).all()
+
+def test_too_few_closes():
+    assert fit_trend(np.array([1.0])) is None
+    assert fit_trend(np.array([np.nan, 1.0, np.nan])) is None
+
+def test_batched_rows_match_single_fits():
+    first, second = make_close(), make_close()[::-1].copy()
+    second[:50] = np.nan
+    fits = fit_trends(np.vstack([first, second]))
+    for row, close in enumerate((first, second)):
+        single = fit_trend(close)
+        assert fits.slope[row] == pytest.approx(single.slope)
+        assert fits.intercept[row] == pytest.approx(single.intercept)
+        assert fits.residual_std[row] == pytest.approx(single.residual_std)
+        assert fits.predict(10)[row] == pytest.approx(single.predict(10))
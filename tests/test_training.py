@@ -0,0 +1,75 @@
+"""The autoregressive model, its on-disk store and the training job."""
+import numpy as np
+import pytest
+
+from app.utils import data_fetcher
+from app.utils.prediction import AutoregressiveModel
+from app.utils.providers import MarketDataProvider, SyntheticProvider
+from app.utils.training import ModelStore, train_models
+
+class UnavailableProvider(MarketDataProvider):
+    name = 'unavailable'
+    
+    def fetch_bars_batch(self, symbols, period='1y', interval='1d'):
+        raise ConnectionError("provider unavailable")
+
+def simulate_ar(coefficients, n=20000, sigma=0.01):
+    rng = np.random.default_rng(9)
+    intercept, lags = coefficients[0], coefficients[1:]
+    returns = np.zeros(n)
+    for t in range(len(lags), n):
+        returns[t] = intercept + lags @ returns[t - len(lags):t][::-1] + rng.normal(0, sigma)
+    return 100 * np.exp(np.cumsum(returns))
+
+def test_fit_recovers_the_coefficients():
+    coefficients = np.array([0.0005, 0.3, -0.2])
+    model = AutoregressiveModel.fit(simulate_ar(coefficients), lags=2, ridge=0.0)
+    assert model.coefficients == pytest.approx(coefficients, abs=0.02)
+    assert model.sigma == pytest.approx(0.01, rel=0.05)
+
+def test_fit_skips_missing_closes():
+    close = simulate_ar(np.array([0.0005, 0.3, -0.2]), n=2000)
+    gappy = close.copy()
+    gappy[[10, 500]] = np.nan
+    model = AutoregressiveModel.fit(gappy, lags=2)
+    expected = AutoregressiveModel.fit(close[~np.isnan(gappy)], lags=2)
+    assert model.coefficients == pytest.approx(expected.coefficients)
+
+def test_forecast_follows_the_drift():
+    model = AutoregressiveModel([0.001, 0.0, 0.0], sigma=0.02)
+    forecast = model.forecast(np.array([100.0, 101.0, 102.0]), steps=10, level=0.95)
+    assert forecast['prices'] == pytest.approx(102 * np.exp(0.001 * np.arange(1, 11)))
+    width = np.asarray(forecast['upper']) - np.asarray(forecast['lower'])
+    assert (np.diff(width) > 0).all()
+    assert (np.asarray(forecast['lower']) < forecast['prices']).all()
+
+def test_store_round_trip_and_pruning(tmp_path):
+    store = ModelStore(str(tmp_path), keep=2)
+    model = AutoregressiveModel([0.001, 0.2, -0.1], sigma=0.02, observations=500)
+    versions = [store.save('aapl', '1d', model, {'lags': 2}) for _ in range(3)]
+    assert store.versions('AAPL', '1d') == versions[1:]
+    assert store.latest_version('AAPL', '1d') == versions[-1]
+    loaded, metadata = store.load('AAPL', '1d')
+    assert loaded.coefficients == pytest.approx(model.coefficients)
+    assert (loaded.sigma, loaded.observations) == (model.sigma, model.observations)
+    assert metadata['lags'] == 2 and metadata['version'] == versions[-1]
+    assert store.load('MSFT', '1d') is None
+
+def test_train_models_saves_a_version_per_symbol(tmp_path, monkeypatch):
+    monkeypatch.setattr(data_fetcher, '_provider', SyntheticProvider(seed=1))
+    store = ModelStore(str(tmp_path))
+    result = train_models(['AAPL', 'MSFT'], store, period='1y', lags=3, max_workers=1)
+    assert result['failed'] == {}
+    assert sorted(result['trained']) == ['AAPL', 'MSFT']
+    for symbol, version in result['trained'].items():
+        model, metadata = store.load(symbol, '1d')
+        assert metadata['version'] == version and model.lags == 3
+
+def test_train_models_never_trains_on_mock_data(tmp_path, monkeypatch):
+    monkeypatch.setattr(data_fetcher, '_provider', UnavailableProvider())
+    monkeypatch.setattr(data_fetcher, '_mock_fallback', True)
+    store = ModelStore(str(tmp_path))
+    result = train_models(['AAPL'], store, max_workers=1)
+    assert result['trained'] == {}
+    assert list(result['failed']) == ['AAPL']
+    assert store.latest_version('AAPL', '1d') is None